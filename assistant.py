@@ -8,9 +8,16 @@ import keyboard
 
 import servers.api as api_server
 import servers.button as button_server
+from helpers import metrics
 from helpers.audio import Audio
 from helpers.cache import Cache
 from helpers.logger import logger
+from helpers.startup import (
+    DEFAULT_STARTUP_TIMEOUT,
+    format_startup_timeline,
+    initialize_services,
+    startup_modes,
+)
 from modules.employer import Employer
 
 
@@ -44,6 +51,18 @@ def get_config() -> typing.Dict[str, typing.Any]:
         action="store_true",
         help="Run the server to receive button presses",
     )
+    parser.add_argument(
+        "--startup",
+        choices=startup_modes,
+        default="lazy",
+        help="How to initialize services: on first use (lazy), one by one (eager) or concurrently (parallel)",
+    )
+    parser.add_argument(
+        "--startup-timeout",
+        type=float,
+        default=DEFAULT_STARTUP_TIMEOUT,
+        help="Seconds to wait for each service during eager startup",
+    )
     args = parser.parse_args()
 
     config = {
@@ -51,6 +70,8 @@ def get_config() -> typing.Dict[str, typing.Any]:
         "local": args.local,
         "run_server": args.server,
         "run_button_server": args.button,
+        "startup": args.startup,
+        "startup_timeout": args.startup_timeout,
     }
 
     # Override with environment variables if they exist
@@ -60,6 +81,13 @@ def get_config() -> typing.Dict[str, typing.Any]:
     config["run_button_server"] = os.environ.get(
         "AI_ASSISTANT_BUTTON", config["run_button_server"]
     )
+    config["startup"] = os.environ.get("AI_ASSISTANT_STARTUP", config["startup"])
+    config["startup_timeout"] = float(
+        os.environ.get("AI_ASSISTANT_STARTUP_TIMEOUT", config["startup_timeout"])
+    )
+
+    if config["startup"] not in startup_modes:
+        parser.error(f"AI_ASSISTANT_STARTUP must be one of: {', '.join(startup_modes)}")
 
     # Ensure boolean values for env vars
     for key in ["audio", "local", "run_server", "run_button_server"]:
@@ -108,8 +136,10 @@ def text_to_text(employer: Employer) -> None:
     while True:
         try:
             user_input = input("\nEnter a command: ")
-            logger.log_user_input(user_input, "text")
-            employer.job_on_command(user_input)
+            with logger.request_context():
+                logger.log_user_input(user_input, "text")
+                metrics.COMMANDS.inc(source="text")
+                employer.job_on_command(user_input)
         except KeyboardInterrupt:
             logger.log_system_event(
                 "application_shutdown", "User interrupted with Ctrl+C"
@@ -118,10 +148,23 @@ def text_to_text(employer: Employer) -> None:
             break
 
 
+def startup_services(config: typing.Dict[str, typing.Any]) -> None:
+    """
+    Initializes services according to the startup mode and logs the startup timeline.
+    """
+    timeline = initialize_services(config["startup"], config["startup_timeout"])
+
+    for line in format_startup_timeline(timeline, config["startup"]):
+        if timeline:
+            print(line)
+        logger.log_system_event("startup_timeline", line.strip())
+
+
 def main() -> None:
     """
     Main function to run the AI assistant.
     """
+    started_at = time.perf_counter()
     print("\nStarting program...")
 
     # Log system startup
@@ -136,10 +179,15 @@ def main() -> None:
     Cache.set_server(config["run_server"])
     logger.log_system_event("cache_initialized", "Cache values loaded and configured")
 
+    startup_services(config)
+
     employer = Employer()
     logger.log_system_event("employer_initialized", "Employer instance created")
 
     start_servers(config, employer)
+    logger.log_system_event(
+        "startup_ready", f"Ready in {time.perf_counter() - started_at:.3f}s"
+    )
 
     if config["audio"]:
         logger.log_system_event("mode_selected", "Speech-to-text mode enabled")
@@ -0,0 +1,451 @@
+import collections
+import hashlib
+import http.server
+import itertools
+import json
+import math
+import re
+import struct
+import threading
+import time
+import typing
+import urllib.parse
+import wave
+
+if typing.TYPE_CHECKING:
+    import speech_recognition as sr
+
+Response = typing.Tuple[int, typing.Any]
+
+
+class StreamedResponse:
+    """Payload sent as newline-delimited JSON objects, `interval` seconds apart"""
+
+    def __init__(self, items: typing.List[typing.Any], interval: float = 0.0) -> None:
+        self.items = items
+        self.interval = interval
+
+
+class FakeServer:
+    """
+    Local HTTP server standing in for an external API, on a free port of 127.0.0.1.
+
+    Subclasses answer requests in `respond` with a status code and a JSON
+    payload (None for an empty body). Every request waits `latency` seconds
+    first, to model the round trip to the real service.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.requests: typing.Counter[str] = collections.Counter()
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, which Nagle's algorithm delays
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def do_PUT(self):
+                server._handle(self, "PUT")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name=type(self).__name__, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handle(self, request: http.server.BaseHTTPRequestHandler, method: str):
+        url = urllib.parse.urlsplit(request.path)
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+
+        with self._lock:
+            self.requests[f"{method} {url.path}"] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        try:
+            status, payload = self.respond(
+                method, url.path.rstrip("/"), urllib.parse.parse_qs(url.query), body
+            )
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+
+        try:
+            self._write(request, status, payload)
+        except ConnectionError:
+            # The client cancelled the request, e.g. after a timeout
+            pass
+
+    def _write(
+        self,
+        request: http.server.BaseHTTPRequestHandler,
+        status: int,
+        payload: typing.Any,
+    ) -> None:
+        if isinstance(payload, StreamedResponse):
+            request.send_response(status)
+            request.send_header("Content-Type", "application/x-ndjson")
+            request.send_header("Transfer-Encoding", "chunked")
+            request.end_headers()
+            for index, item in enumerate(payload.items):
+                if index and payload.interval:
+                    time.sleep(payload.interval)
+                line = json.dumps(item).encode() + b"\n"
+                request.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            request.wfile.write(b"0\r\n\r\n")
+            return
+
+        data = b"" if payload is None else json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def respond(
+        self,
+        method: str,
+        path: str,
+        query: typing.Dict[str, typing.List[str]],
+        body: bytes,
+    ) -> Response:
+        raise NotImplementedError
+
+
+class FakeLLMServer(FakeServer):
+    """
+    Ollama chat API returning deterministic answers.
+
+    When tools are offered, the tool call for the user message is looked up in
+    `tool_calls`; unknown messages call `ask_question` with the message, the
+    way the real models are instructed to. Requests without tools get `answer`,
+    streamed word by word when the request asks for a stream.
+
+    Args:
+        tool_calls: User message -> (tool name, tool arguments)
+        answer: Text answer of requests without tools
+        latency: Seconds every request takes, e.g. 0.5 for a hosted model
+        token_latency: Seconds between the words of a streamed answer
+    """
+
+    def __init__(
+        self,
+        tool_calls: typing.Optional[
+            typing.Dict[str, typing.Tuple[str, typing.Dict[str, typing.Any]]]
+        ] = None,
+        answer: str = "This is a benchmark answer. It is spoken one sentence at a time.",
+        latency: float = 0.0,
+        token_latency: float = 0.0,
+    ) -> None:
+        super().__init__(latency)
+        self.tool_calls = dict(tool_calls or {})
+        self.answer = answer
+        self.token_latency = token_latency
+
+    def respond(self, method, path, query, body) -> Response:
+        if (method, path) != ("POST", "/api/chat"):
+            return 404, {"error": f"{method} {path} not found"}
+
+        request = json.loads(body)
+        user_message = next(
+            (
+                message["content"]
+                for message in reversed(request.get("messages", []))
+                if message.get("role") == "user"
+            ),
+            "",
+        )
+        tools = {tool["function"]["name"] for tool in request.get("tools") or []}
+
+        message: typing.Dict[str, typing.Any] = {"role": "assistant", "content": ""}
+        if tools:
+            name, arguments = self.tool_calls.get(
+                user_message, ("ask_question", {"question": user_message})
+            )
+            if name in tools:
+                message["tool_calls"] = [
+                    {"function": {"name": name, "arguments": arguments}}
+                ]
+        else:
+            message["content"] = self.answer
+
+        response = {
+            "model": request.get("model", ""),
+            "created_at": "2025-01-01T00:00:00Z",
+            "message": message,
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": len(body) // 4,
+            "eval_count": len(json.dumps(message)) // 4,
+        }
+        if not request.get("stream"):
+            return 200, response
+
+        chunks = [
+            {
+                "model": response["model"],
+                "created_at": response["created_at"],
+                "message": {"role": "assistant", "content": word},
+                "done": False,
+            }
+            for word in re.findall(r"\S+\s*", message["content"])
+        ]
+        response["message"] = {**message, "content": ""}
+
+        return 200, StreamedResponse([*chunks, response], self.token_latency)
+
+
+class FakeSpotifyServer(FakeServer):
+    """
+    Spotify Web API and accounts service with a single active device.
+
+    Serves both base URLs: the accounts service at `url` and the Web API at
+    `url + "/v1"`. Playback state and volume change like on a real device.
+    """
+
+    DEVICE_ID = "benchmark-device"
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__(latency)
+        self.is_playing = False
+        self.volume = 50
+
+    def respond(self, method, path, query, body) -> Response:
+        if path == "/api/token":
+            return 200, {
+                "access_token": "benchmark-access-token",
+                "token_type": "Bearer",
+                "expires_in": 3600,
+            }
+
+        if path == "/v1/me/player/devices":
+            return 200, {
+                "devices": [
+                    {
+                        "id": self.DEVICE_ID,
+                        "is_active": True,
+                        "name": "Benchmark",
+                        "volume_percent": self.volume,
+                    }
+                ]
+            }
+
+        if path == "/v1/me/player" and method == "GET":
+            return 200, {
+                "is_playing": self.is_playing,
+                "device": {"id": self.DEVICE_ID, "volume_percent": self.volume},
+            }
+
+        if path == "/v1/search":
+            title = query.get("q", [""])[0]
+            return 200, {
+                "tracks": {
+                    "items": [
+                        {
+                            "uri": "spotify:track:benchmark",
+                            "name": title,
+                            "artists": [{"name": "Benchmark Artist"}],
+                        }
+                    ]
+                }
+            }
+
+        if path.startswith("/v1/albums/"):
+            return 200, {"tracks": {"items": [{"uri": "spotify:track:benchmark"}]}}
+
+        if path.startswith("/v1/me/player/"):
+            action = path.rsplit("/", 1)[-1]
+            if action == "play":
+                self.is_playing = True
+            elif action == "pause":
+                self.is_playing = False
+            elif action == "volume":
+                self.volume = int(query.get("volume_percent", [self.volume])[0])
+
+            return 204, None
+
+        return 404, {"error": {"status": 404, "message": f"{path} not found"}}
+
+
+class FakeWeatherServer(FakeServer):
+    """OpenWeather geocoding and current weather APIs, with fixed conditions"""
+
+    def respond(self, method, path, query, body) -> Response:
+        if path == "/geo/1.0/direct":
+            city = query.get("q", [""])[0]
+            return 200, [{"name": city, "lat": 51.5072, "lon": -0.1276}]
+
+        if path == "/data/2.5/weather":
+            return 200, {
+                "weather": [{"main": "Clear", "description": "clear sky"}],
+                "main": {"temp": 21.5, "humidity": 40},
+            }
+
+        return 404, {"cod": 404, "message": f"{path} not found"}
+
+
+class FakeShellyServer(FakeServer):
+    """Shelly light relay, switched with the `turn` query parameter"""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__(latency)
+        self.is_on = False
+
+    def respond(self, method, path, query, body) -> Response:
+        if path != "/light/0":
+            return 404, None
+
+        if turn := query.get("turn", [None])[0]:
+            self.is_on = turn == "on"
+
+        return 200, {"ison": self.is_on, "brightness": 100}
+
+
+class FakeMessage:
+    """Gmail message with the fields read by the Gmail service"""
+
+    def __init__(self, sender: str, date: str, subject: str) -> None:
+        self.sender = sender
+        self.date = date
+        self.subject = subject
+
+
+class FakeGmailClient:
+    """
+    Replaces `simplegmail.Gmail` with a fixed inbox of unread messages.
+
+    Args:
+        messages: Number of unread messages returned by every query
+        latency: Seconds every query takes
+    """
+
+    def __init__(self, messages: int = 3, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.messages = [
+            FakeMessage(
+                f"Sender {index} <sender{index}@example.com>",
+                f"2025-01-0{index % 9 + 1}T08:30:00",
+                f"Benchmark message {index}",
+            )
+            for index in range(messages)
+        ]
+
+    def get_messages(self, query: str = "", **kwargs) -> typing.List[FakeMessage]:
+        if self.latency:
+            time.sleep(self.latency)
+
+        return list(self.messages)
+
+
+def write_wav_fixture(
+    path: str,
+    duration: float = 1.0,
+    frequency: float = 440.0,
+    sample_rate: int = 16000,
+) -> str:
+    """Writes a mono 16-bit WAV file with a sine tone and returns its path"""
+    frames = b"".join(
+        struct.pack(
+            "<h",
+            int(16000 * math.sin(2 * math.pi * frequency * index / sample_rate)),
+        )
+        for index in range(int(duration * sample_rate))
+    )
+
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(frames)
+
+    return path
+
+
+class WavAudioInput:
+    """
+    Speech input read from WAV fixtures instead of the microphone.
+
+    Each recording reads the whole next fixture in turn through
+    `speech_recognition`, like a recording from the microphone, and is
+    transcribed to the transcript of that fixture.
+
+    Args:
+        fixtures: (WAV file path, transcript) pairs
+        latency: Seconds every transcription takes, like the cloud speech API
+    """
+
+    def __init__(
+        self, fixtures: typing.Sequence[typing.Tuple[str, str]], latency: float = 0.0
+    ) -> None:
+        import speech_recognition as sr
+
+        self.latency = latency
+        self._recognizer = sr.Recognizer()
+        self._fixtures = itertools.cycle([path for path, _ in fixtures])
+        self._lock = threading.Lock()
+        self._transcripts: typing.Dict[str, str] = {}
+
+        for path, transcript in fixtures:
+            self._transcripts[self._fingerprint(self._read(path))] = transcript
+
+    @staticmethod
+    def _fingerprint(audio: "sr.AudioData") -> str:
+        return hashlib.sha1(audio.get_raw_data()).hexdigest()
+
+    def _read(self, path: str) -> "sr.AudioData":
+        import speech_recognition as sr
+
+        with sr.AudioFile(path) as source:
+            return self._recognizer.record(source)
+
+    def record_audio(self, duration: int = 3) -> "sr.AudioData":
+        with self._lock:
+            path = next(self._fixtures)
+
+        return self._read(path)
+
+    def recognize_google_cloud(self, audio_data: "sr.AudioData", **kwargs) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+
+        return self._transcripts.get(self._fingerprint(audio_data), "")
+
+    def install(self) -> None:
+        """Routes `Audio.record_audio` and speech recognition to the fixtures"""
+        from helpers.audio import Audio
+        from helpers.recognizer import Recognizer
+
+        Audio.record_audio = self.record_audio  # type: ignore
+        Recognizer._recognizer = self  # type: ignore
@@ -0,0 +1,463 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks import fakes  # noqa: E402
+
+# Commands the fake LLM answers with a tool call; other commands get ask_question
+LLM_TOOL_CALLS = {
+    "how warm is it in paris right now": ("weather", {"city": "Paris"}),
+    "put on bohemian rhapsody": (
+        "play_songs",
+        {"title": "Bohemian Rhapsody", "artist": ""},
+    ),
+}
+
+# Transcripts of the WAV fixtures played by the speech scenario, with their tone
+SPEECH_FIXTURES = [("toggle the light", 440.0), ("next song", 660.0)]
+
+ROUTING_PATHS = ("direct", "local", "llm", "none")
+
+
+class Scenario:
+    """
+    A command sent through one entry point of the assistant.
+
+    Args:
+        name: Name in the report, "<entry point>.<command>"
+        run: Sends the command once, raising when it failed
+        routing: Routing path every run is expected to take, if any
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: typing.Callable[[], typing.Any],
+        routing: typing.Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.run = run
+        self.routing = routing
+
+
+class FakeBackends:
+    """All fake external services, started together"""
+
+    def __init__(
+        self,
+        llm_latency: float,
+        token_latency: float,
+        http_latency: float,
+        speech_latency: float,
+    ) -> None:
+        self.llm = fakes.FakeLLMServer(
+            LLM_TOOL_CALLS, latency=llm_latency, token_latency=token_latency
+        )
+        self.spotify = fakes.FakeSpotifyServer(latency=http_latency)
+        self.weather = fakes.FakeWeatherServer(latency=http_latency)
+        self.shelly = fakes.FakeShellyServer(latency=http_latency)
+        self.gmail = fakes.FakeGmailClient(latency=http_latency)
+        self.speech_latency = speech_latency
+        self.servers = [self.llm, self.spotify, self.weather, self.shelly]
+
+    def __enter__(self):
+        for server in self.servers:
+            server.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for server in self.servers:
+            server.stop()
+
+    def get_environment(self, workdir: Path) -> typing.Dict[str, str]:
+        """Environment pointing every integration at the fakes"""
+        return {
+            # Empty keys keep .env files from selecting a hosted model
+            "GEMINI_API_KEY": "",
+            "ANTHROPIC_API_KEY": "",
+            "AI_MODEL": "benchmark",
+            "OLLAMA_HOST": self.llm.url,
+            "SPOTIFY_CLIENT_ID": "benchmark",
+            "SPOTIFY_CLIENT_SECRET": "benchmark",
+            "SPOTIFY_API_BASE_URL": f"{self.spotify.url}/v1",
+            "SPOTIFY_ACCOUNTS_BASE_URL": self.spotify.url,
+            "WEATHER_API_KEY": "benchmark",
+            "WEATHER_API_BASE_URL": self.weather.url,
+            "SHELLY_BASE_URL": self.shelly.url,
+            "AI_ASSISTANT_CACHE_BACKEND": "json",
+            "AI_ASSISTANT_CACHE_PATH": str(workdir / "cache.json"),
+            "NO_PROXY": "127.0.0.1,localhost",
+            "no_proxy": "127.0.0.1,localhost",
+        }
+
+
+def _check_response(response) -> None:
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(True)}")
+
+
+def create_scenarios(employer, api_client, button_client) -> typing.List[Scenario]:
+    return [
+        Scenario("employer.direct", lambda: employer.job_on_command("help"), "direct"),
+        Scenario(
+            "employer.local",
+            lambda: employer.job_on_command("turn the light on"),
+            "local",
+        ),
+        Scenario(
+            "employer.llm_weather",
+            lambda: employer.job_on_command("how warm is it in paris right now"),
+            "llm",
+        ),
+        Scenario(
+            "employer.llm_spotify",
+            lambda: employer.job_on_command("put on bohemian rhapsody"),
+            "llm",
+        ),
+        Scenario(
+            "employer.ask_question",
+            lambda: employer.job_on_command("why is the sky blue"),
+            "llm",
+        ),
+        Scenario(
+            "employer.gmail",
+            lambda: employer.job_on_command("check new emails"),
+            "direct",
+        ),
+        Scenario(
+            "api.weather",
+            lambda: _check_response(api_client.post("/weather?city=London")),
+        ),
+        Scenario("api.metrics", lambda: _check_response(api_client.get("/metrics"))),
+        Scenario(
+            "button.next_song",
+            lambda: _check_response(button_client.get("/button-pressed/RIGHT/")),
+        ),
+        Scenario(
+            "button.speak",
+            lambda: _check_response(button_client.get("/button-pressed/A/")),
+        ),
+    ]
+
+
+def _counter_total(counter) -> float:
+    return sum(value for _, _, value in counter.samples())
+
+
+def run_scenario(
+    scenario: Scenario, iterations: int, warmup: int, concurrency: int
+) -> typing.Dict[str, typing.Any]:
+    """
+    Runs the scenario `iterations` times on `concurrency` threads after
+    `warmup` untimed runs.
+
+    Returns:
+        Count, errors, throughput and latency percentiles in milliseconds
+    """
+    from helpers import metrics
+    from helpers.analyze_logs import percentile
+
+    for _ in range(warmup):
+        scenario.run()
+
+    routing_before = {path: metrics.ROUTING.get(path=path) for path in ROUTING_PATHS}
+    job_errors_before = _counter_total(metrics.JOB_ERRORS)
+
+    def timed_run(_) -> typing.Tuple[int, bool]:
+        start_ns = time.perf_counter_ns()
+        try:
+            scenario.run()
+            succeeded = True
+        except Exception:
+            succeeded = False
+
+        return time.perf_counter_ns() - start_ns, succeeded
+
+    start_ns = time.perf_counter_ns()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(timed_run, range(iterations)))
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+
+    durations = [duration_ns / 1e6 for duration_ns, _ in results]
+    routing = {
+        path: int(metrics.ROUTING.get(path=path) - routing_before[path])
+        for path in ROUTING_PATHS
+    }
+    errors = sum(not succeeded for _, succeeded in results) + int(
+        _counter_total(metrics.JOB_ERRORS) - job_errors_before
+    )
+
+    return {
+        "count": iterations,
+        "errors": errors,
+        "throughput": iterations / elapsed if elapsed else 0.0,
+        "mean_ms": sum(durations) / len(durations),
+        "min_ms": min(durations),
+        "p50_ms": percentile(durations, 50),
+        "p90_ms": percentile(durations, 90),
+        "p99_ms": percentile(durations, 99),
+        "max_ms": max(durations),
+        "routing": {path: count for path, count in routing.items() if count},
+        "expected_routing": scenario.routing,
+    }
+
+
+def format_results(results: typing.Dict[str, typing.Any]) -> str:
+    lines = [
+        f"{'scenario':<24} {'count':>6} {'errors':>6} {'ops/s':>9} "
+        f"{'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)"
+    ]
+    for name, stats in results["scenarios"].items():
+        lines.append(
+            f"{name:<24} {stats['count']:>6} {stats['errors']:>6} "
+            f"{stats['throughput']:>9.1f} {stats['mean_ms']:>9.2f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}"
+        )
+
+        expected = stats["expected_routing"]
+        if expected and stats["routing"] != {expected: stats["count"]}:
+            lines.append(
+                f"  warning: expected every command to be routed {expected}, "
+                f"got {stats['routing']}"
+            )
+
+    return "\n".join(lines)
+
+
+def compare_results(
+    baseline: typing.Dict[str, typing.Any], results: typing.Dict[str, typing.Any]
+) -> str:
+    """Change of throughput and latency percentiles against a baseline run"""
+
+    def change(before: float, after: float) -> str:
+        if not before:
+            return f"{'n/a':>9}"
+        return f"{(after - before) / before:>+9.1%}"
+
+    lines = [
+        f"{'scenario':<24} {'ops/s':>9} {'p50':>9} {'p90':>9} {'p99':>9}",
+    ]
+    for name, stats in results["scenarios"].items():
+        if (before := baseline.get("scenarios", {}).get(name)) is None:
+            lines.append(f"{name:<24} not in baseline")
+            continue
+
+        lines.append(
+            f"{name:<24} "
+            + " ".join(
+                change(before[key], stats[key])
+                for key in ("throughput", "p50_ms", "p90_ms", "p99_ms")
+            )
+        )
+
+    return "\n".join(lines)
+
+
+def _get_commit() -> typing.Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    with tempfile.TemporaryDirectory(
+        prefix="ai_assistant_benchmark_"
+    ) as workdir, FakeBackends(
+        args.llm_latency / 1000,
+        args.token_latency / 1000,
+        args.http_latency / 1000,
+        args.speech_latency / 1000,
+    ) as backends:
+        workdir_path = Path(workdir)
+        os.environ.update(backends.get_environment(workdir_path))
+
+        # Logs and the cache are written to the temporary directory
+        previous_cwd = os.getcwd()
+        os.chdir(workdir_path)
+
+        output = sys.stdout if args.verbose else open(os.devnull, "w")
+        try:
+            with contextlib.redirect_stdout(output):
+                return _run_benchmarks(args, backends, workdir_path)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+            os.chdir(previous_cwd)
+
+
+def _run_benchmarks(
+    args: argparse.Namespace, backends: FakeBackends, workdir: Path
+) -> typing.Dict[str, typing.Any]:
+    # Imported after the environment points at the fakes
+    from helpers.cache import Cache
+    from helpers.logger import logger
+    from helpers.registry import ServiceRegistry
+    from modules.employer import Employer
+    from modules.gmail import Gmail
+    from modules.spotify import Spotify
+    from servers import api, button
+
+    Cache.set_local(True)
+    Cache.set_audio(False)
+    Cache.set_value(Spotify.SPOTIFY_OAUTH_ACCESS_KEY, "benchmark-access-token")
+    Cache.set_value(Spotify.SPOTIFY_OAUTH_REFRESH_KEY, "benchmark-refresh-token")
+    Cache.set_value(
+        Spotify.SPOTIFY_OAUTH_EXPIRATION_DATE,
+        (datetime.datetime.now() + datetime.timedelta(days=1)).isoformat(),
+    )
+
+    gmail = Gmail.__new__(Gmail)
+    gmail._gmail_instance = backends.gmail
+    ServiceRegistry.set_service_instance("gmail", gmail)
+
+    fakes.WavAudioInput(
+        [
+            (
+                fakes.write_wav_fixture(
+                    str(workdir / f"fixture_{index}.wav"), frequency=frequency
+                ),
+                transcript,
+            )
+            for index, (transcript, frequency) in enumerate(SPEECH_FIXTURES)
+        ],
+        latency=backends.speech_latency,
+    ).install()
+
+    employer = Employer()
+    api.employer = employer
+    button.employer = employer
+
+    scenarios = create_scenarios(
+        employer, api.app.test_client(), button.app.test_client()
+    )
+    if args.scenarios:
+        scenarios = [
+            scenario
+            for scenario in scenarios
+            if any(pattern in scenario.name for pattern in args.scenarios)
+        ]
+
+    results: typing.Dict[str, typing.Any] = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency,
+            "token_latency_ms": args.token_latency,
+            "http_latency_ms": args.http_latency,
+            "speech_latency_ms": args.speech_latency,
+        },
+        "scenarios": {},
+    }
+
+    try:
+        for scenario in scenarios:
+            print(f"Running {scenario.name}...", file=sys.stderr)
+            results["scenarios"][scenario.name] = run_scenario(
+                scenario, args.iterations, args.warmup, args.concurrency
+            )
+    finally:
+        results["requests"] = {
+            type(server).__name__: dict(server.requests) for server in backends.servers
+        }
+        Cache.flush()
+        logger.shutdown()
+
+    return results
+
+
+def main(argv: typing.Optional[typing.Iterable[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the AI Assistant command path against local fake services"
+    )
+    parser.add_argument(
+        "--iterations", "-n", type=int, default=50, help="Runs of every scenario"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=3, help="Untimed runs before every scenario"
+    )
+    parser.add_argument(
+        "--concurrency", "-c", type=int, default=1, help="Threads sending commands"
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0,
+        help="Milliseconds every model request takes (default: 0)",
+    )
+    parser.add_argument(
+        "--token-latency",
+        type=float,
+        default=0,
+        help="Milliseconds between the words of streamed model answers (default: 0)",
+    )
+    parser.add_argument(
+        "--http-latency",
+        type=float,
+        default=0,
+        help="Milliseconds every Spotify, OpenWeather, Shelly and Gmail request takes",
+    )
+    parser.add_argument(
+        "--speech-latency",
+        type=float,
+        default=0,
+        help="Milliseconds every speech transcription takes",
+    )
+    parser.add_argument(
+        "--scenarios",
+        "-s",
+        nargs="+",
+        help="Only run scenarios whose name contains one of these strings",
+    )
+    parser.add_argument("--output", "-o", type=str, help="Save the results as JSON")
+    parser.add_argument(
+        "--compare", type=str, help="JSON results of an earlier run to compare with"
+    )
+    parser.add_argument(
+        "--verbose", "-v", action="store_true", help="Show the assistant's output"
+    )
+
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        print(f"\nChange against {args.compare} (commit {baseline.get('commit')}):")
+        print(compare_results(baseline, results))
+
+
+if __name__ == "__main__":
+    main()
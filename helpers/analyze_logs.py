@@ -1,106 +1,393 @@
 import argparse
-import csv
-from collections import Counter, defaultdict
+import random
+import sys
+from collections import Counter, deque
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from helpers.events import (  # noqa: E402
+    EventType,
+    find_event_logs,
+    format_timestamp,
+    is_job_error,
+    read_events,
+)
+
+Event = Dict[str, Any]
+
+# Durations kept per stage or job to estimate latency percentiles from
+LATENCY_SAMPLE_SIZE = 2048
+
+
+class Aggregator:
+    """
+    Consumes events one at a time and keeps a bounded summary of them.
+
+    Args:
+        where: Optional predicate selecting the events to aggregate
+    """
+
+    def __init__(self, where: Optional[Callable[[Event], bool]] = None):
+        self.where = where
+
+    def add(self, event: Event) -> None:
+        if self.where is None or self.where(event):
+            self.update(event)
+
+    def update(self, event: Event) -> None:
+        raise NotImplementedError
+
+    def result(self) -> Any:
+        raise NotImplementedError
+
+
+class CountAggregator(Aggregator):
+    """Counts events, optionally per key"""
+
+    def __init__(
+        self,
+        key: Optional[Callable[[Event], Optional[Hashable]]] = None,
+        where: Optional[Callable[[Event], bool]] = None,
+    ):
+        super().__init__(where)
+        self.key = key
+        self.total = 0
+        self.counts: Counter = Counter()
+
+    def update(self, event: Event) -> None:
+        self.total += 1
+        if self.key is not None and (key := self.key(event)) is not None:
+            self.counts[key] += 1
+
+    def result(self) -> Any:
+        return self.counts if self.key is not None else self.total
+
+
+class TopKAggregator(Aggregator):
+    """
+    Approximate most frequent keys with the Space-Saving algorithm.
+
+    Memory is bounded by `capacity` keys; counts are exact as long as there are
+    fewer distinct keys than that, otherwise they are upper bounds.
+    """
+
+    def __init__(
+        self,
+        key: Callable[[Event], Optional[Hashable]],
+        k: int = 10,
+        capacity: Optional[int] = None,
+        where: Optional[Callable[[Event], bool]] = None,
+    ):
+        super().__init__(where)
+        self.key = key
+        self.k = k
+        self.capacity = capacity or k * 10
+        self.counts: Dict[Hashable, int] = {}
+
+    def update(self, event: Event) -> None:
+        if (key := self.key(event)) is None:
+            return
+
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+        else:
+            # Replace the least frequent key, inheriting its count
+            smallest = min(self.counts, key=self.counts.__getitem__)
+            self.counts[key] = self.counts.pop(smallest) + 1
+
+    def result(self) -> List[tuple]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[
+            : self.k
+        ]
+
+
+class ReservoirAggregator(Aggregator):
+    """Uniform random sample of `size` values over all events"""
+
+    def __init__(
+        self,
+        value: Callable[[Event], Any],
+        size: int = 5,
+        where: Optional[Callable[[Event], bool]] = None,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(where)
+        self.value = value
+        self.size = size
+        self.seen = 0
+        self.sample: List[Any] = []
+        self._random = random.Random(seed)
+
+    def update(self, event: Event) -> None:
+        self.seen += 1
+        if len(self.sample) < self.size:
+            self.sample.append(self.value(event))
+        elif (index := self._random.randrange(self.seen)) < self.size:
+            self.sample[index] = self.value(event)
+
+    def result(self) -> List[Any]:
+        return list(self.sample)
+
+
+class RingBufferAggregator(Aggregator):
+    """Last `size` values, oldest first"""
+
+    def __init__(
+        self,
+        value: Callable[[Event], Any],
+        size: int = 5,
+        where: Optional[Callable[[Event], bool]] = None,
+    ):
+        super().__init__(where)
+        self.value = value
+        self.buffer: deque = deque(maxlen=size)
+
+    def update(self, event: Event) -> None:
+        self.buffer.append(self.value(event))
+
+    def result(self) -> List[Any]:
+        return list(self.buffer)
+
+
+class GroupAggregator(Aggregator):
+    """Runs a separate set of aggregators for every key"""
+
+    def __init__(
+        self,
+        key: Callable[[Event], Optional[Hashable]],
+        factory: Callable[[], Dict[str, Aggregator]],
+        where: Optional[Callable[[Event], bool]] = None,
+    ):
+        super().__init__(where)
+        self.key = key
+        self.factory = factory
+        self.groups: Dict[Hashable, Dict[str, Aggregator]] = {}
+
+    def update(self, event: Event) -> None:
+        if (key := self.key(event)) is None:
+            return
+
+        if (group := self.groups.get(key)) is None:
+            group = self.groups[key] = self.factory()
+
+        for aggregator in group.values():
+            aggregator.add(event)
+
+    def result(self) -> Dict[Hashable, Dict[str, Any]]:
+        return {
+            key: {name: aggregator.result() for name, aggregator in group.items()}
+            for key, group in self.groups.items()
+        }
+
+
+def run_aggregators(
+    events: Iterable[Event], aggregators: Dict[str, Aggregator]
+) -> Dict[str, Any]:
+    """Feeds every event to every aggregator in a single pass"""
+    aggregator_list = list(aggregators.values())
+    for event in events:
+        for aggregator in aggregator_list:
+            aggregator.add(event)
 
-def get_latest_log_files(logs_dir: Path) -> Tuple[Path, Path]:
-    """Get the most recent log and CSV files"""
-    log_files = list(logs_dir.glob("ai_assistant_*.log"))
-    csv_files = list(logs_dir.glob("ai_assistant_*.csv"))
+    return {name: aggregator.result() for name, aggregator in aggregators.items()}
 
-    if not log_files or not csv_files:
-        raise FileNotFoundError("No log files found in the logs directory")
 
-    latest_log = max(log_files, key=lambda f: f.stat().st_mtime)
-    latest_csv = max(csv_files, key=lambda f: f.stat().st_mtime)
+def iter_events(files: Iterable[Path]) -> Iterator[Event]:
+    """Streams events of several log segments in order"""
+    for file in files:
+        yield from read_events(file)
 
-    return latest_log, latest_csv
 
+class _TimeBoundAggregator(Aggregator):
+    """Earliest or latest event timestamp"""
 
-def analyze_user_interactions(csv_file: Path) -> Dict:
-    """Analyze user interaction patterns from CSV logs"""
-    interactions = {
-        "total_inputs": 0,
-        "text_inputs": 0,
-        "speech_inputs": 0,
-        "functions_called": Counter(),
-        "input_timeline": [],
-        "response_times": [],
+    def __init__(self, pick: Callable[[int, int], int]):
+        super().__init__()
+        self.pick = pick
+        self.value: Optional[int] = None
+
+    def update(self, event: Event) -> None:
+        ts_ns = event["ts_ns"]
+        self.value = ts_ns if self.value is None else self.pick(self.value, ts_ns)
+
+    def result(self) -> Optional[int]:
+        return self.value
+
+
+def _is_event(event_type: EventType) -> Callable[[Event], bool]:
+    return lambda event: event["event"] == event_type
+
+
+def _is_input(input_type: str) -> Callable[[Event], bool]:
+    return lambda event: event["name"] == f"user_input_{input_type}"
+
+
+def _input_entry(event: Event) -> tuple:
+    return (
+        format_timestamp(event["ts_ns"]),
+        event["name"].removeprefix("user_input_"),
+        event["user_input"],
+    )
+
+
+def _error_entry(event: Event) -> Dict[str, str]:
+    return {
+        "timestamp": format_timestamp(event["ts_ns"]),
+        "context": event["job"],
+        "message": event["response"],
     }
 
-    with open(csv_file, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            log_name = row["Log Name"]
-            timestamp = row["Timestamp"]
-            user_input = row["User Input"]
-            function_called = row["Function Called"]
-
-            if log_name == "user_input_text":
-                interactions["total_inputs"] += 1
-                interactions["text_inputs"] += 1
-                interactions["input_timeline"].append((timestamp, "text", user_input))
-            elif log_name == "user_input_speech":
-                interactions["total_inputs"] += 1
-                interactions["speech_inputs"] += 1
-                interactions["input_timeline"].append((timestamp, "speech", user_input))
-            elif log_name == "function_called" and function_called:
-                interactions["functions_called"][function_called] += 1
-
-    return interactions
-
-
-def analyze_function_usage(csv_file: Path) -> Dict[str, Dict[str, Any]]:
-    """Analyze function call patterns"""
-    function_stats: Dict[str, Dict[str, Any]] = defaultdict(
-        lambda: {"calls": 0, "success": 0, "errors": 0, "responses": []}
+
+def _has_duration(event: Event) -> bool:
+    return event["duration_ns"] is not None
+
+
+def _latency_aggregators() -> Dict[str, Aggregator]:
+    return {
+        "count": CountAggregator(),
+        "durations": ReservoirAggregator(
+            lambda event: event["duration_ns"], LATENCY_SAMPLE_SIZE
+        ),
+    }
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile of the values, None when there are none"""
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = max(int(-(-percent * len(values) // 100)), 1)
+    return values[rank - 1]
+
+
+def create_report_aggregators() -> Dict[str, Aggregator]:
+    """Aggregators collecting everything the summary report shows"""
+    return {
+        "inputs": CountAggregator(where=_is_event(EventType.USER_INPUT)),
+        "text_inputs": CountAggregator(where=_is_input("text")),
+        "speech_inputs": CountAggregator(where=_is_input("speech")),
+        "recent_inputs": RingBufferAggregator(
+            _input_entry, 5, _is_event(EventType.USER_INPUT)
+        ),
+        "functions": GroupAggregator(
+            lambda event: event["job"] or None,
+            lambda: {
+                "calls": CountAggregator(where=_is_event(EventType.FUNCTION_CALLED)),
+                "success": CountAggregator(
+                    where=_is_event(EventType.FUNCTION_RESPONSE)
+                ),
+                "errors": CountAggregator(where=is_job_error),
+                "responses": ReservoirAggregator(
+                    lambda event: event["response"][:100],
+                    3,
+                    lambda event: event["event"] == EventType.FUNCTION_RESPONSE
+                    and bool(event["response"]),
+                ),
+            },
+            lambda event: event["event"]
+            in (
+                EventType.FUNCTION_CALLED,
+                EventType.FUNCTION_RESPONSE,
+                EventType.ERROR,
+            ),
+        ),
+        "errors": CountAggregator(where=_is_event(EventType.ERROR)),
+        "error_jobs": TopKAggregator(
+            lambda event: event["job"] or None, 5, where=is_job_error
+        ),
+        "error_contexts": TopKAggregator(
+            lambda event: event["job"] or None,
+            5,
+            where=lambda event: event["event"] == EventType.ERROR
+            and not is_job_error(event),
+        ),
+        "recent_errors": RingBufferAggregator(
+            _error_entry, 5, _is_event(EventType.ERROR)
+        ),
+        "stage_latency": GroupAggregator(
+            lambda event: event["name"],
+            _latency_aggregators,
+            lambda event: event["event"] == EventType.TIMING and _has_duration(event),
+        ),
+        "job_latency": GroupAggregator(
+            lambda event: event["job"] or None,
+            _latency_aggregators,
+            lambda event: event["event"] == EventType.FUNCTION_RESPONSE
+            and _has_duration(event),
+        ),
+        "first_ts_ns": _TimeBoundAggregator(min),
+        "last_ts_ns": _TimeBoundAggregator(max),
+    }
+
+
+def analyze_events(events: Iterable[Event]) -> Dict[str, Any]:
+    """Analyzes events in one streaming pass with constant memory"""
+    return run_aggregators(events, create_report_aggregators())
+
+
+def analyze_user_interactions(events_file: Path) -> Dict:
+    """Analyze user interaction patterns from event logs"""
+    results = run_aggregators(
+        read_events(events_file),
+        {
+            name: aggregator
+            for name, aggregator in create_report_aggregators().items()
+            if "inputs" in name
+        },
     )
 
-    with open(csv_file, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            log_name = row["Log Name"]
-            function_called = row["Function Called"]
-            function_response = row["Function Response"]
-
-            if log_name == "function_called" and function_called:
-                function_stats[function_called]["calls"] += 1
-            elif log_name == "function_response" and function_called:
-                function_stats[function_called]["success"] += 1
-                if function_response:
-                    function_stats[function_called]["responses"].append(
-                        function_response[:100]
-                    )
-            elif log_name == "error" and function_called:
-                function_stats[function_called]["errors"] += 1
-
-    return dict(function_stats)
-
-
-def analyze_errors(csv_file: Path) -> List[Dict]:
-    """Analyze error patterns"""
-    errors = []
-
-    with open(csv_file, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row["Log Name"] == "error":
-                errors.append(
-                    {
-                        "timestamp": row["Timestamp"],
-                        "context": row["Function Called"],
-                        "message": row["Function Response"],
-                    }
-                )
-
-    return errors
-
-
-def generate_summary_report(logs_dir: Optional[Path] = None) -> str:
-    """Generate a comprehensive summary report"""
+    return {
+        "total_inputs": results["inputs"],
+        "text_inputs": results["text_inputs"],
+        "speech_inputs": results["speech_inputs"],
+        "input_timeline": results["recent_inputs"],
+    }
+
+
+def analyze_function_usage(events_file: Path) -> Dict[str, Dict[str, Any]]:
+    """Analyze function call patterns"""
+    return run_aggregators(
+        read_events(events_file),
+        {"functions": create_report_aggregators()["functions"]},
+    )["functions"]
+
+
+def analyze_errors(events_file: Path) -> List[Dict]:
+    """Analyze error patterns, returning the most recent errors"""
+    return run_aggregators(
+        read_events(events_file),
+        {"recent_errors": create_report_aggregators()["recent_errors"]},
+    )["recent_errors"]
+
+
+def _parse_time(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+
+    return int(datetime.fromisoformat(value).timestamp() * 1e9)
+
+
+def generate_summary_report(
+    logs_dir: Optional[Path] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    latest_only: bool = False,
+) -> str:
+    """
+    Generate a comprehensive summary report
+
+    Args:
+        logs_dir: Directory with the log segments (default: logs)
+        since: Only include events at or after this ISO date/time
+        until: Only include events at or before this ISO date/time
+        latest_only: Only analyze the most recent segment
+    """
     if logs_dir is None:
         logs_dir = Path("logs")
 
@@ -108,38 +395,58 @@ def generate_summary_report(logs_dir: Optional[Path] = None) -> str:
         return "No logs directory found. Run the AI Assistant first to generate logs."
 
     try:
-        latest_log, latest_csv = get_latest_log_files(logs_dir)
-    except FileNotFoundError as e:
-        return str(e)
+        start_ns, end_ns = _parse_time(since), _parse_time(until)
+    except ValueError as e:
+        return f"Invalid time range: {e}"
+
+    files = find_event_logs(logs_dir, start_ns, end_ns)
+    if latest_only:
+        files = files[-1:]
+
+    if not files:
+        return "No log files found in the logs directory"
+
+    events = iter_events(files)
+    if start_ns is not None or end_ns is not None:
+        events = (
+            event
+            for event in events
+            if (start_ns is None or event["ts_ns"] >= start_ns)
+            and (end_ns is None or event["ts_ns"] <= end_ns)
+        )
 
     # Analyze the data
-    interactions = analyze_user_interactions(latest_csv)
-    functions = analyze_function_usage(latest_csv)
-    errors = analyze_errors(latest_csv)
+    results = analyze_events(events)
+    functions = results["functions"]
 
     # Generate report
     report = []
     report.append("=" * 60)
     report.append("AI ASSISTANT LOG ANALYSIS REPORT")
     report.append("=" * 60)
-    report.append(f"Analysis of: {latest_csv.name}")
+    if len(files) == 1:
+        report.append(f"Analysis of: {files[0].name}")
+    else:
+        report.append(f"Analysis of: {len(files)} segments")
+    if results["first_ts_ns"] is not None:
+        report.append(
+            f"Time range: {format_timestamp(results['first_ts_ns'])} - "
+            f"{format_timestamp(results['last_ts_ns'])}"
+        )
     report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     report.append("")
 
     # User Interaction Summary
+    total_inputs = results["inputs"]
     report.append("USER INTERACTION SUMMARY")
     report.append("-" * 30)
-    report.append(f"Total User Inputs: {interactions['total_inputs']}")
-    report.append(f"  - Text Inputs: {interactions['text_inputs']}")
-    report.append(f"  - Speech Inputs: {interactions['speech_inputs']}")
-
-    if interactions["total_inputs"] > 0:
-        text_percentage = (
-            interactions["text_inputs"] / interactions["total_inputs"]
-        ) * 100
-        speech_percentage = (
-            interactions["speech_inputs"] / interactions["total_inputs"]
-        ) * 100
+    report.append(f"Total User Inputs: {total_inputs}")
+    report.append(f"  - Text Inputs: {results['text_inputs']}")
+    report.append(f"  - Speech Inputs: {results['speech_inputs']}")
+
+    if total_inputs > 0:
+        text_percentage = (results["text_inputs"] / total_inputs) * 100
+        speech_percentage = (results["speech_inputs"] / total_inputs) * 100
         report.append(
             f"  - Text: {text_percentage:.1f}%, Speech: {speech_percentage:.1f}%"
         )
@@ -148,16 +455,20 @@ def generate_summary_report(logs_dir: Optional[Path] = None) -> str:
     # Function Usage Summary
     report.append("FUNCTION USAGE SUMMARY")
     report.append("-" * 30)
-    if functions:
+    called_functions = {
+        func: stats for func, stats in functions.items() if stats["calls"] > 0
+    }
+    if called_functions:
         report.append("Most Called Functions:")
         for func, stats in sorted(
-            functions.items(), key=lambda x: x[1]["calls"], reverse=True
+            called_functions.items(), key=lambda x: x[1]["calls"], reverse=True
         )[:10]:
-            success_rate = (
-                (stats["success"] / stats["calls"] * 100) if stats["calls"] > 0 else 0
-            )
+            # Jobs wrapped by capture_response log a response also when they fail
+            successful = max(min(stats["success"], stats["calls"] - stats["errors"]), 0)
+            success_rate = successful / stats["calls"] * 100
             report.append(
-                f"  - {func}: {stats['calls']} calls, {success_rate:.1f}% success rate"
+                f"  - {func}: {stats['calls']} calls, {success_rate:.1f}% success rate, "
+                f"{stats['errors']} errors"
             )
     else:
         report.append("No function calls recorded.")
@@ -166,29 +477,57 @@ def generate_summary_report(logs_dir: Optional[Path] = None) -> str:
     # Error Summary
     report.append("ERROR SUMMARY")
     report.append("-" * 30)
-    if errors:
-        report.append(f"Total Errors: {len(errors)}")
-        error_contexts = Counter(
-            error["context"] for error in errors if error["context"]
-        )
-        if error_contexts:
-            report.append("Errors by Context:")
-            for context, count in error_contexts.most_common(5):
+    if results["errors"]:
+        report.append(f"Total Errors: {results['errors']}")
+        if results["error_jobs"]:
+            report.append("Errors by Job:")
+            for job, count in results["error_jobs"]:
+                report.append(f"  - {job}: {count} errors")
+        if results["error_contexts"]:
+            report.append("Other Errors by Context:")
+            for context, count in results["error_contexts"]:
                 report.append(f"  - {context}: {count} errors")
 
         report.append("\nRecent Errors:")
-        for error in errors[-5:]:  # Last 5 errors
+        for error in results["recent_errors"]:
             report.append(f"  - {error['timestamp']}: {error['message'][:50]}...")
     else:
         report.append("No errors recorded.")
     report.append("")
 
+    # Latency
+    report.append("LATENCY (ms)")
+    report.append("-" * 30)
+    for title, latencies in (
+        ("By stage:", results["stage_latency"]),
+        ("By job:", results["job_latency"]),
+    ):
+        if not latencies:
+            continue
+
+        report.append(title)
+        report.append(f"  {'':<28} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8}")
+        for name, stats in sorted(
+            latencies.items(), key=lambda item: item[1]["count"], reverse=True
+        ):
+            durations = stats["durations"]
+            p50, p90, p99 = (
+                percentile(durations, percent) / 1e6 for percent in (50, 90, 99)
+            )
+            report.append(
+                f"  {str(name)[:28]:<28} {stats['count']:>6} "
+                f"{p50:>8.1f} {p90:>8.1f} {p99:>8.1f}"
+            )
+    if not results["stage_latency"] and not results["job_latency"]:
+        report.append("No timings recorded.")
+    report.append("")
+
     # Recent Activity
     report.append("RECENT ACTIVITY")
     report.append("-" * 30)
-    if interactions["input_timeline"]:
+    if results["recent_inputs"]:
         report.append("Last 5 User Inputs:")
-        for timestamp, input_type, user_input in interactions["input_timeline"][-5:]:
+        for timestamp, input_type, user_input in results["recent_inputs"]:
             report.append(f"  - {timestamp} ({input_type}): {user_input[:50]}...")
     report.append("")
 
@@ -206,6 +545,17 @@ def main():
         default="logs",
         help="Path to logs directory (default: logs)",
     )
+    parser.add_argument(
+        "--since", type=str, help="Only include events since this ISO date/time"
+    )
+    parser.add_argument(
+        "--until", type=str, help="Only include events until this ISO date/time"
+    )
+    parser.add_argument(
+        "--latest",
+        action="store_true",
+        help="Only analyze the most recent log segment",
+    )
     parser.add_argument(
         "--output", "-o", type=str, help="Save report to file instead of printing"
     )
@@ -213,7 +563,7 @@ def main():
     args = parser.parse_args()
 
     logs_dir = Path(args.logs_dir)
-    report = generate_summary_report(logs_dir)
+    report = generate_summary_report(logs_dir, args.since, args.until, args.latest)
 
     if args.output:
         with open(args.output, "w", encoding="utf-8") as f:
@@ -225,4 +575,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-    main()
@@ -1,9 +1,20 @@
 import os
+import queue
+import re
+import threading
+import time
+import typing
 
 import playsound
 import pyttsx3
 import speech_recognition as sr
 
+from helpers import tracing
+from helpers.decorators import timed
+
+# End of a sentence: punctuation followed by whitespace, or a line break
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
 
 class TTS_Engine:
     def __init__(self) -> None:
@@ -23,7 +34,8 @@ class TTS_Engine:
 
 
 class Audio:
-    _microphone = sr.Microphone()
+    # Created on the first recording, so machines without a microphone can import this
+    _microphone: typing.Optional[sr.Microphone] = None
     _recognizer = sr.Recognizer()
 
     @staticmethod
@@ -43,6 +55,7 @@ class Audio:
 
         del tts_engine
 
+    @timed("text_to_speech")
     @staticmethod
     def text_to_speech(text: str) -> None:
         tts_engine = TTS_Engine()
@@ -55,7 +68,97 @@ class Audio:
     def record_audio(duration: int = 3) -> sr.AudioData:
         Audio.play_audio_from_file("voice/bot/listening.wav")
 
+        if Audio._microphone is None:
+            Audio._microphone = sr.Microphone()
+
         with Audio._microphone as source:  # type: ignore
             audio = Audio._recognizer.record(source, duration=duration)
 
             return audio
+
+
+class SpokenText(str):
+    """Answer that was already spoken while it was generated, so it is only printed"""
+
+
+def split_sentences(text: str) -> typing.Tuple[typing.List[str], str]:
+    """Splits text into its complete sentences and the incomplete rest"""
+    *sentences, rest = _SENTENCE_BOUNDARY.split(text)
+    return [sentence.strip() for sentence in sentences if sentence.strip()], rest
+
+
+class SpeechStream:
+    """
+    Speaks text as it is generated, one sentence at a time, on a worker thread.
+
+    Text deltas passed to `feed` are split into sentences and every complete
+    sentence is queued right away, so the first sentence is spoken while the
+    rest of the answer is still being generated. The time until the first
+    sentence starts is logged as the "time_to_first_audio" timing event.
+
+    Usage:
+        with SpeechStream() as speech:
+            for delta in event_loop.iterate_sync(router.stream_message(question)):
+                speech.feed(delta)
+    """
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[typing.Optional[typing.Tuple[str, bool]]]" = (
+            queue.Queue()
+        )
+        self._buffer = ""
+        self._start_ns = time.perf_counter_ns()
+        self._thread = threading.Thread(
+            target=tracing.bind_context(self._run), name="speech-stream", daemon=True
+        )
+        self._thread.start()
+
+    def say(self, text: str) -> None:
+        """Queues an announcement that is not part of the answer"""
+        self._queue.put((text, False))
+
+    def feed(self, delta: str) -> None:
+        """Adds generated text, queuing every sentence it completes"""
+        sentences, self._buffer = split_sentences(self._buffer + delta)
+        for sentence in sentences:
+            self._queue.put((sentence, True))
+
+    def close(self) -> None:
+        """Queues the rest of the text and waits until everything was spoken"""
+        if self._buffer.strip():
+            self._queue.put((self._buffer.strip(), True))
+        self._buffer = ""
+
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> "SpeechStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        from helpers.logger import logger
+
+        try:
+            # pyttsx3 engines must be used on the thread that created them
+            tts_engine = TTS_Engine()
+        except Exception as e:
+            print(f"Error starting text to speech: {e}")
+            return
+
+        answer_started = False
+        while (item := self._queue.get()) is not None:
+            text, is_answer = item
+            if is_answer and not answer_started:
+                answer_started = True
+                logger.log_timing(
+                    "time_to_first_audio", time.perf_counter_ns() - self._start_ns
+                )
+
+            try:
+                with tracing.start_span("text_to_speech", characters=len(text)):
+                    tts_engine.text_to_speech(text)
+            except Exception as e:
+                print(f"Error speaking text: {e}")
@@ -1,45 +1,542 @@
+import atexit
+import contextlib
+import copy
 import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
 import typing
 
+import dotenv
+
+cache_backends = ["json", "sqlite"]
+
+DEFAULT_NAMESPACE = "default"
+
+_NAMESPACE_PATTERN = re.compile(r"^\w+$")
+
+_MISSING = object()
+
+
+def _validate_namespace(namespace: str) -> str:
+    if not _NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(
+            f"Invalid cache namespace '{namespace}': use letters, digits and underscores"
+        )
+
+    return namespace
+
+
+def _get_expires_at(ttl: typing.Optional[float]) -> typing.Optional[float]:
+    return time.time() + ttl if ttl is not None else None
+
+
+class JSONCacheBackend:
+    """
+    Stores all values in a single JSON file, kept in memory.
+
+    Values are updated in memory under a lock and written to disk behind the
+    caller: writes within the flush delay are coalesced into a single atomic
+    rewrite of the file. Values of the default namespace are stored at the top
+    level of the file; other namespaces and expiry times under reserved keys.
+    """
+
+    _NAMESPACES_KEY = "__namespaces__"
+    _EXPIRES_KEY = "__expires__"
+
+    def __init__(self, filename: str = "cache.json", flush_delay: float = 0.5) -> None:
+        self.filename = filename
+        self.flush_delay = flush_delay
+        self._values: typing.Dict[str, typing.Any] = {}
+        self._loaded = False
+        self._dirty = False
+        self._flush_timer: typing.Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+
+    def load(self) -> None:
+        with self._lock:
+            try:
+                with open(self.filename, "r") as file:
+                    self._values = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._values = {}
+                self._write_file({})
+
+            self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def _get_namespace(
+        self, namespace: str, create: bool = False
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        if namespace == DEFAULT_NAMESPACE:
+            return self._values
+
+        namespaces = self._values.get(self._NAMESPACES_KEY)
+        if namespaces is None:
+            if not create:
+                return None
+            namespaces = self._values[self._NAMESPACES_KEY] = {}
+
+        if namespace not in namespaces and create:
+            namespaces[namespace] = {}
+
+        return namespaces.get(namespace)
+
+    def _is_expired(self, key: str, namespace: str) -> bool:
+        expires_at = self._values.get(self._EXPIRES_KEY, {}).get(namespace, {}).get(key)
+        return expires_at is not None and expires_at <= time.time()
+
+    def _set_expiry(
+        self, key: str, namespace: str, expires_at: typing.Optional[float]
+    ) -> None:
+        expires = self._values.get(self._EXPIRES_KEY, {})
+
+        if expires_at is None:
+            if key in expires.get(namespace, {}):
+                del expires[namespace][key]
+                if not expires[namespace]:
+                    del expires[namespace]
+            if not expires:
+                self._values.pop(self._EXPIRES_KEY, None)
+            return
+
+        self._values.setdefault(self._EXPIRES_KEY, {}).setdefault(namespace, {})[
+            key
+        ] = expires_at
+
+    def get(self, key: str, default: typing.Any, namespace: str) -> typing.Any:
+        with self._lock:
+            self._ensure_loaded()
+
+            values = self._get_namespace(namespace)
+            if values is None or key not in values:
+                return default
+
+            if self._is_expired(key, namespace):
+                self._delete(key, namespace)
+                return default
+
+            return values[key]
+
+    def get_with_expiry(
+        self, key: str, namespace: str
+    ) -> typing.Optional[typing.Tuple[typing.Any, typing.Optional[float]]]:
+        with self._lock:
+            if (value := self.get(key, _MISSING, namespace)) is _MISSING:
+                return None
+
+            expires = self._values.get(self._EXPIRES_KEY, {})
+            return value, expires.get(namespace, {}).get(key)
+
+    def get_all(self, namespace: str) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            self._ensure_loaded()
+
+            values = self._get_namespace(namespace) or {}
+            return {
+                key: value
+                for key, value in values.items()
+                if not (namespace == DEFAULT_NAMESPACE and key.startswith("__"))
+                and not self._is_expired(key, namespace)
+            }
+
+    def set(
+        self,
+        key: str,
+        value: typing.Any,
+        namespace: str,
+        ttl: typing.Optional[float] = None,
+    ) -> None:
+        # Rejected here rather than when flushing, where the error would keep
+        # every later flush failing
+        json.dumps(value)
+
+        with self._lock:
+            self._ensure_loaded()
+
+            typing.cast(dict, self._get_namespace(namespace, create=True))[key] = value
+            self._set_expiry(key, namespace, _get_expires_at(ttl))
+            self._schedule_flush()
+
+        if self.flush_delay <= 0:
+            self.flush()
+
+    def delete(self, key: str, namespace: str) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            self._delete(key, namespace)
+
+        if self.flush_delay <= 0:
+            self.flush()
+
+    def _delete(self, key: str, namespace: str) -> None:
+        values = self._get_namespace(namespace)
+        if values is None or key not in values:
+            return
+
+        del values[key]
+        self._set_expiry(key, namespace, None)
+        self._schedule_flush()
+
+    def purge_expired(self, namespace: str) -> int:
+        """Deletes expired values of a namespace, returning how many were removed."""
+        with self._lock:
+            self._ensure_loaded()
+
+            expired = [
+                key
+                for key, expires_at in self._values.get(self._EXPIRES_KEY, {})
+                .get(namespace, {})
+                .items()
+                if expires_at <= time.time()
+            ]
+            for key in expired:
+                self._delete(key, namespace)
+
+        if expired and self.flush_delay <= 0:
+            self.flush()
+
+        return len(expired)
+
+    def _schedule_flush(self) -> None:
+        self._dirty = True
+
+        if self.flush_delay > 0 and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Writes pending changes to disk, if any."""
+        # Snapshots are taken under the write lock, so a later snapshot is never
+        # overwritten by an earlier one that finished writing last
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+
+                if not self._dirty:
+                    return
+
+                values = copy.deepcopy(self._values)
+                self._dirty = False
+
+            try:
+                self._write_file(values)
+            except OSError as e:
+                print(f"Error saving cache: {e}")
+                with self._lock:
+                    self._dirty = True
+
+    def _write_file(self, values: dict) -> None:
+        """Atomically replaces the cache file, so readers never see a partial write."""
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".cache-", suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(values, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(temp_path, self.filename)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+
+
+class SQLiteCacheBackend:
+    """
+    Stores values in an SQLite database in WAL mode, one table per namespace.
+
+    Every read and write touches a single row, so processes sharing the
+    database (CLI, API server, button server) see each other's changes.
+    Each thread uses its own connection. Values are stored as JSON.
+    """
+
+    def __init__(
+        self, filename: str = "cache.db", import_from: typing.Optional[str] = None
+    ) -> None:
+        self.filename = filename
+        self.import_from = import_from
+        self._local = threading.local()
+        self._tables: typing.Set[str] = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        self._ensure_table(DEFAULT_NAMESPACE)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.filename, timeout=5.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+
+        return connection
+
+    def _ensure_table(self, namespace: str) -> str:
+        table = f"cache_{_validate_namespace(namespace)}"
+        if table in self._tables:
+            return table
+
+        with self._lock:
+            if table in self._tables:
+                return table
+
+            connection = self._get_connection()
+            with connection:
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+                )
+
+            if namespace == DEFAULT_NAMESPACE:
+                self._import_json(table)
+
+            self._tables.add(table)
+
+        return table
+
+    def _import_json(self, table: str) -> None:
+        """Copies values of an existing JSON cache into a new, empty database."""
+        if not self.import_from or not os.path.exists(self.import_from):
+            return
+
+        connection = self._get_connection()
+        if connection.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            return
+
+        try:
+            with open(self.import_from, "r") as file:
+                values = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return
+
+        with connection:
+            connection.executemany(
+                f"INSERT OR IGNORE INTO {table} (key, value) VALUES (?, ?)",
+                [
+                    (key, json.dumps(value))
+                    for key, value in values.items()
+                    if not key.startswith("__")
+                ],
+            )
+
+    def get(self, key: str, default: typing.Any, namespace: str) -> typing.Any:
+        table = self._ensure_table(namespace)
+
+        row = (
+            self._get_connection()
+            .execute(
+                f"SELECT value FROM {table} WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+
+        return json.loads(row[0]) if row else default
+
+    def get_with_expiry(
+        self, key: str, namespace: str
+    ) -> typing.Optional[typing.Tuple[typing.Any, typing.Optional[float]]]:
+        table = self._ensure_table(namespace)
+
+        row = (
+            self._get_connection()
+            .execute(
+                f"SELECT value, expires_at FROM {table} WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def get_all(self, namespace: str) -> typing.Dict[str, typing.Any]:
+        table = self._ensure_table(namespace)
+
+        rows = (
+            self._get_connection()
+            .execute(
+                f"SELECT key, value FROM {table} "
+                "WHERE expires_at IS NULL OR expires_at > ?",
+                (time.time(),),
+            )
+            .fetchall()
+        )
+
+        return {key: json.loads(value) for key, value in rows}
+
+    def set(
+        self,
+        key: str,
+        value: typing.Any,
+        namespace: str,
+        ttl: typing.Optional[float] = None,
+    ) -> None:
+        table = self._ensure_table(namespace)
+
+        connection = self._get_connection()
+        with connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO {table} (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(value), _get_expires_at(ttl)),
+            )
+
+    def delete(self, key: str, namespace: str) -> None:
+        table = self._ensure_table(namespace)
+
+        connection = self._get_connection()
+        with connection:
+            connection.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+
+    def purge_expired(self, namespace: str) -> int:
+        """Deletes expired rows of a namespace, returning how many were removed."""
+        table = self._ensure_table(namespace)
+
+        connection = self._get_connection()
+        with connection:
+            cursor = connection.execute(
+                f"DELETE FROM {table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            )
+
+        return cursor.rowcount
+
+    def flush(self) -> None:
+        """Writes are committed immediately, nothing to flush."""
+
+
+CacheBackend = typing.Union[JSONCacheBackend, SQLiteCacheBackend]
+
+
+def create_backend(name: typing.Optional[str] = None) -> CacheBackend:
+    """
+    Creates the cache backend selected by name or the AI_ASSISTANT_CACHE_BACKEND
+    environment variable ("json" by default). Settings may come from `.env`.
+
+    The SQLite backend imports the values of the JSON cache file with the same
+    name (e.g. `cache.json` next to `cache.db`) on first use.
+    """
+    dotenv.load_dotenv()
+    name = name or os.getenv("AI_ASSISTANT_CACHE_BACKEND", "json")
+
+    if name == "json":
+        return JSONCacheBackend(
+            os.getenv("AI_ASSISTANT_CACHE_PATH", "cache.json"),
+            float(os.getenv("AI_ASSISTANT_CACHE_FLUSH_DELAY", "0.5")),
+        )
+
+    if name == "sqlite":
+        path = os.getenv("AI_ASSISTANT_CACHE_PATH", "cache.db")
+        return SQLiteCacheBackend(path, import_from=f"{os.path.splitext(path)[0]}.json")
+
+    raise ValueError(f"Cache backend must be one of: {', '.join(cache_backends)}")
+
 
 class Cache:
-    _filename = "cache.json"
-    _values = {}
+    """
+    Key-value store shared by the whole assistant.
+
+    Values live in namespaces and may expire after a TTL. Storage is delegated
+    to a backend chosen with the AI_ASSISTANT_CACHE_BACKEND environment
+    variable: "json" (a write-behind JSON file, the default) or "sqlite" (a
+    WAL mode database that can be shared by several processes). The backend is
+    created on first use, so the variables can be set in `.env`.
+    """
+
+    _backend: typing.Optional[CacheBackend] = None
+    _backend_lock = threading.Lock()
+
+    @staticmethod
+    def set_backend(backend: CacheBackend) -> None:
+        """Replaces the storage backend, flushing the previous one."""
+        with Cache._backend_lock:
+            if Cache._backend is not None:
+                Cache.get_backend().flush()
+            Cache._backend = backend
+
+    @staticmethod
+    def get_backend() -> CacheBackend:
+        if (backend := Cache._backend) is not None:
+            return backend
+
+        with Cache._backend_lock:
+            if Cache._backend is None:
+                Cache._backend = create_backend()
+
+            return Cache._backend
 
     @staticmethod
     def load_values() -> None:
-        try:
-            with open(Cache._filename, "r") as file:
-                Cache._values = json.load(file)
-        except FileNotFoundError:
-            with open(Cache._filename, "w") as file:
-                json.dump({}, file, indent=4)
-                Cache._values = {}
-        except json.JSONDecodeError:
-            with open(Cache._filename, "w") as file:
-                json.dump({}, file, indent=4)
-                Cache._values = {}
+        Cache.get_backend().load()
+
+    @staticmethod
+    def get_values(namespace: str = DEFAULT_NAMESPACE) -> dict:
+        return Cache.get_backend().get_all(namespace)
 
     @staticmethod
-    def get_values() -> dict:
-        if not len(Cache._values):
-            Cache.load_values()
+    def set_value(
+        key: str,
+        value: typing.Any,
+        ttl: typing.Optional[float] = None,
+        namespace: str = DEFAULT_NAMESPACE,
+    ) -> None:
+        """
+        Stores a JSON serializable value.
 
-        return Cache._values
+        Args:
+            key: Key of the value
+            value: Value to store
+            ttl: Seconds after which the value expires, never if None
+            namespace: Namespace the key belongs to
+        """
+        Cache.get_backend().set(key, value, _validate_namespace(namespace), ttl)
 
     @staticmethod
-    def set_value(key: str, value: typing.Any) -> None:
-        Cache._values[key] = value
+    def get_value(
+        key: str, default=None, namespace: str = DEFAULT_NAMESPACE
+    ) -> typing.Any:
+        return Cache.get_backend().get(key, default, _validate_namespace(namespace))
 
-        with open(Cache._filename, "w") as file:
-            json.dump(Cache._values, file, indent=4)
+    @staticmethod
+    def delete_value(key: str, namespace: str = DEFAULT_NAMESPACE) -> None:
+        Cache.get_backend().delete(key, _validate_namespace(namespace))
 
     @staticmethod
-    def get_value(key: str, default=None) -> typing.Any:
-        if not len(Cache._values):
-            Cache.load_values()
+    def get_value_with_expiry(
+        key: str, namespace: str = DEFAULT_NAMESPACE
+    ) -> typing.Optional[typing.Tuple[typing.Any, typing.Optional[float]]]:
+        """
+        Returns the value with its expiry time in seconds since the epoch (None
+        when it never expires), or None when the key is not set.
+        """
+        return Cache.get_backend().get_with_expiry(key, _validate_namespace(namespace))
 
-        return Cache._values.get(key, default)
+    @staticmethod
+    def purge_expired(namespace: str = DEFAULT_NAMESPACE) -> int:
+        """Deletes the expired values of a namespace, returning how many were removed."""
+        return Cache.get_backend().purge_expired(_validate_namespace(namespace))
+
+    @staticmethod
+    def flush() -> None:
+        """Writes pending changes to disk, if any."""
+        if (backend := Cache._backend) is not None:
+            backend.flush()
 
     @staticmethod
     def set_audio(value: bool) -> None:
@@ -64,3 +561,6 @@ class Cache:
     @staticmethod
     def get_server() -> bool:
         return Cache.get_value("server", default=False)
+
+
+atexit.register(Cache.flush)
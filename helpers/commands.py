@@ -1,24 +1,38 @@
 import os
+import re
 import typing
 
 import yaml
 
+_NON_WORD_PATTERN = re.compile(r"[^\w\s/]")
+
+
+def normalize_command(text: str) -> str:
+    """Normalizes a command, alias or job name for direct lookups."""
+    text = _NON_WORD_PATTERN.sub(" ", text.replace("_", " ").lower())
+    return " ".join(text.split())
+
 
 class Commands:
     _loaded_commands = {}
+    _loaded_aliases = {}
 
     @staticmethod
-    def get_all_commands() -> typing.Dict[str, str]:
-        if len(Commands._loaded_commands) > 0:
-            return Commands._loaded_commands
-
+    def _load_yaml() -> typing.Dict[str, typing.Any]:
         # Find the correct path to commands.yaml
         current_dir = os.path.dirname(os.path.abspath(__file__))
         parent_dir = os.path.dirname(current_dir)
         yaml_path = os.path.join(parent_dir, "commands.yaml")
 
         with open(yaml_path, "r", encoding="utf-8") as file:
-            yaml_data = yaml.safe_load(file)
+            return yaml.safe_load(file)
+
+    @staticmethod
+    def get_all_commands() -> typing.Dict[str, str]:
+        if len(Commands._loaded_commands) > 0:
+            return Commands._loaded_commands
+
+        yaml_data = Commands._load_yaml()
 
         # Process the nested structure and flatten it to name: description
         commands_dict = {}
@@ -37,3 +51,33 @@ class Commands:
             Commands.get_all_commands()
 
         return list(Commands.get_all_commands().keys())
+
+    @staticmethod
+    def get_command_aliases() -> typing.Dict[str, str]:
+        """
+        Returns normalized human names and synonyms from commands.yaml mapped to job names.
+
+        Each command's job name is its key, unless overridden with the `job` field.
+        The key, the `name` field and every entry of the optional `aliases` list
+        are used as aliases.
+        """
+
+        if len(Commands._loaded_aliases) > 0:
+            return Commands._loaded_aliases
+
+        yaml_data = Commands._load_yaml()
+
+        aliases_dict = {}
+        for category, command_group in yaml_data.items():
+            for command_key, command_data in command_group.items():
+                job_name = command_data.get("job", command_key)
+
+                for alias in [
+                    command_key,
+                    command_data["name"],
+                    *command_data.get("aliases", []),
+                ]:
+                    aliases_dict.setdefault(normalize_command(alias), job_name)
+
+        Commands._loaded_aliases = aliases_dict
+        return Commands._loaded_aliases
@@ -2,7 +2,6 @@ import math
 import time
 import typing
 
-import pyautogui
 import pynput
 
 
@@ -26,6 +25,8 @@ class MouseController(pynput.mouse.Controller):
         mouse_controller.func_idle_mouse()
 
     def func_idle_mouse(self, minutes: int = 1) -> None:
+        import pyautogui
+
         screen_width, screen_height = pyautogui.size()
         screen_center = (screen_width // 2, screen_height // 2)
 
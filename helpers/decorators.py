@@ -1,5 +1,11 @@
+import collections
 import functools
+import inspect
+import json
 import os
+import re
+import threading
+import time
 import typing
 
 T = typing.TypeVar("T")
@@ -17,13 +23,14 @@ def capture_response(
     def wrapper(*args, **kwargs) -> typing.Optional[str]:
         # Lazy imports to avoid circular dependencies
         try:
-            from helpers.audio import Audio
+            from helpers.audio import Audio, SpokenText
             from helpers.cache import Cache
             from helpers.logger import logger
         except ImportError:
             logger = None
             Audio = None
             Cache = None
+            SpokenText = None
 
         function_name = func.__name__ if hasattr(func, "__name__") else "Unknown"
         class_name = (
@@ -39,13 +46,13 @@ def capture_response(
             print(error_msg)
 
             if logger:
-                logger.log_error(str(e), f"{class_name}.{function_name}")
+                logger.log_job_error(function_name, str(e))
             return error_msg
 
         str_response = str(response) if response is not None else ""
 
-        # Handle audio output
-        if Cache and Audio:
+        # Handle audio output, unless the response was spoken while it was generated
+        if Cache and Audio and not isinstance(response, SpokenText):
             audio = Cache.get_audio()
             if audio:
                 Audio.text_to_speech(str_response)
@@ -100,6 +107,13 @@ def exit_on_exception(func: typing.Callable[..., T]) -> typing.Callable[..., T]:
             )
             function_name = func.__name__ if hasattr(func, "__name__") else "Unknown"
             print(f"\n[{class_name} - {function_name}]: {e}")
+
+            from helpers.cache import Cache
+            from helpers.logger import logger
+
+            # os._exit skips atexit handlers, so write pending cache values and logs first
+            Cache.flush()
+            logger.shutdown()
             os._exit(1)
 
     return wrapper
@@ -134,3 +148,205 @@ def retry_on_unauthorized(refresh_method_name: str):
         return wrapper
 
     return decorator
+
+
+def timed(stage: str):
+    """
+    Decorator that logs the duration of every call as a timing event of the stage
+    and runs the call in a trace span of the same name.
+    Durations are measured with a monotonic clock, also when the call raises.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Lazy imports to avoid circular dependencies
+            from helpers import tracing
+            from helpers.logger import logger
+
+            with tracing.start_span(stage), logger.timer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# All functions decorated with @memoize, by qualified name
+_memoized_functions: typing.Dict[str, typing.Callable] = {}
+
+
+def _is_cacheable(value: typing.Any) -> bool:
+    """Failed lookups (None, empty results, tuples of Nones) are not cached."""
+    if value is None:
+        return False
+
+    if isinstance(value, (list, dict, str)) and not value:
+        return False
+
+    if isinstance(value, tuple):
+        return any(item is not None for item in value)
+
+    return True
+
+
+def memoize(
+    ttl: typing.Optional[float] = None,
+    maxsize: typing.Optional[int] = 128,
+    persist: bool = False,
+    namespace: typing.Optional[str] = None,
+    ignore: typing.Iterable[str] = (),
+    cacheable: typing.Callable[[typing.Any], bool] = _is_cacheable,
+):
+    """
+    Decorator that caches results of a function by its arguments.
+
+    Arguments are bound to the signature, so positional and keyword calls share
+    entries. A leading `self` or `cls` is not part of the key. Exceptions and
+    values rejected by `cacheable` are not cached.
+
+    Usage:
+        @memoize(ttl=3600, maxsize=256)
+        def lookup(query: str, api_key: str): ...
+
+        @memoize(ttl=86400, persist=True, ignore=["api_key"])
+        def lookup(query: str, api_key: str): ...
+
+    Args:
+        ttl: Seconds an entry stays valid, forever if None
+        maxsize: Maximum number of entries kept in memory, least recently used
+                 entries are evicted first; unbounded if None
+        persist: Also store entries through `Cache`, so they survive restarts.
+                 Results must be JSON serializable (tuples are read back as lists)
+        namespace: Cache namespace for persisted entries, derived from the
+                   function name by default
+        ignore: Names of arguments that are not part of the key, e.g. API keys
+        cacheable: Predicate deciding whether a result may be cached
+
+    The wrapper exposes `cache_info()` returning hits, misses and size and
+    `cache_clear()` removing all in-memory entries.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        ignored = set(ignore)
+        if parameters and parameters[0] in ("self", "cls"):
+            ignored.add(parameters[0])
+
+        qualified_name = f"{func.__module__}.{func.__qualname__}"
+        cache_namespace = namespace or "memo_" + re.sub(r"\W", "_", qualified_name)
+
+        # Key -> (value, monotonic expiry time or None), least recently used first
+        entries: collections.OrderedDict = collections.OrderedDict()
+        stats = {"hits": 0, "misses": 0}
+        lock = threading.Lock()
+        # Set once the expired persisted entries were deleted in this process
+        purged = threading.Event()
+
+        def make_key(args, kwargs) -> str:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return json.dumps(
+                [
+                    [name, value]
+                    for name, value in bound.arguments.items()
+                    if name not in ignored
+                ],
+                default=repr,
+            )
+
+        def remember(key: str, value: typing.Any, expires_at: typing.Optional[float]):
+            entries[key] = (value, expires_at)
+            entries.move_to_end(key)
+            if maxsize is not None and len(entries) > maxsize:
+                entries.popitem(last=False)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+
+            with lock:
+                if (entry := entries.get(key)) is not None:
+                    value, expires_at = entry
+                    if expires_at is None or expires_at > time.monotonic():
+                        entries.move_to_end(key)
+                        stats["hits"] += 1
+                        return value
+
+                    del entries[key]
+
+            if persist:
+                from helpers.cache import Cache
+
+                if not purged.is_set():
+                    # Entries that are never requested again would otherwise stay
+                    purged.set()
+                    Cache.purge_expired(cache_namespace)
+
+                if (
+                    persisted := Cache.get_value_with_expiry(
+                        key, namespace=cache_namespace
+                    )
+                ) is not None:
+                    value, persisted_expires_at = persisted
+                    # Keeps the persisted expiry instead of starting a fresh TTL
+                    expires_at = (
+                        time.monotonic() + persisted_expires_at - time.time()
+                        if persisted_expires_at is not None
+                        else None
+                    )
+                    with lock:
+                        remember(key, value, expires_at)
+                        stats["hits"] += 1
+                    return value
+
+            with lock:
+                stats["misses"] += 1
+
+            value = func(*args, **kwargs)
+
+            if cacheable(value):
+                with lock:
+                    remember(key, value, time.monotonic() + ttl if ttl else None)
+
+                if persist:
+                    from helpers.cache import Cache
+
+                    try:
+                        Cache.set_value(key, value, ttl=ttl, namespace=cache_namespace)
+                    except (TypeError, ValueError) as e:
+                        print(f"Error persisting result of {qualified_name}: {e}")
+
+            return value
+
+        def cache_info() -> typing.Dict[str, typing.Any]:
+            with lock:
+                return {
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "size": len(entries),
+                    "maxsize": maxsize,
+                    "ttl": ttl,
+                    "persist": persist,
+                }
+
+        def cache_clear() -> None:
+            with lock:
+                entries.clear()
+
+        wrapper.cache_info = cache_info  # type: ignore
+        wrapper.cache_clear = cache_clear  # type: ignore
+
+        _memoized_functions[qualified_name] = wrapper
+        return wrapper
+
+    return decorator
+
+
+def get_memoization_stats() -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    """Returns `cache_info()` of every memoized function by qualified name."""
+    return {
+        name: func.cache_info()  # type: ignore
+        for name, func in _memoized_functions.items()
+    }
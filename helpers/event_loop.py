@@ -0,0 +1,161 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import queue
+import threading
+import typing
+
+T = typing.TypeVar("T")
+
+_END = object()
+
+
+async def _run_in_context(context: contextvars.Context, coro: typing.Awaitable[T]) -> T:
+    """
+    Runs the coroutine with the context variables of the submitting thread, so
+    spans started by the coroutine are children of the caller's span and its
+    events keep the request id.
+    """
+    for variable, value in context.items():
+        variable.set(value)
+
+    return await coro
+
+
+class BackgroundEventLoop:
+    """
+    Asyncio event loop running on a daemon thread, shared by synchronous callers.
+
+    Jobs and the servers run on ordinary threads; they hand coroutines to the
+    loop and wait for the result, so all network waits of the async clients
+    happen in a single event loop. The loop is started on first use.
+    """
+
+    def __init__(self, name: str = "event-loop") -> None:
+        self.name = name
+        self._loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self._thread: typing.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """Returns the running loop, starting its thread on the first call"""
+        if self._loop is not None:
+            return self._loop
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=loop.run_forever, name=self.name, daemon=True
+                )
+                self._thread.start()
+                self._loop = loop
+
+        return self._loop
+
+    def submit(
+        self, coro: typing.Coroutine[typing.Any, typing.Any, T]
+    ) -> "concurrent.futures.Future[T]":
+        """Schedules the coroutine on the loop; cancelling the future cancels it"""
+        return asyncio.run_coroutine_threadsafe(
+            _run_in_context(contextvars.copy_context(), coro), self.get_loop()
+        )
+
+    def run(
+        self,
+        coro: typing.Coroutine[typing.Any, typing.Any, T],
+        timeout: typing.Optional[float] = None,
+    ) -> T:
+        """
+        Runs the coroutine on the loop and waits for its result.
+
+        Args:
+            timeout: Seconds to wait, None to wait until the coroutine finishes
+
+        Raises:
+            TimeoutError: When the coroutine did not finish in time; it is cancelled
+            RuntimeError: When called from the loop's own thread
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Cannot wait for the event loop on its own thread")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            if not future.done():
+                future.cancel()
+                raise TimeoutError(f"Timed out after {timeout} s") from None
+            raise
+        except BaseException:
+            # e.g. KeyboardInterrupt while waiting, the request is abandoned
+            future.cancel()
+            raise
+
+    def iterate(
+        self,
+        async_iterator: typing.AsyncIterator[T],
+        timeout: typing.Optional[float] = None,
+    ) -> typing.Iterator[T]:
+        """
+        Iterates the async iterator on the loop, yielding its items as they arrive.
+
+        Args:
+            timeout: Seconds to wait for each item, None to wait indefinitely
+
+        Raises:
+            TimeoutError: When no item arrived in time; the iteration is cancelled
+        """
+        items: "queue.Queue[typing.Any]" = queue.Queue()
+
+        async def pump() -> None:
+            try:
+                async for item in async_iterator:
+                    items.put(item)
+            finally:
+                items.put(_END)
+                # Closes streams holding connections also when cancelled
+                if (aclose := getattr(async_iterator, "aclose", None)) is not None:
+                    await aclose()
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    item = items.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No item within {timeout} s") from None
+
+                if item is _END:
+                    # Raises the error that ended the iteration, if any
+                    future.result()
+                    return
+
+                yield item
+        finally:
+            # Stops the iterator when the caller stopped early or failed
+            future.cancel()
+
+
+_event_loop = BackgroundEventLoop()
+
+
+def get_event_loop() -> BackgroundEventLoop:
+    """Returns the event loop shared by the whole process"""
+    return _event_loop
+
+
+def run_sync(
+    coro: typing.Coroutine[typing.Any, typing.Any, T],
+    timeout: typing.Optional[float] = None,
+) -> T:
+    """Runs the coroutine on the shared event loop and waits for its result"""
+    return _event_loop.run(coro, timeout)
+
+
+def iterate_sync(
+    async_iterator: typing.AsyncIterator[T], timeout: typing.Optional[float] = None
+) -> typing.Iterator[T]:
+    """Iterates the async iterator on the shared event loop"""
+    return _event_loop.iterate(async_iterator, timeout)
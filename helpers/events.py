@@ -0,0 +1,316 @@
+import csv
+import enum
+import io
+import json
+import struct
+import typing
+from datetime import datetime
+from pathlib import Path
+
+from helpers.log_rotation import (
+    COMPRESSED_SUFFIXES,
+    SegmentManifest,
+    get_base_suffix,
+    open_log_file,
+)
+
+event_log_formats = ["jsonl", "binary", "csv"]
+
+EVENT_LOG_SUFFIXES = {"jsonl": ".jsonl", "binary": ".bin", "csv": ".csv"}
+
+# Segments of the spans recorded by `helpers.tracing`, as JSON lines
+TRACE_SUFFIX = ".trace"
+
+# Log name of errors raised by a job, which carry the job name instead of a context
+JOB_ERROR_LOG_NAME = "job_error"
+
+CSV_HEADER = "Timestamp,Log Name,User Input,Function Called,Function Response\n"
+
+BINARY_MAGIC = b"AIEV\x01"
+
+# Fixed part of a binary record: ts_ns, duration_ns (-1 when unset), event code
+_BINARY_HEADER = struct.Struct("<qqB")
+_LENGTH = struct.Struct("<I")
+
+# String fields of a binary record, in the order they are written
+_BINARY_STRING_FIELDS = ("name", "job", "user_input", "response", "request_id")
+
+
+class EventType(str, enum.Enum):
+    """Kind of a logged event, the `name` field carries the specific log name"""
+
+    USER_INPUT = "user_input"
+    FUNCTION_CALLED = "function_called"
+    FUNCTION_RESPONSE = "function_response"
+    ERROR = "error"
+    SYSTEM_EVENT = "system_event"
+    CUSTOM = "custom"
+    TIMING = "timing"
+
+
+_EVENT_CODES = {event_type: code for code, event_type in enumerate(EventType)}
+_EVENT_TYPES = list(EventType)
+
+
+def make_event(
+    ts_ns: int,
+    event: EventType,
+    name: str,
+    user_input: str = "",
+    job: str = "",
+    response: str = "",
+    duration_ns: typing.Optional[int] = None,
+    request_id: typing.Optional[str] = None,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Creates an event with all fields set.
+
+    Args:
+        ts_ns: Time of the event in nanoseconds since the epoch
+        event: Kind of the event
+        name: Log name, e.g. "user_input_speech" or "local_function_selected"
+        user_input: User input that led to the event
+        job: Job or function the event refers to, or the context of errors
+             not raised by a job
+        response: Job response, error message or event details
+        duration_ns: Duration of the logged operation in nanoseconds
+        request_id: Id of the command the event belongs to
+    """
+    return {
+        "ts_ns": ts_ns,
+        "event": EventType(event),
+        "name": name,
+        "user_input": user_input or "",
+        "job": job or "",
+        "response": response or "",
+        "duration_ns": duration_ns,
+        "request_id": request_id,
+    }
+
+
+def format_timestamp(ts_ns: int) -> str:
+    """Formats an epoch nanosecond timestamp with millisecond precision"""
+    return datetime.fromtimestamp(ts_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def encode_jsonl(event: typing.Dict[str, typing.Any]) -> str:
+    """Encodes an event as a single JSON line without the trailing newline"""
+    return json.dumps(
+        {key: value for key, value in event.items() if value is not None},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def encode_binary(event: typing.Dict[str, typing.Any]) -> bytes:
+    """Encodes an event as a length-prefixed binary record"""
+    duration_ns = event.get("duration_ns")
+
+    parts = [
+        _BINARY_HEADER.pack(
+            event["ts_ns"],
+            -1 if duration_ns is None else duration_ns,
+            _EVENT_CODES[EventType(event["event"])],
+        )
+    ]
+    for field in _BINARY_STRING_FIELDS:
+        data = (event.get(field) or "").encode("utf-8")
+        parts.append(_LENGTH.pack(len(data)))
+        parts.append(data)
+
+    payload = b"".join(parts)
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_binary(payload: bytes) -> typing.Dict[str, typing.Any]:
+    """Decodes the payload of a binary record, without its length prefix"""
+    ts_ns, duration_ns, event_code = _BINARY_HEADER.unpack_from(payload)
+    offset = _BINARY_HEADER.size
+
+    strings = {}
+    for field in _BINARY_STRING_FIELDS:
+        (length,) = _LENGTH.unpack_from(payload, offset)
+        offset += _LENGTH.size
+        strings[field] = payload[offset : offset + length].decode("utf-8")
+        offset += length
+
+    return make_event(
+        ts_ns,
+        _EVENT_TYPES[event_code],
+        strings["name"],
+        strings["user_input"],
+        strings["job"],
+        strings["response"],
+        None if duration_ns < 0 else duration_ns,
+        strings["request_id"] or None,
+    )
+
+
+def _read_jsonl(file: typing.TextIO) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    for line in file:
+        if not line.strip():
+            continue
+
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            # Last line of a file that is still being written
+            continue
+
+        yield make_event(
+            data["ts_ns"],
+            data["event"],
+            data.get("name", data["event"]),
+            data.get("user_input", ""),
+            data.get("job", ""),
+            data.get("response", ""),
+            data.get("duration_ns"),
+            data.get("request_id"),
+        )
+
+
+def _read_binary(
+    file: typing.BinaryIO,
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("Not a binary event log")
+
+    while len(prefix := file.read(_LENGTH.size)) == _LENGTH.size:
+        (length,) = _LENGTH.unpack(prefix)
+        payload = file.read(length)
+        if len(payload) != length:
+            # Truncated record of a file that is still being written
+            break
+
+        yield decode_binary(payload)
+
+
+def _csv_event_type(log_name: str) -> EventType:
+    if log_name.startswith("user_input_"):
+        return EventType.USER_INPUT
+
+    if log_name == JOB_ERROR_LOG_NAME:
+        return EventType.ERROR
+
+    try:
+        return EventType(log_name)
+    except ValueError:
+        return EventType.CUSTOM
+
+
+def _read_csv(file: typing.TextIO) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    for row in csv.DictReader(file):
+        try:
+            timestamp = datetime.strptime(row["Timestamp"], "%Y-%m-%d %H:%M:%S.%f")
+        except (TypeError, ValueError):
+            continue
+
+        yield make_event(
+            int(timestamp.timestamp() * 1e9),
+            _csv_event_type(row["Log Name"]),
+            row["Log Name"],
+            row["User Input"],
+            row["Function Called"],
+            row["Function Response"],
+        )
+
+
+def read_events(path: Path) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """
+    Streams the events of a log file one at a time.
+
+    The format is detected from the file suffix: ".jsonl", ".bin" or legacy
+    ".csv" files, optionally compressed with gzip (".gz") or zstd (".zst").
+    Events have the fields created by `make_event`.
+    """
+    suffix = get_base_suffix(path)
+
+    if suffix == EVENT_LOG_SUFFIXES["binary"]:
+        with open_log_file(path, binary=True) as file:
+            yield from _read_binary(file)
+        return
+
+    with open_log_file(path) as file:
+        if suffix == EVENT_LOG_SUFFIXES["csv"]:
+            yield from _read_csv(file)
+        else:
+            yield from _read_jsonl(file)
+
+
+def is_job_error(event: typing.Dict[str, typing.Any]) -> bool:
+    """Checks whether the event is an error raised by the job in its `job` field"""
+    return event["event"] == EventType.ERROR and event["name"] == JOB_ERROR_LOG_NAME
+
+
+def find_log_segments(logs_dir: Path) -> typing.List[Path]:
+    """
+    Returns all log, event and trace segments in the logs directory, compressed
+    or not
+    """
+    suffixes = {".log", TRACE_SUFFIX, *EVENT_LOG_SUFFIXES.values()}
+
+    return [
+        file
+        for file in Path(logs_dir).glob("ai_assistant_*")
+        if get_base_suffix(file) in suffixes
+        and file.suffix in suffixes | set(COMPRESSED_SUFFIXES.values())
+    ]
+
+
+def find_event_logs(
+    logs_dir: Path,
+    start_ns: typing.Optional[int] = None,
+    end_ns: typing.Optional[int] = None,
+) -> typing.List[Path]:
+    """
+    Returns event log segments in the logs directory, oldest first.
+
+    When a time range is given, segments the manifest records as lying
+    entirely outside of it are skipped without being opened.
+    """
+    files = [
+        file
+        for file in find_log_segments(logs_dir)
+        if get_base_suffix(file) in EVENT_LOG_SUFFIXES.values()
+    ]
+
+    if start_ns is not None or end_ns is not None:
+        manifest = SegmentManifest(logs_dir)
+        known = {segment["file"] for segment in manifest.load()}
+        matching = {
+            segment["file"] for segment in manifest.segments("events", start_ns, end_ns)
+        }
+        files = [
+            file for file in files if file.name not in known or file.name in matching
+        ]
+
+    return sorted(files, key=lambda file: file.stat().st_mtime)
+
+
+def get_event_log_header(
+    event_format: str,
+) -> typing.Union[str, bytes, None]:
+    """Returns the data each new event log segment starts with"""
+    if event_format == "binary":
+        return BINARY_MAGIC
+
+    if event_format == "csv":
+        return CSV_HEADER
+
+    return None
+
+
+def encode_csv(event: typing.Dict[str, typing.Any]) -> str:
+    """Encodes an event as a row of the legacy CSV format"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(
+        [
+            format_timestamp(event["ts_ns"]),
+            event["name"],
+            event["user_input"],
+            event["job"],
+            event["response"],
+        ]
+    )
+
+    return buffer.getvalue()
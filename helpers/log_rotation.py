@@ -0,0 +1,417 @@
+import contextlib
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import typing
+from datetime import datetime
+from pathlib import Path
+
+compression_codecs = ["gzip", "zstd", "none"]
+
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def get_base_suffix(path: typing.Union[str, Path]) -> str:
+    """Returns the suffix of a log file without its compression suffix"""
+    path = Path(path)
+    if path.suffix in COMPRESSED_SUFFIXES.values() and len(path.suffixes) > 1:
+        return path.suffixes[-2]
+
+    return path.suffix
+
+
+def open_log_file(path: typing.Union[str, Path], binary: bool = False):
+    """Opens a plain, gzip or zstd compressed log file for reading"""
+    path = Path(path)
+    mode = "rb" if binary else "r"
+    encoding = None if binary else "utf-8"
+    newline = None if binary else ""
+
+    if path.suffix == COMPRESSED_SUFFIXES["gzip"]:
+        return gzip.open(
+            path, mode + ("" if binary else "t"), encoding=encoding, newline=newline
+        )
+
+    if path.suffix == COMPRESSED_SUFFIXES["zstd"]:
+        import zstandard
+
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        if binary:
+            return stream
+        return io.TextIOWrapper(stream, encoding="utf-8", newline=newline)
+
+    return open(path, mode, encoding=encoding, newline=newline)
+
+
+def get_compression_codec(codec: typing.Optional[str] = None) -> str:
+    """
+    Returns the compression codec to use, falling back to gzip when zstd was
+    requested but the zstandard package is not installed.
+    """
+    codec = codec or os.getenv("AI_ASSISTANT_LOG_COMPRESSION", "gzip")
+    if codec not in compression_codecs:
+        return "gzip"
+
+    if codec == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            return "gzip"
+
+    return codec
+
+
+class SegmentManifest:
+    """
+    JSON index of the log segments in the logs directory.
+
+    Each entry holds the segment file name, its kind ("log", "events" or
+    "traces"), format, first and last record time in epoch nanoseconds, record
+    count, size and status ("active", "closed" or "compressed"). Readers use it
+    to skip segments outside a requested time range without opening them.
+    """
+
+    def __init__(self, logs_dir: typing.Union[str, Path]) -> None:
+        self.path = Path(logs_dir) / MANIFEST_FILENAME
+        self._lock = threading.Lock()
+
+    def load(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file).get("segments", [])
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def _save(self, segments: typing.List[typing.Dict[str, typing.Any]]) -> None:
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=".manifest-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump({"segments": segments}, file, indent=2)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+
+    def _modify(
+        self,
+        change: typing.Callable[[typing.List[typing.Dict[str, typing.Any]]], None],
+    ) -> None:
+        # The file is re-read on every change, since other assistant processes
+        # may write segments into the same directory
+        with self._lock:
+            segments = self.load()
+            change(segments)
+            try:
+                self._save(segments)
+            except OSError as e:
+                print(f"Error saving log manifest: {e}")
+
+    def add(self, segment: typing.Dict[str, typing.Any]) -> None:
+        def change(segments):
+            segments[:] = [s for s in segments if s["file"] != segment["file"]]
+            segments.append(segment)
+
+        self._modify(change)
+
+    def update(self, segment_file: str, **fields: typing.Any) -> None:
+        def change(segments):
+            for segment in segments:
+                if segment["file"] == segment_file:
+                    segment.update(fields)
+
+        self._modify(change)
+
+    def remove(self, files: typing.Iterable[str]) -> None:
+        files = set(files)
+        self._modify(
+            lambda segments: segments.__setitem__(
+                slice(None), [s for s in segments if s["file"] not in files]
+            )
+        )
+
+    def segments(
+        self,
+        kind: typing.Optional[str] = None,
+        start_ns: typing.Optional[int] = None,
+        end_ns: typing.Optional[int] = None,
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Returns segments of the given kind overlapping the time range, oldest first.
+        Segments without records yet are always included.
+        """
+        result = []
+        for segment in self.load():
+            if kind is not None and segment.get("kind") != kind:
+                continue
+
+            first, last = segment.get("start_ns"), segment.get("end_ns")
+            if end_ns is not None and first is not None and first > end_ns:
+                continue
+            if start_ns is not None and last is not None and last < start_ns:
+                continue
+
+            result.append(segment)
+
+        return sorted(result, key=lambda segment: segment.get("start_ns") or 0)
+
+
+class SegmentCompressor:
+    """Compresses closed segments one at a time on a background thread"""
+
+    def __init__(
+        self, manifest: SegmentManifest, codec: typing.Optional[str] = None
+    ) -> None:
+        self.manifest = manifest
+        self.codec = get_compression_codec(codec)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, path: typing.Union[str, Path]) -> None:
+        if self.codec == "none":
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="log-compressor", daemon=True
+                )
+                self._thread.start()
+
+        self._queue.put(Path(path))
+
+    def submit_pending(self) -> None:
+        """Compresses segments closed by earlier runs but not compressed yet"""
+        for segment in self.manifest.segments():
+            if segment.get("status") == "closed":
+                path = self.manifest.path.parent / segment["file"]
+                if path.exists():
+                    self.submit(path)
+
+    def _run(self) -> None:
+        while True:
+            path = self._queue.get()
+            try:
+                self.compress(path)
+            except Exception as e:
+                print(f"Error compressing log segment {path.name}: {e}")
+
+    def compress(self, path: Path) -> Path:
+        target = path.with_name(path.name + COMPRESSED_SUFFIXES[self.codec])
+        temp = target.with_name(f".{target.name}.tmp")
+
+        with open(path, "rb") as source:
+            if self.codec == "zstd":
+                import zstandard
+
+                with open(temp, "wb") as raw:
+                    with zstandard.ZstdCompressor().stream_writer(raw) as output:
+                        shutil.copyfileobj(source, output)
+            else:
+                with gzip.open(temp, "wb") as output:
+                    shutil.copyfileobj(source, output)
+
+        # Keep the modification time, retention is based on it
+        shutil.copystat(path, temp)
+        os.replace(temp, target)
+        path.unlink()
+
+        self.manifest.update(
+            path.name,
+            file=target.name,
+            status="compressed",
+            compressed_bytes=target.stat().st_size,
+        )
+
+        return target
+
+
+class RotatingSegmentHandler(logging.FileHandler):
+    """
+    File handler writing to a sequence of segments, rotated by size and age.
+
+    Each segment is named `<prefix>_<timestamp><suffix>`. When the current
+    segment exceeds `max_bytes` or is older than `max_age` seconds, it is
+    closed, recorded in the manifest and handed to the compressor. A fresh
+    segment is then started with the optional header.
+
+    Flushing is left to the caller instead of happening after every record.
+    """
+
+    def __init__(
+        self,
+        logs_dir: typing.Union[str, Path],
+        suffix: str,
+        kind: str,
+        segment_format: str,
+        manifest: SegmentManifest,
+        compressor: typing.Optional[SegmentCompressor] = None,
+        max_bytes: int = 0,
+        max_age: float = 0,
+        header: typing.Union[str, bytes, None] = None,
+        prefix: str = "ai_assistant",
+    ) -> None:
+        self.logs_dir = Path(logs_dir)
+        self.suffix = suffix
+        self.kind = kind
+        self.segment_format = segment_format
+        self.manifest = manifest
+        self.compressor = compressor
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.header = header
+        self.prefix = prefix
+
+        binary = isinstance(header, bytes) or segment_format == "binary"
+        super().__init__(
+            self._next_segment_path(),
+            mode="ab" if binary else "a",
+            encoding=None if binary else "utf-8",
+            delay=True,
+        )
+        self._start_segment()
+
+    def _next_segment_path(self) -> Path:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = self.logs_dir / f"{self.prefix}_{timestamp}{self.suffix}"
+
+        counter = 1
+        while path.exists() or any(
+            path.with_name(path.name + suffix).exists()
+            for suffix in COMPRESSED_SUFFIXES.values()
+        ):
+            path = self.logs_dir / f"{self.prefix}_{timestamp}_{counter}{self.suffix}"
+            counter += 1
+
+        return path
+
+    def _start_segment(self) -> None:
+        self.stream = self._open()
+        if self.header is not None:
+            self.stream.write(self.header)
+
+        self._opened_at = time.monotonic()
+        self._bytes = len(self.header) if self.header is not None else 0
+        self._records = 0
+        self._start_ns: typing.Optional[int] = None
+        self._end_ns: typing.Optional[int] = None
+
+        self.manifest.add(
+            {
+                "file": Path(self.baseFilename).name,
+                "kind": self.kind,
+                "format": self.segment_format,
+                "start_ns": None,
+                "end_ns": None,
+                "records": 0,
+                "bytes": self._bytes,
+                "status": "active",
+                "pid": os.getpid(),
+            }
+        )
+
+    def _segment_summary(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "start_ns": self._start_ns,
+            "end_ns": self._end_ns,
+            "records": self._records,
+            "bytes": self._bytes,
+        }
+
+    def serialize(self, record: logging.LogRecord) -> typing.Union[str, bytes]:
+        """Returns the data written for a record"""
+        return self.format(record) + self.terminator
+
+    def should_rotate(self) -> bool:
+        if not self._records:
+            return False
+
+        if self.max_bytes and self._bytes >= self.max_bytes:
+            return True
+
+        return bool(self.max_age) and time.monotonic() - self._opened_at >= self.max_age
+
+    def rotate(self) -> None:
+        """Closes the current segment and starts a new one"""
+        path = Path(self.baseFilename)
+
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None  # type: ignore
+
+        self.manifest.update(path.name, status="closed", **self._segment_summary())
+        if self.compressor is not None:
+            self.compressor.submit(path)
+
+        self.baseFilename = os.path.abspath(self._next_segment_path())
+        self._start_segment()
+
+    def emit(self, record):
+        try:
+            data = self.serialize(record)
+
+            if self.should_rotate():
+                self.rotate()
+            if self.stream is None:
+                self.stream = self._open()
+
+            self.stream.write(data)
+
+            record_ns = getattr(record, "event", {}).get("ts_ns") or int(
+                record.created * 1e9
+            )
+            if self._start_ns is None:
+                self._start_ns = record_ns
+            self._end_ns = record_ns
+            self._records += 1
+            self._bytes += len(data)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.manifest.update(
+                    Path(self.baseFilename).name,
+                    status="closed",
+                    **self._segment_summary(),
+                )
+            super().close()
+        finally:
+            self.release()
+
+
+def start_periodic_task(
+    name: str, interval: float, task: typing.Callable[[], typing.Any]
+) -> threading.Event:
+    """
+    Runs a task every `interval` seconds on a daemon thread.
+
+    Returns:
+        Event stopping the task when set
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                task()
+            except Exception as e:
+                print(f"Periodic task {name} failed: {e}")
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+
+    return stop
@@ -0,0 +1,427 @@
+import argparse
+import bisect
+import itertools
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from helpers.events import (  # noqa: E402
+    EventType,
+    find_event_logs,
+    is_job_error,
+    read_events,
+)
+from helpers.log_rotation import COMPRESSED_SUFFIXES  # noqa: E402
+
+# Upper bounds of the latency histogram buckets in milliseconds, the last
+# bucket collects everything slower
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_segments (
+    segment TEXT PRIMARY KEY,
+    events INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hourly_jobs (
+    hour INTEGER NOT NULL,
+    job TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    responses INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    latency_count INTEGER NOT NULL DEFAULT 0,
+    latency_sum_ns INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, job)
+);
+CREATE TABLE IF NOT EXISTS hourly_latency (
+    hour INTEGER NOT NULL,
+    job TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, job, bucket)
+);
+CREATE TABLE IF NOT EXISTS hourly_inputs (
+    hour INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, source)
+);
+"""
+
+
+def get_segment_key(path: Path) -> str:
+    """Name of a segment without its compression suffix, stable across compression"""
+    name = Path(path).name
+    for suffix in COMPRESSED_SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+
+    return name
+
+
+def get_latency_bucket(duration_ns: int) -> int:
+    """Index of the histogram bucket a duration falls into"""
+    return bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ns / 1e6)
+
+
+def estimate_percentile(
+    histogram: Dict[int, int], percentile: float
+) -> Optional[float]:
+    """
+    Estimates a latency percentile in milliseconds from bucket counts.
+
+    Returns the upper bound of the bucket containing the percentile, or None
+    for an empty histogram.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    rank = percentile / 100 * total
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            if bucket < len(LATENCY_BUCKETS_MS):
+                return float(LATENCY_BUCKETS_MS[bucket])
+            return float("inf")
+
+    return float("inf")
+
+
+class _HourlyRollup:
+    """In-memory rollup of the events of one ingestion, merged into the store"""
+
+    def __init__(self) -> None:
+        self.jobs: Dict[Tuple[int, str], List[int]] = {}
+        self.latency: Dict[Tuple[int, str, int], int] = {}
+        self.inputs: Dict[Tuple[int, str], int] = {}
+        # Start times of calls without a logged duration, to pair with responses
+        self._pending_calls: Dict[str, int] = {}
+
+    def _job(self, hour: int, job: str) -> List[int]:
+        # calls, responses, errors, latency_count, latency_sum_ns
+        return self.jobs.setdefault((hour, job), [0, 0, 0, 0, 0])
+
+    def _add_latency(self, hour: int, job: str, duration_ns: int) -> None:
+        stats = self._job(hour, job)
+        stats[3] += 1
+        stats[4] += duration_ns
+
+        key = (hour, job, get_latency_bucket(duration_ns))
+        self.latency[key] = self.latency.get(key, 0) + 1
+
+    def add(self, event: Dict[str, Any]) -> None:
+        hour = event["ts_ns"] // 1_000_000_000 // 3600 * 3600
+        event_type = event["event"]
+        job = event["job"]
+
+        if event_type == EventType.USER_INPUT:
+            source = event["name"].removeprefix("user_input_")
+            self.inputs[(hour, source)] = self.inputs.get((hour, source), 0) + 1
+            return
+
+        if not job:
+            return
+
+        if event_type == EventType.FUNCTION_CALLED:
+            self._job(hour, job)[0] += 1
+            self._pending_calls[job] = event["ts_ns"]
+
+        elif event_type == EventType.FUNCTION_RESPONSE:
+            self._job(hour, job)[1] += 1
+
+            duration_ns = event["duration_ns"]
+            started_ns = self._pending_calls.pop(job, None)
+            if duration_ns is None and started_ns is not None:
+                duration_ns = event["ts_ns"] - started_ns
+            if duration_ns is not None:
+                self._add_latency(hour, job, duration_ns)
+
+        elif is_job_error(event):
+            # Other errors carry their logging context instead of a job
+            self._job(hour, job)[2] += 1
+            self._pending_calls.pop(job, None)
+
+
+class LogWarehouse:
+    """
+    SQLite store of hourly per-job rollups built incrementally from log segments.
+
+    Each segment is ingested once: the number of events already ingested is
+    kept per segment, so growing active segments only contribute their new
+    events and compressed segments are recognized as already ingested.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_watermark(self, segment: str) -> int:
+        row = self.connection.execute(
+            "SELECT events FROM ingested_segments WHERE segment = ?", (segment,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def ingest_segment(self, path: Path) -> int:
+        """
+        Ingests events of a segment past its watermark.
+
+        Returns:
+            Number of newly ingested events
+        """
+        segment = get_segment_key(path)
+        watermark = self.get_watermark(segment)
+
+        rollup = _HourlyRollup()
+        ingested = 0
+        for event in itertools.islice(read_events(path), watermark, None):
+            rollup.add(event)
+            ingested += 1
+
+        if not ingested:
+            return 0
+
+        # Rollups and the new watermark are committed together, so a segment
+        # is never counted twice
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO hourly_jobs (hour, job, calls, responses, errors, "
+                "latency_count, latency_sum_ns) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (hour, job) DO UPDATE SET "
+                "calls = calls + excluded.calls, "
+                "responses = responses + excluded.responses, "
+                "errors = errors + excluded.errors, "
+                "latency_count = latency_count + excluded.latency_count, "
+                "latency_sum_ns = latency_sum_ns + excluded.latency_sum_ns",
+                [(hour, job, *stats) for (hour, job), stats in rollup.jobs.items()],
+            )
+            self.connection.executemany(
+                "INSERT INTO hourly_latency (hour, job, bucket, count) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (hour, job, bucket) "
+                "DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in rollup.latency.items()],
+            )
+            self.connection.executemany(
+                "INSERT INTO hourly_inputs (hour, source, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (hour, source) DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in rollup.inputs.items()],
+            )
+            self.connection.execute(
+                "INSERT INTO ingested_segments (segment, events, ingested_at) "
+                "VALUES (?, ?, ?) ON CONFLICT (segment) DO UPDATE SET "
+                "events = excluded.events, ingested_at = excluded.ingested_at",
+                (segment, watermark + ingested, time.time()),
+            )
+
+        return ingested
+
+    def ingest(self, logs_dir: Path) -> Dict[str, int]:
+        """Ingests new events of all segments in the logs directory"""
+        results = {}
+        for path in find_event_logs(logs_dir):
+            try:
+                results[path.name] = self.ingest_segment(path)
+            except (OSError, ValueError, EOFError) as e:
+                print(f"Error ingesting {path.name}: {e}")
+
+        return results
+
+    def query_jobs(
+        self, since_hour: int, until_hour: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Per-job totals and latency percentiles over a range of hours"""
+        until_hour = until_hour if until_hour is not None else 2**62
+        jobs: Dict[str, Dict[str, Any]] = {}
+
+        for (
+            job,
+            calls,
+            responses,
+            errors,
+            latency_count,
+            latency_sum_ns,
+        ) in self.connection.execute(
+            "SELECT job, SUM(calls), SUM(responses), SUM(errors), "
+            "SUM(latency_count), SUM(latency_sum_ns) FROM hourly_jobs "
+            "WHERE hour BETWEEN ? AND ? GROUP BY job",
+            (since_hour, until_hour),
+        ):
+            jobs[job] = {
+                "calls": calls,
+                "responses": responses,
+                "errors": errors,
+                "avg_ms": (
+                    latency_sum_ns / latency_count / 1e6 if latency_count else None
+                ),
+                "histogram": {},
+            }
+
+        for job, bucket, count in self.connection.execute(
+            "SELECT job, bucket, SUM(count) FROM hourly_latency "
+            "WHERE hour BETWEEN ? AND ? GROUP BY job, bucket",
+            (since_hour, until_hour),
+        ):
+            if job in jobs:
+                jobs[job]["histogram"][bucket] = count
+
+        for stats in jobs.values():
+            for percentile in (50, 90, 99):
+                stats[f"p{percentile}_ms"] = estimate_percentile(
+                    stats["histogram"], percentile
+                )
+
+        return jobs
+
+    def query_daily(self, since_hour: int) -> List[Tuple[str, int, int, int]]:
+        """Daily totals of inputs, job calls and errors since the given hour"""
+        days: Dict[str, List[int]] = {}
+
+        for hour, count in self.connection.execute(
+            "SELECT hour, SUM(count) FROM hourly_inputs WHERE hour >= ? GROUP BY hour",
+            (since_hour,),
+        ):
+            day = datetime.fromtimestamp(hour).strftime("%Y-%m-%d")
+            days.setdefault(day, [0, 0, 0])[0] += count
+
+        for hour, calls, errors in self.connection.execute(
+            "SELECT hour, SUM(calls), SUM(errors) FROM hourly_jobs "
+            "WHERE hour >= ? GROUP BY hour",
+            (since_hour,),
+        ):
+            day = datetime.fromtimestamp(hour).strftime("%Y-%m-%d")
+            days.setdefault(day, [0, 0, 0])[1] += calls
+            days[day][2] += errors
+
+        return [(day, *totals) for day, totals in sorted(days.items())]
+
+
+def _format_ms(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    if value == float("inf"):
+        return f">{LATENCY_BUCKETS_MS[-1]}"
+    return f"{value:.0f}"
+
+
+def generate_history_report(warehouse: LogWarehouse, days: int = 30) -> str:
+    """Generate a report over the last `days` days of ingested history"""
+    since_hour = int(time.time() - days * 24 * 3600) // 3600 * 3600
+    jobs = warehouse.query_jobs(since_hour)
+    daily = warehouse.query_daily(since_hour)
+
+    report = []
+    report.append("=" * 60)
+    report.append("AI ASSISTANT LOG HISTORY REPORT")
+    report.append("=" * 60)
+    report.append(f"Period: last {days} days")
+    report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report.append("")
+
+    report.append("JOBS")
+    report.append("-" * 30)
+    if jobs:
+        report.append(
+            f"  {'job':<24} {'calls':>6} {'errors':>6} {'avg ms':>7} "
+            f"{'p50':>6} {'p90':>6} {'p99':>6}"
+        )
+        for job, stats in sorted(
+            jobs.items(), key=lambda item: item[1]["calls"], reverse=True
+        ):
+            report.append(
+                f"  {job[:24]:<24} {stats['calls']:>6} {stats['errors']:>6} "
+                f"{_format_ms(stats['avg_ms']):>7} {_format_ms(stats['p50_ms']):>6} "
+                f"{_format_ms(stats['p90_ms']):>6} {_format_ms(stats['p99_ms']):>6}"
+            )
+        report.append("  (percentiles are upper bounds of latency histogram buckets)")
+    else:
+        report.append("No job calls recorded.")
+    report.append("")
+
+    report.append("DAILY ACTIVITY")
+    report.append("-" * 30)
+    if daily:
+        report.append(f"  {'day':<10} {'inputs':>7} {'calls':>7} {'errors':>7}")
+        for day, inputs, calls, errors in daily:
+            report.append(f"  {day:<10} {inputs:>7} {calls:>7} {errors:>7}")
+    else:
+        report.append("No activity recorded.")
+    report.append("")
+
+    report.append("=" * 60)
+
+    return "\n".join(report)
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Ingest AI Assistant logs into a local warehouse and report on history"
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["ingest", "report", "update"],
+        default="update",
+        help="ingest new segments, report on history, or both (default: update)",
+    )
+    parser.add_argument(
+        "--logs-dir",
+        "-d",
+        type=str,
+        default="logs",
+        help="Path to logs directory (default: logs)",
+    )
+    parser.add_argument(
+        "--database",
+        type=str,
+        help="Path to the warehouse database (default: <logs-dir>/warehouse.db)",
+    )
+    parser.add_argument(
+        "--days", type=int, default=30, help="Days of history to report (default: 30)"
+    )
+    parser.add_argument(
+        "--output", "-o", type=str, help="Save report to file instead of printing"
+    )
+
+    args = parser.parse_args(argv)
+
+    logs_dir = Path(args.logs_dir)
+    if not logs_dir.exists():
+        print("No logs directory found. Run the AI Assistant first to generate logs.")
+        return
+
+    warehouse = LogWarehouse(Path(args.database or logs_dir / "warehouse.db"))
+    try:
+        if args.command in ("ingest", "update"):
+            ingested = warehouse.ingest(logs_dir)
+            new_events = sum(ingested.values())
+            print(
+                f"Ingested {new_events} new events from "
+                f"{sum(1 for count in ingested.values() if count)} segments"
+            )
+
+        if args.command in ("report", "update"):
+            report = generate_history_report(warehouse, args.days)
+
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    f.write(report)
+                print(f"Report saved to: {args.output}")
+            else:
+                print(report)
+    finally:
+        warehouse.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,271 @@
-import csv
+import atexit
+import contextlib
+import contextvars
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 import typing
+import uuid
 from datetime import datetime
 from pathlib import Path
 
+from helpers import events
+from helpers.events import EventType
+from helpers.log_rotation import (
+    RotatingSegmentHandler,
+    SegmentCompressor,
+    SegmentManifest,
+    start_periodic_task,
+)
 
-class CSVFormatter(logging.Formatter):
-    """Custom formatter for CSV logging"""
 
-    def __init__(self):
+class EventFormatter(logging.Formatter):
+    """Formats event records as JSON lines or legacy CSV rows"""
+
+    def __init__(self, event_format: str = "jsonl"):
         super().__init__()
+        self.encode = (
+            events.encode_csv if event_format == "csv" else events.encode_jsonl
+        )
+
+    def format(self, record):
+        return self.encode(record.event)
+
+
+class TraceFormatter(logging.Formatter):
+    """Formats the Chrome trace events of a span, one JSON object per line"""
 
     def format(self, record):
-        # Extract custom fields from the record
-        timestamp = datetime.fromtimestamp(record.created).strftime(
-            "%Y-%m-%d %H:%M:%S.%f"
-        )[:-3]
-        log_name = getattr(record, "log_name", "general")
-        user_input = getattr(record, "user_input", "")
-        function_called = getattr(record, "function_called", "")
-        function_response = getattr(record, "function_response", "")
+        return "\n".join(
+            json.dumps(trace_event, ensure_ascii=False, separators=(",", ":"))
+            for trace_event in record.trace_events
+        )
+
+
+overflow_policies = ["drop_new", "drop_oldest", "block"]
+
+# Id of the command being handled, attached to every event logged while handling it
+_request_id: contextvars.ContextVar[typing.Optional[str]] = contextvars.ContextVar(
+    "ai_assistant_request_id", default=None
+)
+
+
+class BinaryEventHandler(RotatingSegmentHandler):
+    """Writes event records as length-prefixed binary records"""
+
+    def serialize(self, record):
+        return events.encode_binary(record.event)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler with a bounded queue and an explicit overflow policy.
+
+    Records are enqueued as they are; formatting happens on the writer thread.
+    When the queue is full, "drop_new" discards the incoming record,
+    "drop_oldest" discards the oldest queued record and "block" waits up to
+    `block_timeout` seconds before discarding the incoming record.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        overflow_policy: str = "drop_new",
+        block_timeout: float = 0.1,
+    ):
+        if overflow_policy not in overflow_policies:
+            raise ValueError(
+                f"Overflow policy must be one of: {', '.join(overflow_policies)}"
+            )
+
+        super().__init__(log_queue)
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.enqueued = 0
+        self.dropped = 0
+        self._counter_lock = threading.Lock()
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.overflow_policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow_policy != "drop_oldest" or not self._replace_oldest(
+                record
+            ):
+                with self._counter_lock:
+                    self.dropped += 1
+                return
+
+        with self._counter_lock:
+            self.enqueued += 1
+
+    def _replace_oldest(self, record) -> bool:
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            with self._counter_lock:
+                self.dropped += 1
+
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+
+class LogWriter:
+    """
+    Background thread writing queued records to their handlers in batches.
+
+    Each record goes to the handlers registered for its logger name. Handlers
+    are flushed once per `flush_interval` or every `batch_size` records, and
+    when the queue runs empty, rather than after every record.
+    """
 
-        # Return as comma-separated values
-        return f'"{timestamp}","{log_name}","{user_input}","{function_called}","{function_response}"'
+    _STOP = object()
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        handlers: typing.Dict[str, typing.List[logging.Handler]],
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+    ):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.flushes = 0
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Writes all queued records, flushes and closes the handlers."""
+        if not self._thread.is_alive():
+            return
+
+        try:
+            self.queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            pass
+
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush()
+                continue
+
+            if record is self._STOP:
+                break
+
+            self._handle(record)
+
+            # Drain whatever else is already queued before flushing once
+            stop = False
+            for _ in range(self.batch_size - 1):
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if record is self._STOP:
+                    stop = True
+                    break
+
+                self._handle(record)
+
+            if (
+                stop
+                or self._pending >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+                or self.queue.empty()
+            ):
+                self._flush()
+
+            if stop:
+                break
+
+        # Records enqueued after the stop marker are still written
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not self._STOP:
+                self._handle(record)
+
+        self._flush()
+        for handlers in self.handlers.values():
+            for handler in handlers:
+                handler.close()
+
+    def _handle(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+        self.written += 1
+        self._pending += 1
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        for handlers in self.handlers.values():
+            for handler in handlers:
+                handler.flush()
+
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self.flushes += 1
 
 
 class Logger:
     """
     Centralized logging system for the AI Assistant project.
 
-    Handles both regular log files and CSV files with structured data including:
-    - Full timestamp for each log entry
-    - Custom names for log entries (user input, function called, etc.)
+    Log calls only enqueue a record on a bounded queue; a background writer
+    thread formats and writes them in batches. The queue size, overflow policy
+    and flush interval are configured with the AI_ASSISTANT_LOG_QUEUE_SIZE,
+    AI_ASSISTANT_LOG_OVERFLOW and AI_ASSISTANT_LOG_FLUSH_INTERVAL environment
+    variables.
+
+    Handles both regular log files and event logs with structured data including:
+    - Timestamp in epoch nanoseconds for each event
+    - Event type and custom names for log entries (user input, function called, etc.)
     - User input tracking (text or speech)
     - Function/method call tracking
     - Function response logging
+
+    Events are written as JSON lines by default; set AI_ASSISTANT_EVENT_LOG_FORMAT
+    to "binary" for compact length-prefixed records or "csv" for the legacy format.
+    Use `helpers.events.read_events` to read them back.
     """
 
     _instance = None
@@ -52,14 +282,17 @@ class Logger:
             Logger._initialized = True
 
     def _setup_logging(self):
-        """Initialize the logging system with both regular and CSV loggers"""
+        """Initialize the logging system with both regular and event loggers"""
 
         # Create logs directory if it doesn't exist
         logs_dir = Path("logs")
         logs_dir.mkdir(exist_ok=True)
 
-        # Generate timestamp for log files
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Segments are rotated by size and age and compressed in the background
+        self.manifest = SegmentManifest(logs_dir)
+        self.compressor = SegmentCompressor(self.manifest)
+        max_bytes = int(os.getenv("AI_ASSISTANT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+        max_age = float(os.getenv("AI_ASSISTANT_LOG_ROTATE_INTERVAL", str(24 * 3600)))
 
         # Setup regular logger
         self.logger = logging.getLogger("ai_assistant")
@@ -69,14 +302,21 @@ class Logger:
         self.logger.handlers.clear()
 
         # Regular log file handler
-        log_file = logs_dir / f"ai_assistant_{timestamp}.log"
-        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler = RotatingSegmentHandler(
+            logs_dir,
+            ".log",
+            "log",
+            "text",
+            self.manifest,
+            self.compressor,
+            max_bytes,
+            max_age,
+        )
         file_formatter = logging.Formatter(
             "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
             datefmt="%Y-%m-%d %H:%M:%S",
         )
         file_handler.setFormatter(file_formatter)
-        self.logger.addHandler(file_handler)
 
         # Console handler (optional, for debugging)
         console_handler = logging.StreamHandler()
@@ -87,32 +327,90 @@ class Logger:
         # Uncomment the next line if you want console logging
         # self.logger.addHandler(console_handler)
 
-        # Setup CSV logger
-        self.csv_logger = logging.getLogger("ai_assistant_csv")
-        self.csv_logger.setLevel(logging.INFO)
-        self.csv_logger.handlers.clear()
-
-        # CSV file handler
-        csv_file = logs_dir / f"ai_assistant_{timestamp}.csv"
-        csv_handler = logging.FileHandler(csv_file, encoding="utf-8")
-        csv_handler.setFormatter(CSVFormatter())
-        self.csv_logger.addHandler(csv_handler)
-
-        # Write CSV header
-        with open(csv_file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(
-                [
-                    "Timestamp",
-                    "Log Name",
-                    "User Input",
-                    "Function Called",
-                    "Function Response",
-                ]
-            )
+        # Setup event logger
+        self.event_logger = logging.getLogger("ai_assistant_events")
+        self.event_logger.setLevel(logging.INFO)
+        self.event_logger.handlers.clear()
+
+        # Event file handler
+        self.event_format = os.getenv("AI_ASSISTANT_EVENT_LOG_FORMAT", "jsonl")
+        if self.event_format not in events.event_log_formats:
+            self.event_format = "jsonl"
+
+        event_handler_class = (
+            BinaryEventHandler
+            if self.event_format == "binary"
+            else RotatingSegmentHandler
+        )
+        event_handler = event_handler_class(
+            logs_dir,
+            events.EVENT_LOG_SUFFIXES[self.event_format],
+            "events",
+            self.event_format,
+            self.manifest,
+            self.compressor,
+            max_bytes,
+            max_age,
+            header=events.get_event_log_header(self.event_format),
+        )
+        event_handler.setFormatter(EventFormatter(self.event_format))
+
+        # Trace logger, spans of helpers.tracing in Chrome trace event format
+        self.trace_logger = logging.getLogger("ai_assistant_traces")
+        self.trace_logger.setLevel(logging.INFO)
+        self.trace_logger.handlers.clear()
+
+        trace_handler = RotatingSegmentHandler(
+            logs_dir,
+            events.TRACE_SUFFIX,
+            "traces",
+            "jsonl",
+            self.manifest,
+            self.compressor,
+            max_bytes,
+            max_age,
+        )
+        trace_handler.setFormatter(TraceFormatter())
+        self._active_handlers = [file_handler, event_handler, trace_handler]
+
+        # Both loggers only enqueue records, the writer thread does the file I/O
+        self.queue: queue.Queue = queue.Queue(
+            maxsize=int(os.getenv("AI_ASSISTANT_LOG_QUEUE_SIZE", "10000"))
+        )
+        self.queue_handler = BoundedQueueHandler(
+            self.queue, os.getenv("AI_ASSISTANT_LOG_OVERFLOW", "drop_new")
+        )
+        self.logger.addHandler(self.queue_handler)
+        self.event_logger.addHandler(self.queue_handler)
+        self.trace_logger.addHandler(self.queue_handler)
+        self.logger.propagate = False
+        self.event_logger.propagate = False
+        self.trace_logger.propagate = False
+
+        self.writer = LogWriter(
+            self.queue,
+            {
+                self.logger.name: [file_handler],
+                self.event_logger.name: [event_handler],
+                self.trace_logger.name: [trace_handler],
+            },
+            flush_interval=float(os.getenv("AI_ASSISTANT_LOG_FLUSH_INTERVAL", "1.0")),
+        )
+        self.writer.start()
+        atexit.register(self.shutdown)
+
+        # Compress segments left over by earlier runs and enforce retention
+        self.compressor.submit_pending()
+        self.retention_days = int(os.getenv("AI_ASSISTANT_LOG_RETENTION_DAYS", "30"))
+        self._retention_timer = start_periodic_task(
+            "log-retention",
+            float(os.getenv("AI_ASSISTANT_LOG_RETENTION_INTERVAL", "3600")),
+            lambda: self.cleanup_old_logs(self.retention_days),
+        )
 
         self.logger.info("Logging system initialized")
-        self._log_csv(
+        self._log_event(
+            EventType.SYSTEM_EVENT,
             "system",
             "",
             "logging_system_initialized",
@@ -131,7 +429,7 @@ class Logger:
         message = f"User input ({input_type}): {user_input}"
 
         self.logger.info(message)
-        self._log_csv(log_name, user_input, "", "")
+        self._log_event(EventType.USER_INPUT, log_name, user_input, "", "")
 
     def log_function_call(
         self,
@@ -152,10 +450,16 @@ class Logger:
         message = f"Function called: {function_name}{args_str}"
 
         self.logger.info(message)
-        self._log_csv(log_name, user_input, function_name, "")
+        self._log_event(
+            EventType.FUNCTION_CALLED, log_name, user_input, function_name, ""
+        )
 
     def log_function_response(
-        self, function_name: str, response: str, user_input: str = ""
+        self,
+        function_name: str,
+        response: str,
+        user_input: str = "",
+        duration_ns: typing.Optional[int] = None,
     ):
         """
         Log the response from a called function
@@ -164,12 +468,20 @@ class Logger:
             function_name: Name of the function that returned the response
             response: The function's response
             user_input: The original user input (optional)
+            duration_ns: How long the function ran in nanoseconds (optional)
         """
         log_name = "function_response"
         message = f"Response from {function_name}: {response}"
 
         self.logger.info(message)
-        self._log_csv(log_name, user_input, function_name, response)
+        self._log_event(
+            EventType.FUNCTION_RESPONSE,
+            log_name,
+            user_input,
+            function_name,
+            response,
+            duration_ns,
+        )
 
     def log_error(self, error_message: str, context: str = ""):
         """
@@ -187,7 +499,33 @@ class Logger:
         )
 
         self.logger.error(full_message)
-        self._log_csv(log_name, "", context, error_message)
+        self._log_event(EventType.ERROR, log_name, "", context, error_message)
+
+    def log_job_error(
+        self,
+        function_name: str,
+        error_message: str,
+        user_input: str = "",
+        duration_ns: typing.Optional[int] = None,
+    ):
+        """
+        Log an error raised by a job, attributed to the job itself
+
+        Args:
+            function_name: Name of the job that failed
+            error_message: The error message
+            user_input: The original user input (optional)
+            duration_ns: How long the job ran before failing in nanoseconds (optional)
+        """
+        self.logger.error(f"ERROR in {function_name}: {error_message}")
+        self._log_event(
+            EventType.ERROR,
+            events.JOB_ERROR_LOG_NAME,
+            user_input,
+            function_name,
+            error_message,
+            duration_ns,
+        )
 
     def log_system_event(self, event: str, details: str = ""):
         """
@@ -203,7 +541,7 @@ class Logger:
             message += f" - {details}"
 
         self.logger.info(message)
-        self._log_csv(log_name, "", event, details)
+        self._log_event(EventType.SYSTEM_EVENT, log_name, "", event, details)
 
     def log_custom(
         self,
@@ -219,32 +557,111 @@ class Logger:
         Args:
             log_name: Custom name for the log entry
             message: Log message for the regular log file
-            user_input: User input field for CSV
-            function_called: Function called field for CSV
-            function_response: Function response field for CSV
+            user_input: User input field of the event
+            function_called: Function called field of the event
+            function_response: Function response field of the event
         """
         self.logger.info(f"{log_name}: {message}")
-        self._log_csv(log_name, user_input, function_called, function_response)
+        self._log_event(
+            EventType.CUSTOM, log_name, user_input, function_called, function_response
+        )
+
+    def log_timing(self, stage: str, duration_ns: int, job: str = ""):
+        """
+        Log how long a stage of handling a command took
+
+        Args:
+            stage: Name of the timed stage, e.g. "send_message"
+            duration_ns: Duration measured with a monotonic clock in nanoseconds
+            job: Job the stage belongs to (optional)
+        """
+        self.logger.debug(f"Timing {stage}: {duration_ns / 1e6:.1f} ms")
+        self._log_event(EventType.TIMING, stage, "", job, "", duration_ns)
 
-    def _log_csv(
+    @contextlib.contextmanager
+    def timer(self, stage: str, job: str = ""):
+        """
+        Context manager logging the duration of its block as a timing event
+
+        Args:
+            stage: Name of the timed stage
+            job: Job the stage belongs to (optional)
+        """
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.log_timing(stage, time.perf_counter_ns() - start_ns, job)
+
+    @contextlib.contextmanager
+    def request_context(self):
+        """
+        Context manager correlating all events logged in its block by a request id.
+
+        Nested contexts keep the id of the outermost one, so a spoken command
+        and the job it triggers share an id.
+
+        Yields:
+            The request id
+        """
+        if (request_id := _request_id.get()) is not None:
+            yield request_id
+            return
+
+        request_id = uuid.uuid4().hex[:16]
+        token = _request_id.set(request_id)
+        try:
+            yield request_id
+        finally:
+            _request_id.reset(token)
+
+    def log_trace_events(self, trace_events: typing.List[typing.Dict[str, typing.Any]]):
+        """
+        Log the Chrome trace events of a finished span to the traces file
+
+        Args:
+            trace_events: Trace events created by `helpers.tracing.Span`
+        """
+        record = self.trace_logger.makeRecord(
+            name=self.trace_logger.name,
+            level=logging.INFO,
+            fn="",
+            lno=0,
+            msg="",
+            args=(),
+            exc_info=None,
+        )
+        record.trace_events = trace_events
+
+        self.trace_logger.handle(record)
+
+    def get_request_id(self) -> typing.Optional[str]:
+        """Get the id of the command being handled, if any"""
+        return _request_id.get()
+
+    def _log_event(
         self,
+        event_type: EventType,
         log_name: str,
         user_input: str,
         function_called: str,
         function_response: str,
+        duration_ns: typing.Optional[int] = None,
     ):
         """
-        Internal method to log to CSV file
+        Internal method to log to the event file
 
         Args:
+            event_type: Kind of the event
             log_name: Name/category of the log entry
             user_input: User input text
             function_called: Name of function that was called
             function_response: Response from the function
+            duration_ns: Duration of the logged operation in nanoseconds
         """
-        # Create a log record with custom attributes
-        record = self.csv_logger.makeRecord(
-            name=self.csv_logger.name,
+        # Create a log record carrying the event, encoded on the writer thread
+        record = self.event_logger.makeRecord(
+            name=self.event_logger.name,
             level=logging.INFO,
             fn="",
             lno=0,
@@ -252,18 +669,51 @@ class Logger:
             args=(),
             exc_info=None,
         )
+        record.event = events.make_event(
+            time.time_ns(),
+            event_type,
+            log_name,
+            user_input,
+            function_called,
+            function_response,
+            duration_ns,
+            _request_id.get(),
+        )
+
+        self.event_logger.handle(record)
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """
+        Get logging pipeline statistics
+
+        Returns:
+            Queue depth and capacity, overflow policy and counters of enqueued,
+            dropped and written records and of flushes
+        """
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "overflow_policy": self.queue_handler.overflow_policy,
+            "enqueued": self.queue_handler.enqueued,
+            "dropped": self.queue_handler.dropped,
+            "written": self.writer.written,
+            "flushes": self.writer.flushes,
+        }
+
+    def shutdown(self, timeout: float = 5.0):
+        """
+        Write all queued records and stop the writer thread
+
+        Args:
+            timeout: Maximum number of seconds to wait for the queue to drain
+        """
+        if not self.writer.is_alive():
+            return
 
-        # Add custom attributes
-        record.log_name = log_name
-        record.user_input = (
-            user_input.replace('"', '""') if user_input else ""
-        )  # Escape quotes for CSV
-        record.function_called = function_called
-        record.function_response = (
-            function_response.replace('"', '""') if function_response else ""
-        )  # Escape quotes for CSV
+        if dropped := self.queue_handler.dropped:
+            self.logger.warning(f"Dropped {dropped} log records due to a full queue")
 
-        self.csv_logger.handle(record)
+        self.writer.stop(timeout)
 
     def get_logs_directory(self) -> Path:
         """Get the logs directory path"""
@@ -278,17 +728,27 @@ class Logger:
         """
         logs_dir = self.get_logs_directory()
         cutoff_time = datetime.now().timestamp() - (days_to_keep * 24 * 60 * 60)
-
-        deleted_count = 0
-        for log_file in logs_dir.glob("ai_assistant_*.log"):
-            if log_file.stat().st_mtime < cutoff_time:
-                log_file.unlink()
-                deleted_count += 1
-
-        for csv_file in logs_dir.glob("ai_assistant_*.csv"):
-            if csv_file.stat().st_mtime < cutoff_time:
-                csv_file.unlink()
-                deleted_count += 1
+        # Handlers hold absolute paths, while the segments are found relative to cwd
+        active_files = {
+            Path(handler.baseFilename).resolve() for handler in self._active_handlers
+        }
+
+        deleted_files = []
+        for log_file in events.find_log_segments(logs_dir):
+            if log_file.resolve() in active_files:
+                continue
+
+            try:
+                if log_file.stat().st_mtime < cutoff_time:
+                    log_file.unlink()
+                    deleted_files.append(log_file.name)
+            except FileNotFoundError:
+                # Compressed or deleted by another thread or process meanwhile
+                continue
+
+        deleted_count = len(deleted_files)
+        if deleted_files:
+            self.manifest.remove(deleted_files)
 
         if deleted_count > 0:
             self.log_system_event(
@@ -0,0 +1,443 @@
+import bisect
+import math
+import threading
+import typing
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = typing.Tuple[str, ...]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(
+    label_names: typing.Sequence[str],
+    label_values: typing.Sequence[str],
+    extra: typing.Optional[typing.Tuple[str, str]] = None,
+) -> str:
+    pairs = list(zip(label_names, label_values))
+    if extra is not None:
+        pairs.append(extra)
+
+    if not pairs:
+        return ""
+
+    return (
+        "{"
+        + ",".join(
+            f'{name}="{_escape_label_value(str(value))}"' for name, value in pairs
+        )
+        + "}"
+    )
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base class of metrics with a fixed set of label names.
+
+    Each metric has its own lock, held only while a single value is updated,
+    so recording a metric on the command path costs about a dict update.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: typing.Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: typing.Dict[str, typing.Any]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"Metric {self.name} expects labels: {', '.join(self.label_names)}"
+            )
+
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> typing.List[typing.Tuple[str, str, float]]:
+        """Returns (sample name, formatted labels, value) of every sample"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. of handled commands"""
+
+    metric_type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: typing.Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self._values: typing.Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: typing.Any) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be increased")
+
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: typing.Any) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self) -> typing.List[typing.Tuple[str, str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+
+        return [
+            (self.name, _format_labels(self.label_names, key), value)
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. the number of running background jobs"""
+
+    metric_type = "gauge"
+
+    def inc(self, amount: float = 1, **labels: typing.Any) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: typing.Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: typing.Any) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. latencies in seconds, in fixed buckets"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: count of every bucket (non-cumulative), sum, count
+        self._values: typing.Dict[LabelValues, typing.List[typing.Any]] = {}
+
+    def observe(self, value: float, **labels: typing.Any) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            if (data := self._values.get(key)) is None:
+                data = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            data[0][index] += 1
+            data[1] += value
+            data[2] += 1
+
+    def samples(self) -> typing.List[typing.Tuple[str, str, float]]:
+        with self._lock:
+            values = [
+                (key, list(bucket_counts), total, count)
+                for key, (bucket_counts, total, count) in self._values.items()
+            ]
+
+        samples = []
+        for key, bucket_counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), bucket_counts):
+                cumulative += bucket_count
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        _format_labels(
+                            self.label_names, key, ("le", _format_value(bound))
+                        ),
+                        cumulative,
+                    )
+                )
+
+            labels = _format_labels(self.label_names, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+
+        return samples
+
+
+class CallbackMetric(Metric):
+    """
+    Metric whose values are read from a callback when metrics are collected,
+    for state kept elsewhere such as queue depths or cache statistics.
+
+    The callback returns (label values dict, value) pairs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        callback: typing.Callable[
+            [], typing.Iterable[typing.Tuple[typing.Dict[str, typing.Any], float]]
+        ],
+        label_names: typing.Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.metric_type = metric_type
+        self.callback = callback
+
+    def samples(self) -> typing.List[typing.Tuple[str, str, float]]:
+        try:
+            values = list(self.callback())
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return []
+
+        return [
+            (
+                self.name,
+                _format_labels(self.label_names, self._label_values(labels)),
+                value,
+            )
+            for labels, value in values
+        ]
+
+
+class MetricsRegistry:
+    """
+    In-process registry of metrics, rendered in the Prometheus text format.
+
+    Creating a metric that already exists returns the existing one, so modules
+    can declare the metrics they record at import time.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: typing.Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(
+        self, name: str, factory: typing.Callable[[], Metric]
+    ) -> typing.Any:
+        with self._lock:
+            if (metric := self._metrics.get(name)) is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, label_names: typing.Sequence[str] = ()
+    ) -> Counter:
+        return self._get_or_create(
+            name, lambda: Counter(name, documentation, label_names)
+        )
+
+    def gauge(
+        self, name: str, documentation: str, label_names: typing.Sequence[str] = ()
+    ) -> Gauge:
+        return self._get_or_create(
+            name, lambda: Gauge(name, documentation, label_names)
+        )
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(
+            name, lambda: Histogram(name, documentation, label_names, buckets)
+        )
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        callback: typing.Callable[
+            [], typing.Iterable[typing.Tuple[typing.Dict[str, typing.Any], float]]
+        ],
+        label_names: typing.Sequence[str] = (),
+    ) -> CallbackMetric:
+        return self._get_or_create(
+            name,
+            lambda: CallbackMetric(
+                name, documentation, metric_type, callback, label_names
+            ),
+        )
+
+    def get_metrics(self) -> typing.List[Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.get_metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+COMMANDS = registry.counter(
+    "ai_assistant_commands_total",
+    "Commands received, by source (text, speech, api or button)",
+    ["source"],
+)
+ROUTING = registry.counter(
+    "ai_assistant_routing_total",
+    "Routed commands, by path (direct, local, llm or none when no job was found)",
+    ["path"],
+)
+TOOL_SET_RETRIES = registry.counter(
+    "ai_assistant_tool_set_retries_total",
+    "Function selections repeated with all jobs after the pruned tool set missed",
+)
+JOB_DURATION = registry.histogram(
+    "ai_assistant_job_duration_seconds", "Duration of job runs", ["job"]
+)
+JOB_ERRORS = registry.counter(
+    "ai_assistant_job_errors_total", "Job runs that raised an exception", ["job"]
+)
+LLM_DURATION = registry.histogram(
+    "ai_assistant_llm_request_duration_seconds",
+    "Duration of model requests, by backend",
+    ["backend"],
+)
+LLM_TOKENS = registry.counter(
+    "ai_assistant_llm_tokens_total",
+    "Tokens of model requests, by backend and direction (input, output, or "
+    "cached_input for input tokens read from the provider's prompt cache)",
+    ["backend", "direction"],
+)
+LLM_FIRST_TOKEN = registry.histogram(
+    "ai_assistant_llm_first_token_seconds",
+    "Time from a streaming model request to its first text, by backend",
+    ["backend"],
+)
+LLM_ROUTED = registry.counter(
+    "ai_assistant_llm_routed_requests_total",
+    "Model requests sent by the router, by backend, kind (send or stream) and "
+    "outcome (success, error or cancelled)",
+    ["backend", "kind", "outcome"],
+)
+LLM_HEDGES = registry.counter(
+    "ai_assistant_llm_hedged_requests_total",
+    "Hedged model requests, by the backend the request was hedged to",
+    ["backend", "kind"],
+)
+BACKGROUND_JOBS = registry.gauge(
+    "ai_assistant_background_jobs", "Background job threads currently running", ["job"]
+)
+BACKGROUND_JOBS_STARTED = registry.counter(
+    "ai_assistant_background_jobs_started_total",
+    "Background job threads started",
+    ["job"],
+)
+
+
+def _memoization_samples(field: str):
+    # Lazy import to avoid circular dependencies
+    from helpers.decorators import get_memoization_stats
+
+    for function, stats in get_memoization_stats().items():
+        if field == "hit_ratio":
+            lookups = stats["hits"] + stats["misses"]
+            yield {"function": function}, stats["hits"] / lookups if lookups else 0
+        else:
+            yield {"function": function}, stats[field]
+
+
+def _backend_samples(field: str):
+    from helpers.model_router import get_all_backend_stats
+
+    for (backend, kind), stats in get_all_backend_stats().items():
+        if field == "p95":
+            if (p95 := stats.get_p95()) is not None:
+                yield {"backend": backend, "kind": kind}, p95
+        else:
+            yield {"backend": backend, "kind": kind}, stats.get_error_rate()
+
+
+def _logger_samples(field: str):
+    from helpers.logger import logger
+
+    yield {}, logger.get_stats()[field]
+
+
+registry.callback(
+    "ai_assistant_cache_hits_total",
+    "Memoized lookups answered from the cache",
+    "counter",
+    lambda: _memoization_samples("hits"),
+    ["function"],
+)
+registry.callback(
+    "ai_assistant_cache_misses_total",
+    "Memoized lookups that called the function",
+    "counter",
+    lambda: _memoization_samples("misses"),
+    ["function"],
+)
+registry.callback(
+    "ai_assistant_cache_hit_ratio",
+    "Share of memoized lookups answered from the cache",
+    "gauge",
+    lambda: _memoization_samples("hit_ratio"),
+    ["function"],
+)
+registry.callback(
+    "ai_assistant_llm_backend_p95_seconds",
+    "Rolling p95 latency of model requests, by backend and kind; for streams "
+    "the time to the first text",
+    "gauge",
+    lambda: _backend_samples("p95"),
+    ["backend", "kind"],
+)
+registry.callback(
+    "ai_assistant_llm_backend_error_ratio",
+    "Rolling share of failed model requests, by backend and kind",
+    "gauge",
+    lambda: _backend_samples("error_rate"),
+    ["backend", "kind"],
+)
+registry.callback(
+    "ai_assistant_log_queue_depth",
+    "Log records waiting for the writer thread",
+    "gauge",
+    lambda: _logger_samples("queued"),
+)
+registry.callback(
+    "ai_assistant_log_queue_capacity",
+    "Maximum number of queued log records",
+    "gauge",
+    lambda: _logger_samples("capacity"),
+)
+registry.callback(
+    "ai_assistant_log_records_dropped_total",
+    "Log records dropped because the queue was full",
+    "counter",
+    lambda: _logger_samples("dropped"),
+)
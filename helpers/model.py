@@ -1,18 +1,83 @@
+import asyncio
 import base64
+import hashlib
+import json
+import math
+import operator
 import os
+import sys
+import time
 import typing
 
-import anthropic
-import numpy as np
-import ollama
-from google import genai
-from google.genai import types as genai_types
-
 import helpers.tools as helpers_tools
+from helpers import metrics, tracing
 from helpers.cache import Cache
+from helpers.logger import logger
+from helpers.registry import ServiceRegistry
+
+# Provider SDKs are imported only when their backend is used, so starting the
+# assistant never pays for loading SDKs of backends that are not configured
+if typing.TYPE_CHECKING:
+    import anthropic
+    import numpy as np
+    import ollama
+    from google.genai import client as genai_client
+    from google.genai import types as genai_types
+
+T = typing.TypeVar("T")
+
+_MISSING = object()
 
 available_models = ["gemini", "sonnet", "ollama"]
 
+GEMINI_MODEL = "gemini-2.0-flash"
+ANTHROPIC_MODEL = "claude-3-7-sonnet-20250219"
+
+# Seconds async requests wait for a response, or for each delta of a stream
+REQUEST_TIMEOUT = float(os.getenv("AI_ASSISTANT_LLM_TIMEOUT", "30"))
+
+# The static prefix of requests with tools (system instructions and tool
+# schemas) is cached by the provider, so repeated routing requests only pay
+# for the user's message
+PROMPT_CACHE = os.getenv("AI_ASSISTANT_PROMPT_CACHE", "1") != "0"
+PROMPT_CACHE_TTL = int(os.getenv("AI_ASSISTANT_PROMPT_CACHE_TTL", "3600"))
+
+# Gemini tool objects built from the compiled schemas, keyed by the tuple of jobs
+_gemini_tools_cache: typing.Dict[
+    typing.Tuple[typing.Callable, ...], "genai_types.Tool"
+] = {}
+
+# Anthropic tool lists ending with a cache breakpoint, keyed by the tuple of jobs
+_anthropic_tools_cache: typing.Dict[
+    typing.Tuple[typing.Callable, ...], typing.List[typing.Dict[str, typing.Any]]
+] = {}
+
+# Hashes of static prompt prefixes, keyed by the tuple of jobs and system instructions
+_prompt_keys: typing.Dict[
+    typing.Tuple[typing.Tuple[typing.Callable, ...], typing.Optional[str]], str
+] = {}
+
+# Gemini cached content names with their expiry (monotonic), keyed by prompt
+# prefix hash; the name is None when the prefix could not be cached
+_gemini_cached_contents: typing.Dict[str, typing.Tuple[typing.Optional[str], float]] = (
+    {}
+)
+
+# Running cached content creations, referenced until they finish
+_background_tasks: typing.Set["asyncio.Future[None]"] = set()
+
+
+def _clear_prompt_caches(version: int) -> None:
+    """Drops everything derived from the registered jobs after the registry changed"""
+    _gemini_tools_cache.clear()
+    _anthropic_tools_cache.clear()
+    _prompt_keys.clear()
+    # Cached contents on the server expire with their TTL
+    _gemini_cached_contents.clear()
+
+
+ServiceRegistry.subscribe(_clear_prompt_caches)
+
 
 def get_model() -> typing.Optional[
     typing.List[
@@ -41,152 +106,681 @@ def get_model() -> typing.Optional[
         return ["sonnet", anthropic_key]
 
 
-def send_message(
-    client: typing.Optional[
-        typing.Union[genai.Client, anthropic.Anthropic, ollama.Client]
-    ],
+def get_models() -> typing.List[typing.Tuple[str, typing.Optional[str]]]:
+    """
+    Returns every configured backend with its API key, in the priority order
+    of `get_model`. In local mode only Ollama is used, otherwise Ollama is the
+    last fallback when `AI_MODEL` names a local model.
+    """
+    if Cache.get_local():
+        return [("ollama", None)]
+
+    models: typing.List[typing.Tuple[str, typing.Optional[str]]] = []
+    if gemini_key := os.environ.get("GEMINI_API_KEY"):
+        models.append(("gemini", gemini_key))
+
+    if anthropic_key := os.environ.get("ANTHROPIC_API_KEY"):
+        models.append(("sonnet", anthropic_key))
+
+    if os.environ.get("AI_MODEL"):
+        models.append(("ollama", None))
+
+    return models
+
+
+def create_async_client(
+    backend: str, api_key: typing.Optional[str] = None
+) -> typing.Union[
+    "genai_client.AsyncClient", "anthropic.AsyncAnthropic", "ollama.AsyncClient"
+]:
+    """
+    Creates an asyncio SDK client for the given backend, for `send_message_async`
+    and `stream_message_async`.
+
+    Args:
+        backend: One of "gemini", "sonnet" or "ollama"
+        api_key: API key for the remote backends
+
+    Returns:
+        The async SDK client
+    """
+    if backend == "gemini":
+        from google import genai
+
+        return genai.Client(api_key=api_key).aio
+
+    elif backend == "sonnet":
+        import anthropic
+
+        return anthropic.AsyncAnthropic(api_key=api_key)
+
+    elif backend == "ollama":
+        import ollama
+
+        return ollama.AsyncClient()
+
+    raise Exception(f"Unsupported model type: {backend}")
+
+
+def _is_sdk_instance(obj: typing.Any, module_name: str, class_path: str) -> bool:
+    """
+    Checks if the object is an instance of an SDK class without importing the SDK.
+    An SDK that was never imported cannot have created the object.
+    """
+    if (module := sys.modules.get(module_name)) is None:
+        return False
+
+    return isinstance(obj, operator.attrgetter(class_path)(module))
+
+
+AsyncClient = typing.Union[
+    "genai_client.AsyncClient", "anthropic.AsyncAnthropic", "ollama.AsyncClient"
+]
+Response = typing.Union[
+    "genai_types.GenerateContentResponse",
+    "anthropic.types.Message",
+    "ollama.ChatResponse",
+]
+
+
+async def send_message_async(
+    client: typing.Optional[AsyncClient],
     message: str,
     system_instructions: typing.Optional[str] = None,
     available_tools: typing.Optional[typing.List[typing.Callable]] = None,
-    image: typing.Optional[np.ndarray] = None,
-) -> typing.Union[
-    genai_types.GenerateContentResponse, anthropic.types.Message, ollama.ChatResponse
-]:
+    image: typing.Optional["np.ndarray"] = None,
+    timeout: typing.Optional[float] = REQUEST_TIMEOUT,
+) -> Response:
+    """
+    Sends a message with a client created with `create_async_client`. Synchronous
+    callers run it on the shared event loop with `helpers.event_loop.run_sync`.
+
+    Args:
+        timeout: Seconds to wait for the response, None to wait indefinitely
+
+    Raises:
+        TimeoutError: When the response did not arrive in time; the request is cancelled
+    """
     if client is None:
         raise Exception("Client is not initialized.")
 
-    parsed_tools = None
-    if available_tools:
-        parsed_tools = [
-            helpers_tools.function_to_schema(func) for func in available_tools
-        ]
-
-    base64_image = None
-    if image is not None:
-        base64_image = helpers_tools.numpy_image_to_base64_bytes(image)
-
-    if isinstance(client, genai.Client):
-        config = None
-        if system_instructions or parsed_tools:
-            config = genai_types.GenerateContentConfig(
-                system_instruction=system_instructions,
-                tools=(
-                    [
-                        genai_types.Tool(
-                            function_declarations=[
-                                genai_types.FunctionDeclaration(**x)
-                                for x in parsed_tools
-                            ]
-                        )
-                    ]
-                    if parsed_tools
-                    else None
+    with tracing.start_span("send_message"), logger.timer("send_message"):
+        try:
+            return await asyncio.wait_for(
+                _send_message_async(
+                    client, message, system_instructions, available_tools, image
                 ),
+                timeout,
             )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Model request timed out after {timeout} s") from None
 
-        content = message
-        if base64_image is not None:
-            content = [
-                genai_types.Part.from_bytes(
-                    data=base64.b64decode(base64_image), mime_type="image/jpeg"
-                ),
-                message,
-            ]
 
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=content,
-            config=config,
+async def _send_message_async(
+    client: AsyncClient,
+    message: str,
+    system_instructions: typing.Optional[str],
+    available_tools: typing.Optional[typing.List[typing.Callable]],
+    image: typing.Optional["np.ndarray"],
+) -> Response:
+    start_ns = time.perf_counter_ns()
+
+    if _is_sdk_instance(client, "google.genai.client", "AsyncClient"):
+        cached_content = None
+        if PROMPT_CACHE and is_full_tool_set(available_tools):
+            key = get_prompt_key(system_instructions, available_tools)
+            if (cached_content := _get_gemini_cached_content(key)) is _MISSING:
+                # Created in the background and used from the next request on
+                cached_content = _mark_gemini_cached_content_pending(key)
+                task = asyncio.ensure_future(
+                    _create_gemini_cached_content_async(
+                        client, key, system_instructions, available_tools
+                    )
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+
+        try:
+            response = await client.models.generate_content(
+                **_get_gemini_request(
+                    message, system_instructions, available_tools, image, cached_content
+                )
+            )
+        except Exception as e:
+            if cached_content is None or not _is_cached_content_missing(e):
+                raise
+
+            # The cached content expired early or was deleted, retry with the full prompt
+            _drop_gemini_cached_content(cached_content)
+            response = await client.models.generate_content(
+                **_get_gemini_request(
+                    message, system_instructions, available_tools, image
+                )
+            )
+
+        _record_usage("gemini", GEMINI_MODEL, response, start_ns)
+        return response
+
+    elif _is_sdk_instance(client, "anthropic", "AsyncAnthropic"):
+        response = await client.messages.create(
+            **_get_anthropic_request(
+                message, system_instructions, available_tools, image
+            )
         )
 
+        _record_usage("sonnet", ANTHROPIC_MODEL, response, start_ns)
         return response
 
-    elif isinstance(client, anthropic.Anthropic):
-        messages_content = message
-        if base64_image is not None:
-            messages_content = [
-                {"type": "text", "text": message},
-                {
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": base64_image,
-                    },
-                },
-            ]
+    elif _is_sdk_instance(client, "ollama", "AsyncClient"):
+        request = _get_ollama_request(message, system_instructions, available_tools)
+        response = await client.chat(**request, stream=False)
 
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=1024,
-            messages=[{"role": "user", "content": messages_content}],
-            system=(
-                system_instructions if system_instructions else anthropic.NOT_GIVEN
-            ),
-            tools=parsed_tools if parsed_tools else anthropic.NOT_GIVEN,  # type: ignore
+        _record_usage("ollama", request["model"], response, start_ns)
+        return response
+
+    raise Exception(
+        "Invalid client type. Expected genai AsyncClient, anthropic.AsyncAnthropic or ollama.AsyncClient."
+    )
+
+
+async def stream_message_async(
+    client: typing.Optional[AsyncClient],
+    message: str,
+    system_instructions: typing.Optional[str] = None,
+    timeout: typing.Optional[float] = REQUEST_TIMEOUT,
+) -> typing.AsyncIterator[str]:
+    """
+    Sends a message without tools and yields the text of the answer as it is
+    generated, so callers can act on the first sentence before the rest arrives.
+    Synchronous callers iterate it with `helpers.event_loop.iterate_sync`.
+
+    The request runs in a "stream_message" span and timer, and the time to the
+    first text is logged as the "stream_message.first_token" timing event.
+
+    Args:
+        timeout: Seconds to wait for each text delta, the first one included, so
+                 a stalled stream is cancelled while long answers are not cut off.
+                 None waits indefinitely
+
+    Raises:
+        TimeoutError: When no text arrived in time; the request is cancelled
+    """
+    if client is None:
+        raise Exception("Client is not initialized.")
+
+    with tracing.start_span("stream_message"), logger.timer("stream_message"):
+        start_ns = time.perf_counter_ns()
+
+        if _is_sdk_instance(client, "google.genai.client", "AsyncClient"):
+            backend, model = "gemini", GEMINI_MODEL
+            deltas = _stream_gemini_async(client, message, system_instructions)
+
+        elif _is_sdk_instance(client, "anthropic", "AsyncAnthropic"):
+            backend, model = "sonnet", ANTHROPIC_MODEL
+            deltas = _stream_anthropic_async(client, message, system_instructions)
+
+        elif _is_sdk_instance(client, "ollama", "AsyncClient"):
+            backend, model = "ollama", _get_ollama_model()
+            deltas = _stream_ollama_async(client, message, system_instructions)
+
+        else:
+            raise Exception(
+                "Invalid client type. Expected genai AsyncClient, anthropic.AsyncAnthropic or ollama.AsyncClient."
+            )
+
+        final_response = None
+        first_token = True
+        try:
+            while True:
+                try:
+                    text, final_response = await _next_with_timeout(deltas, timeout)
+                except StopAsyncIteration:
+                    break
+
+                if not text:
+                    continue
+
+                if first_token:
+                    first_token = False
+                    _record_first_token(backend, start_ns)
+
+                yield text
+        finally:
+            # Closes the HTTP stream also when the consumer stopped early
+            await deltas.aclose()
+
+        _record_usage(backend, model, final_response, start_ns)
+
+
+async def _next_with_timeout(
+    iterator: typing.AsyncIterator[T], timeout: typing.Optional[float]
+) -> T:
+    """
+    Awaits the next item within the current task, so streams holding
+    connections or cancel scopes are never resumed from another task.
+    """
+    if timeout is None:
+        return await iterator.__anext__()
+
+    try:
+        async with asyncio.timeout(timeout):
+            return await iterator.__anext__()
+    except TimeoutError:
+        raise TimeoutError(f"Model stream stalled for {timeout} s") from None
+
+
+async def _stream_gemini_async(
+    client: "genai_client.AsyncClient",
+    message: str,
+    system_instructions: typing.Optional[str],
+) -> typing.AsyncIterator[typing.Tuple[str, typing.Any]]:
+    async for chunk in await client.models.generate_content_stream(
+        **_get_gemini_request(message, system_instructions)
+    ):
+        yield chunk.text or "", chunk
+
+
+async def _stream_anthropic_async(
+    client: "anthropic.AsyncAnthropic",
+    message: str,
+    system_instructions: typing.Optional[str],
+) -> typing.AsyncIterator[typing.Tuple[str, typing.Any]]:
+    async with client.messages.stream(
+        **_get_anthropic_request(message, system_instructions)
+    ) as stream:
+        async for text in stream.text_stream:
+            yield text, None
+
+        yield "", await stream.get_final_message()
+
+
+async def _stream_ollama_async(
+    client: "ollama.AsyncClient",
+    message: str,
+    system_instructions: typing.Optional[str],
+) -> typing.AsyncIterator[typing.Tuple[str, typing.Any]]:
+    async for chunk in await client.chat(
+        **_get_ollama_request(message, system_instructions), stream=True
+    ):
+        yield chunk.message.content or "", chunk
+
+
+def _get_gemini_request(
+    message: str,
+    system_instructions: typing.Optional[str] = None,
+    available_tools: typing.Optional[typing.List[typing.Callable]] = None,
+    image: typing.Optional["np.ndarray"] = None,
+    cached_content: typing.Optional[str] = None,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Arguments of `generate_content`, shared by the sync and async clients.
+    With a cached content, the system instructions and tools are read from it.
+    """
+    from google.genai import types as genai_types
+
+    config = None
+    if cached_content is not None:
+        config = genai_types.GenerateContentConfig(cached_content=cached_content)
+
+    elif system_instructions or available_tools:
+        config = genai_types.GenerateContentConfig(
+            system_instruction=system_instructions,
+            tools=([_get_gemini_tool(available_tools)] if available_tools else None),
         )
 
-        return response
+    content: typing.Any = message
+    if image is not None:
+        content = [
+            genai_types.Part.from_bytes(
+                data=base64.b64decode(helpers_tools.numpy_image_to_base64_bytes(image)),
+                mime_type="image/jpeg",
+            ),
+            message,
+        ]
 
-    elif isinstance(client, ollama.Client):
-        messages = [
+    return {"model": GEMINI_MODEL, "contents": content, "config": config}
+
+
+def _get_anthropic_request(
+    message: str,
+    system_instructions: typing.Optional[str] = None,
+    available_tools: typing.Optional[typing.List[typing.Callable]] = None,
+    image: typing.Optional["np.ndarray"] = None,
+) -> typing.Dict[str, typing.Any]:
+    """Arguments of `messages.create`, shared by the sync and async clients"""
+    import anthropic
+
+    parsed_tools = None
+    if available_tools:
+        parsed_tools = _get_anthropic_tools(available_tools)
+
+    system: typing.Any = system_instructions or anthropic.NOT_GIVEN
+    if PROMPT_CACHE and available_tools and system_instructions:
+        # Caches the tools and system instructions as one prefix
+        system = [
             {
-                "role": "user",
-                "content": message,
+                "type": "text",
+                "text": system_instructions,
+                "cache_control": {"type": "ephemeral"},
             }
         ]
 
-        if system_instructions:
-            messages = [
-                {
-                    "role": "assistant",
-                    "content": system_instructions,
+    messages_content: typing.Any = message
+    if image is not None:
+        messages_content = [
+            {"type": "text", "text": message},
+            {
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/jpeg",
+                    "data": helpers_tools.numpy_image_to_base64_bytes(image),
                 },
-                *messages,
-            ]
+            },
+        ]
 
-        if (model := os.getenv("AI_MODEL", None)) is None:
-            raise Exception("AI_MODEL environment variable is not set.")
+    return {
+        "model": ANTHROPIC_MODEL,
+        "max_tokens": 1024,
+        "messages": [{"role": "user", "content": messages_content}],
+        "system": system,
+        "tools": parsed_tools if parsed_tools else anthropic.NOT_GIVEN,
+    }
+
+
+def _get_anthropic_tools(
+    available_tools: typing.List[typing.Callable],
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Returns the Anthropic tool schemas, ending with a cache breakpoint"""
+    schemas = helpers_tools.functions_to_schemas(available_tools, "sonnet")
+    if not PROMPT_CACHE:
+        return schemas
+
+    key = tuple(available_tools)
+    if (tools := _anthropic_tools_cache.get(key)) is None:
+        # Rendered schemas are shared by all requests, so the breakpoint goes on a copy
+        tools = [*schemas[:-1], {**schemas[-1], "cache_control": {"type": "ephemeral"}}]
+        _anthropic_tools_cache[key] = tools
+
+    return tools
+
+
+def get_prompt_key(
+    system_instructions: typing.Optional[str],
+    available_tools: typing.Sequence[typing.Callable],
+) -> str:
+    """Hash of the static prompt prefix: the system instructions and tool specs"""
+    cache_key = (tuple(available_tools), system_instructions)
+    if (key := _prompt_keys.get(cache_key)) is None:
+        digest = hashlib.sha256((system_instructions or "").encode())
+        for func in available_tools:
+            digest.update(
+                json.dumps(
+                    helpers_tools.compile_function(func), sort_keys=True, default=str
+                ).encode()
+            )
 
-        response = client.chat(
-            model=model,
-            messages=messages,
-            stream=False,
+        key = _prompt_keys[cache_key] = digest.hexdigest()
+
+    return key
+
+
+def _get_gemini_cache_request(
+    system_instructions: typing.Optional[str],
+    available_tools: typing.List[typing.Callable],
+) -> typing.Dict[str, typing.Any]:
+    """Arguments of `caches.create` for the static prefix of a request"""
+    from google.genai import types as genai_types
+
+    return {
+        "model": GEMINI_MODEL,
+        "config": genai_types.CreateCachedContentConfig(
+            system_instruction=system_instructions,
+            tools=[_get_gemini_tool(available_tools)],
+            ttl=f"{PROMPT_CACHE_TTL}s",
+        ),
+    }
+
+
+def is_full_tool_set(
+    available_tools: typing.Optional[typing.Sequence[typing.Callable]],
+) -> bool:
+    """
+    Checks whether the tools are all registered jobs. Only this set is stable
+    enough to be cached on the provider's side, the tool sets pruned for a
+    single command differ between commands.
+    """
+    if not available_tools:
+        return False
+
+    return set(available_tools) == set(ServiceRegistry.get_all_jobs().values())
+
+
+async def _create_gemini_cached_content_async(
+    client: "genai_client.AsyncClient",
+    key: str,
+    system_instructions: typing.Optional[str],
+    available_tools: typing.List[typing.Callable],
+) -> None:
+    try:
+        created = await client.caches.create(
+            **_get_gemini_cache_request(system_instructions, available_tools)
         )
+    except asyncio.CancelledError:
+        # Created again by the next request
+        _gemini_cached_contents.pop(key, None)
+        raise
+    except Exception as e:
+        created = e
 
-        return response
+    _store_gemini_cached_content(key, created)
 
-    raise Exception(
-        "Invalid client type. Expected genai.Client, anthropic.Anthropic or ollama.Client."
+
+def _mark_gemini_cached_content_pending(key: str) -> None:
+    """Stops other requests from creating the same cached content meanwhile"""
+    _gemini_cached_contents[key] = (None, math.inf)
+
+
+def _get_gemini_cached_content(key: str) -> typing.Any:
+    """
+    Returns the name of the cached content holding the prefix, None when the
+    prefix could not be cached or is still being created, or `_MISSING` when it
+    has to be created.
+    """
+    entry = _gemini_cached_contents.get(key)
+    if entry is None or entry[1] <= time.monotonic():
+        return _MISSING
+
+    return entry[0]
+
+
+def _store_gemini_cached_content(
+    key: str, created: typing.Union["genai_types.CachedContent", Exception]
+) -> typing.Optional[str]:
+    """
+    Remembers the cached content created for the prefix, or that it could not
+    be created (e.g. a prefix below the provider's minimum size), so creating
+    it is not retried until the TTL has passed.
+    """
+    name = None
+    if isinstance(created, Exception):
+        logger.log_error(
+            f"Could not cache the Gemini prompt prefix: {created}", "send_message"
+        )
+    else:
+        name = created.name
+
+    # Renewed before the provider deletes it
+    _gemini_cached_contents[key] = (
+        name,
+        time.monotonic() + PROMPT_CACHE_TTL * 0.9,
     )
 
+    return name
+
+
+def _is_cached_content_missing(error: Exception) -> bool:
+    """Checks whether Gemini rejected a request because its cached content is gone"""
+    from google.genai import errors as genai_errors
+
+    if not isinstance(error, genai_errors.ClientError):
+        return False
+
+    if error.code == 404 or error.status == "NOT_FOUND":
+        return True
+
+    # Expired cached content may also be reported as an invalid argument
+    message = (error.message or "").lower()
+    return "cached" in message and ("expire" in message or "not found" in message)
+
+
+def _drop_gemini_cached_content(name: str) -> None:
+    for key, (cached_name, _) in list(_gemini_cached_contents.items()):
+        if cached_name == name:
+            _gemini_cached_contents.pop(key, None)
+
+
+def _get_ollama_request(
+    message: str,
+    system_instructions: typing.Optional[str] = None,
+    available_tools: typing.Optional[typing.List[typing.Callable]] = None,
+) -> typing.Dict[str, typing.Any]:
+    """Arguments of `chat`, shared by the sync and async clients"""
+    messages = [
+        {
+            "role": "user",
+            "content": message,
+        }
+    ]
+
+    if system_instructions:
+        messages = [
+            {
+                "role": "assistant",
+                "content": system_instructions,
+            },
+            *messages,
+        ]
+
+    return {
+        "model": _get_ollama_model(),
+        "messages": messages,
+        "tools": (
+            helpers_tools.functions_to_schemas(available_tools, "ollama")
+            if available_tools
+            else None
+        ),
+    }
+
+
+def _get_ollama_model() -> str:
+    if (model := os.getenv("AI_MODEL", None)) is None:
+        raise Exception("AI_MODEL environment variable is not set.")
+
+    return model
+
+
+def get_token_usage(
+    response: typing.Any,
+) -> typing.Dict[str, typing.Optional[int]]:
+    """
+    Returns the input and output token counts reported with a model response,
+    and the input tokens read from the provider's prompt cache.
+    Counts the backend did not report are None.
+    """
+    cached_input_tokens = None
+
+    if (usage := getattr(response, "usage_metadata", None)) is not None:
+        input_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        cached_input_tokens = getattr(usage, "cached_content_token_count", None)
+
+    elif (usage := getattr(response, "usage", None)) is not None:
+        input_tokens = getattr(usage, "input_tokens", None)
+        output_tokens = getattr(usage, "output_tokens", None)
+        cached_input_tokens = getattr(usage, "cache_read_input_tokens", None)
+
+    else:
+        input_tokens = getattr(response, "prompt_eval_count", None)
+        output_tokens = getattr(response, "eval_count", None)
+
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_input_tokens": cached_input_tokens,
+    }
+
+
+def _record_usage(
+    backend: str, model: str, response: typing.Any, start_ns: int
+) -> None:
+    """Records the request duration and token counts in metrics and the trace span"""
+    usage = get_token_usage(response)
+
+    metrics.LLM_DURATION.observe(
+        (time.perf_counter_ns() - start_ns) / 1e9, backend=backend
+    )
+    for direction in ("input", "output", "cached_input"):
+        if (tokens := usage[f"{direction}_tokens"]) is not None:
+            metrics.LLM_TOKENS.inc(tokens, backend=backend, direction=direction)
+
+    tracing.get_current_span().set_attributes(backend=backend, model=model, **usage)
+
+
+def _record_first_token(backend: str, start_ns: int) -> None:
+    """Records the time from a streaming request to its first text"""
+    first_token_ns = time.perf_counter_ns() - start_ns
+
+    metrics.LLM_FIRST_TOKEN.observe(first_token_ns / 1e9, backend=backend)
+    tracing.get_current_span().set_attribute("first_token_ms", first_token_ns / 1e6)
+    logger.log_timing("stream_message.first_token", first_token_ns)
+
+
+def _get_gemini_tool(
+    available_tools: typing.List[typing.Callable],
+) -> "genai_types.Tool":
+    """Returns a cached Gemini tool object declaring all given jobs."""
+    from google.genai import types as genai_types
+
+    key = tuple(available_tools)
+    if (tool := _gemini_tools_cache.get(key)) is None:
+        tool = genai_types.Tool(
+            function_declarations=[
+                genai_types.FunctionDeclaration(**schema)
+                for schema in helpers_tools.functions_to_schemas(key, "gemini")
+            ]
+        )
+        _gemini_tools_cache[key] = tool
+
+    return tool
+
 
 def get_text_from_response(
     response: typing.Union[
-        genai_types.GenerateContentResponse,
-        anthropic.types.Message,
-        ollama.ChatResponse,
+        "genai_types.GenerateContentResponse",
+        "anthropic.types.Message",
+        "ollama.ChatResponse",
     ],
 ) -> typing.Optional[str]:
-    if isinstance(response, genai_types.GenerateContentResponse):
+    if _is_sdk_instance(response, "google.genai.types", "GenerateContentResponse"):
         return response.text
 
-    elif isinstance(response, anthropic.types.Message):
+    elif _is_sdk_instance(response, "anthropic", "types.Message"):
         if response.content:
             return response.content[0].text  # type: ignore
 
-    elif isinstance(response, ollama.ChatResponse):
+    elif _is_sdk_instance(response, "ollama", "ChatResponse"):
         return response.message.content
 
 
 def get_function_from_response(
     response: typing.Union[
-        genai_types.GenerateContentResponse,
-        anthropic.types.Message,
-        ollama.ChatResponse,
+        "genai_types.GenerateContentResponse",
+        "anthropic.types.Message",
+        "ollama.ChatResponse",
     ],
 ) -> typing.Optional[typing.Dict[str, typing.Any]]:
-    if isinstance(response, genai_types.GenerateContentResponse):
+    if _is_sdk_instance(response, "google.genai.types", "GenerateContentResponse"):
         if (
             function_call := response.candidates[0].content.parts[0].function_call  # type: ignore
         ) is None:
@@ -200,7 +794,7 @@ def get_function_from_response(
             "args": function_args,
         }
 
-    elif isinstance(response, anthropic.types.Message):
+    elif _is_sdk_instance(response, "anthropic", "types.Message"):
         tool_uses = response.content
 
         for block in tool_uses:
@@ -213,7 +807,7 @@ def get_function_from_response(
                     "args": function_args,
                 }
 
-    elif isinstance(response, ollama.ChatResponse):
+    elif _is_sdk_instance(response, "ollama", "ChatResponse"):
         if response.message.tool_calls is None:
             return
 
@@ -0,0 +1,414 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import math
+import os
+import threading
+import time
+import typing
+
+import helpers.model as helpers_model
+from helpers import metrics, tracing
+from helpers.analyze_logs import percentile
+from helpers.logger import logger
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+
+T = typing.TypeVar("T")
+
+# Seconds all model requests of a command may take together
+COMMAND_BUDGET = float(os.getenv("AI_ASSISTANT_COMMAND_BUDGET", "30"))
+
+# Seconds before a request is hedged while its backend has too few samples for a p95
+HEDGE_DELAY = float(os.getenv("AI_ASSISTANT_HEDGE_DELAY", "2"))
+
+# Backends whose requests in `helpers.model` can carry an image
+IMAGE_BACKENDS = ("gemini", "sonnet")
+
+_deadline: contextvars.ContextVar[typing.Optional[float]] = contextvars.ContextVar(
+    "ai_assistant_llm_deadline", default=None
+)
+
+_END = object()
+
+
+@contextlib.contextmanager
+def command_budget(seconds: float = COMMAND_BUDGET):
+    """
+    Limits the time all model requests started in the block may take together.
+    A nested budget never extends the budget of the enclosing block.
+    """
+    deadline = time.monotonic() + seconds
+    if (outer_deadline := _deadline.get()) is not None:
+        deadline = min(deadline, outer_deadline)
+
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def detach_budget():
+    """Runs the block without a budget, for background work outliving its command"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_budget() -> typing.Optional[float]:
+    """Seconds left in the current command budget, None outside of any budget"""
+    if (deadline := _deadline.get()) is None:
+        return None
+
+    return max(deadline - time.monotonic(), 0.0)
+
+
+class BackendStats:
+    """
+    Rolling window of the latest request outcomes of one backend.
+
+    Outcomes older than `window` seconds are dropped, so a backend that was
+    failing is preferred again after a quiet period.
+
+    Args:
+        size: Number of outcomes kept
+        window: Seconds an outcome is kept
+        min_samples: Successful requests needed before the p95 is used
+    """
+
+    def __init__(
+        self, size: int = 100, window: float = 300.0, min_samples: int = 5
+    ) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        # (time of the outcome, duration in seconds or None for an error)
+        self._outcomes: typing.Deque[typing.Tuple[float, typing.Optional[float]]] = (
+            collections.deque(maxlen=size)
+        )
+        self._lock = threading.Lock()
+
+    def record_success(self, duration: float) -> None:
+        with self._lock:
+            self._outcomes.append((time.monotonic(), duration))
+
+    def record_censored(self, elapsed: float) -> None:
+        """
+        Records a request cancelled before it finished, as a lower bound of its
+        latency. Leaving slow requests out would let the p95 drift downward.
+        """
+        self.record_success(elapsed)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self._outcomes.append((time.monotonic(), None))
+
+    def _get_outcomes(self) -> typing.List[typing.Optional[float]]:
+        with self._lock:
+            cutoff = time.monotonic() - self.window
+            while self._outcomes and self._outcomes[0][0] < cutoff:
+                self._outcomes.popleft()
+
+            return [duration for _, duration in self._outcomes]
+
+    def get_p95(self) -> typing.Optional[float]:
+        """95th percentile latency of the successful requests, None with too few"""
+        latencies = [
+            duration for duration in self._get_outcomes() if duration is not None
+        ]
+        if len(latencies) < self.min_samples:
+            return None
+
+        return percentile(latencies, 95)
+
+    def get_error_rate(self) -> float:
+        """Share of the requests in the window that failed, 0 without requests"""
+        outcomes = self._get_outcomes()
+        if not outcomes:
+            return 0.0
+
+        return sum(duration is None for duration in outcomes) / len(outcomes)
+
+    def is_healthy(self) -> bool:
+        return self.get_error_rate() < 0.5
+
+
+_stats: typing.Dict[typing.Tuple[str, str], BackendStats] = {}
+_stats_lock = threading.Lock()
+
+
+def get_backend_stats(backend: str, kind: str) -> BackendStats:
+    """
+    Returns the stats of a backend for one kind of request, "send" or
+    "stream"; the latency of streams is the time to their first text.
+    """
+    if (stats := _stats.get((backend, kind))) is None:
+        with _stats_lock:
+            stats = _stats.setdefault((backend, kind), BackendStats())
+
+    return stats
+
+
+def get_all_backend_stats() -> typing.Dict[typing.Tuple[str, str], BackendStats]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+class _StreamPump:
+    """
+    Reads a model stream in its own task, so the stream stays in the task that
+    opened it while the router races several streams for the first text.
+    """
+
+    def __init__(self, deltas: typing.AsyncIterator[str]) -> None:
+        self.items: "asyncio.Queue[typing.Any]" = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._run(deltas))
+
+    async def _run(self, deltas: typing.AsyncIterator[str]) -> None:
+        try:
+            async for text in deltas:
+                self.items.put_nowait(text)
+        except Exception as e:
+            self.items.put_nowait(e)
+        else:
+            self.items.put_nowait(_END)
+
+    async def get(self) -> typing.Any:
+        """Returns the next text or `_END`, raising the error that ended the stream"""
+        item = await self.items.get()
+        if isinstance(item, Exception):
+            raise item
+
+        return item
+
+
+def _retrieve_exception(task: "asyncio.Future[typing.Any]") -> None:
+    # Cancelled losers may have failed first, which is expected
+    if not task.cancelled():
+        task.exception()
+
+
+class ModelRouter:
+    """
+    Sends model requests to the healthiest of several backends.
+
+    Backends are tried in the order of `get_models`, except that backends
+    failing half of their recent requests go last. When the first backend has
+    not answered within its p95 latency, the request is hedged: the next
+    backend gets the same request and the first response wins, while the
+    slower request is cancelled. A failed request fails over to the next
+    backend right away. All requests stop when the command budget runs out.
+
+    Args:
+        clients: Async clients by backend name, in the order they are preferred
+        hedge_delay: Seconds before hedging while a backend has no p95 yet
+    """
+
+    def __init__(
+        self,
+        clients: typing.Dict[str, helpers_model.AsyncClient],
+        hedge_delay: float = HEDGE_DELAY,
+    ) -> None:
+        if not clients:
+            raise ValueError("At least one client is required")
+
+        self.clients = dict(clients)
+        self.hedge_delay = hedge_delay
+
+    @classmethod
+    def from_environment(cls) -> "ModelRouter":
+        """Creates a router with clients of every configured backend"""
+        models = helpers_model.get_models()
+        if not models:
+            raise Exception(
+                "You need to set either the GEMINI_API_KEY or ANTHROPIC_API_KEY environment variable."
+            )
+
+        return cls(
+            {
+                backend: helpers_model.create_async_client(backend, api_key)
+                for backend, api_key in models
+            }
+        )
+
+    @property
+    def backends(self) -> typing.List[str]:
+        return list(self.clients)
+
+    def rank_backends(self, kind: str, image: bool = False) -> typing.List[str]:
+        """Backends able to serve the request, healthy ones first"""
+        backends = [
+            backend
+            for backend in self.clients
+            if not image or backend in IMAGE_BACKENDS
+        ]
+
+        return sorted(
+            backends,
+            key=lambda backend: not get_backend_stats(backend, kind).is_healthy(),
+        )
+
+    def get_hedge_delay(self, backend: str, kind: str) -> float:
+        """Seconds to wait for the backend before hedging the request"""
+        p95 = get_backend_stats(backend, kind).get_p95()
+        return self.hedge_delay if p95 is None else p95
+
+    async def send_message(
+        self,
+        message: str,
+        system_instructions: typing.Optional[str] = None,
+        available_tools: typing.Optional[typing.List[typing.Callable]] = None,
+        image: typing.Optional["np.ndarray"] = None,
+    ) -> helpers_model.Response:
+        """
+        Routes `send_message_async` to the backends.
+
+        Raises:
+            TimeoutError: When the command budget ran out
+            Exception: When every backend failed
+        """
+
+        def request(backend: str) -> typing.Awaitable[helpers_model.Response]:
+            return helpers_model.send_message_async(
+                self.clients[backend],
+                message,
+                system_instructions,
+                available_tools,
+                image,
+            )
+
+        with tracing.start_span("model_router", kind="send"):
+            return await self._race(
+                "send", request, self.rank_backends("send", image is not None)
+            )
+
+    async def stream_message(
+        self,
+        message: str,
+        system_instructions: typing.Optional[str] = None,
+    ) -> typing.AsyncIterator[str]:
+        """
+        Routes `stream_message_async` to the backends. Streams race for their
+        first text, after which the winning stream is read to its end and the
+        command budget no longer applies.
+
+        Raises:
+            TimeoutError: When the command budget ran out before the first text
+            Exception: When every backend failed before its first text
+        """
+
+        async def request(backend: str) -> typing.Tuple[_StreamPump, typing.Any]:
+            pump = _StreamPump(
+                helpers_model.stream_message_async(
+                    self.clients[backend], message, system_instructions
+                )
+            )
+            try:
+                return pump, await pump.get()
+            except BaseException:
+                pump.task.cancel()
+                raise
+
+        with tracing.start_span("model_router", kind="stream"):
+            pump, text = await self._race(
+                "stream", request, self.rank_backends("stream")
+            )
+
+        try:
+            while text is not _END:
+                yield text
+                text = await pump.get()
+        finally:
+            pump.task.cancel()
+
+    async def _race(
+        self,
+        kind: str,
+        request: typing.Callable[[str], typing.Awaitable[T]],
+        backends: typing.List[str],
+    ) -> T:
+        """Runs the request on the backends in turn, hedging and failing over"""
+        if not backends:
+            raise Exception("No configured backend can handle this request.")
+
+        remaining = get_remaining_budget()
+        deadline = math.inf if remaining is None else time.monotonic() + remaining
+        waiting = list(backends)
+        pending: typing.Dict["asyncio.Future[T]", typing.Tuple[str, float]] = {}
+        errors: typing.List[str] = []
+        span = tracing.get_current_span()
+
+        def start_next() -> float:
+            """Starts the next backend and returns when to hedge it"""
+            backend = waiting.pop(0)
+            started_at = time.monotonic()
+            task = asyncio.ensure_future(request(backend))
+            task.add_done_callback(_retrieve_exception)
+            pending[task] = (backend, started_at)
+
+            return started_at + self.get_hedge_delay(backend, kind)
+
+        if remaining == 0:
+            raise TimeoutError("The command latency budget is exhausted")
+
+        hedge_at = start_next()
+        try:
+            while pending:
+                now = time.monotonic()
+                wake_at = min(hedge_at, deadline) if waiting else deadline
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=None if wake_at == math.inf else max(wake_at - now, 0),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                for task in done:
+                    backend, started_at = pending.pop(task)
+                    stats = get_backend_stats(backend, kind)
+
+                    if (error := task.exception()) is None:
+                        stats.record_success(time.monotonic() - started_at)
+                        metrics.LLM_ROUTED.inc(
+                            backend=backend, kind=kind, outcome="success"
+                        )
+                        span.set_attributes(backend=backend, attempts=len(errors) + 1)
+                        return task.result()
+
+                    stats.record_error()
+                    metrics.LLM_ROUTED.inc(backend=backend, kind=kind, outcome="error")
+                    errors.append(f"{backend}: {error}")
+                    logger.log_error(
+                        f"Model backend {backend} failed: {error}", "model_router"
+                    )
+
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("The command latency budget is exhausted")
+
+                if done and not pending and waiting:
+                    # Fail over to the next backend
+                    hedge_at = start_next()
+
+                elif not done and waiting and time.monotonic() >= hedge_at:
+                    metrics.LLM_HEDGES.inc(backend=waiting[0], kind=kind)
+                    span.set_attribute("hedged", True)
+                    hedge_at = start_next()
+
+            raise Exception(f"All model backends failed: {'; '.join(errors)}")
+
+        finally:
+            # Losing or abandoned requests are cancelled. Those already slower than
+            # their hedge delay count with their elapsed time as a lower bound, while
+            # hedges cancelled early say nothing about their backend's latency
+            now = time.monotonic()
+            for task, (backend, started_at) in pending.items():
+                task.cancel()
+                metrics.LLM_ROUTED.inc(backend=backend, kind=kind, outcome="cancelled")
+
+                elapsed = now - started_at
+                if elapsed >= self.get_hedge_delay(backend, kind):
+                    get_backend_stats(backend, kind).record_censored(elapsed)
@@ -0,0 +1,342 @@
+import collections
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+import typing
+
+profiling_modes = ["sampling", "cprofile"]
+
+FrameKey = typing.Tuple[str, int, str]
+
+
+def _frame_key(frame) -> FrameKey:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _format_frame_key(key: FrameKey) -> str:
+    filename, line, name = key
+    return f"{filename}:{line}({name})"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stacks of all threads on a daemon thread.
+
+    Every `interval` seconds the current frame of each thread is read from
+    `sys._current_frames`, so profiled code runs unmodified and the overhead
+    does not depend on how many calls it makes.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: typing.Counter[FrameKey] = collections.Counter()
+        self.total_counts: typing.Counter[FrameKey] = collections.Counter()
+        self.stacks: typing.Counter[typing.Tuple[str, ...]] = collections.Counter()
+        self.started_at: typing.Optional[float] = None
+        self.stopped_at: typing.Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.stopped_at = time.monotonic()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        thread_names = {}
+
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+
+                if thread_id not in thread_names:
+                    thread_names = {
+                        thread.ident: thread.name for thread in threading.enumerate()
+                    }
+
+                stack = []
+                seen = set()
+                while frame is not None:
+                    key = _frame_key(frame)
+                    stack.append(key)
+                    # Recursive functions count once towards the total
+                    if key not in seen:
+                        seen.add(key)
+                        self.total_counts[key] += 1
+                    frame = frame.f_back
+
+                if not stack:
+                    continue
+
+                self.self_counts[stack[0]] += 1
+                self.stacks[
+                    (
+                        thread_names.get(thread_id, str(thread_id)),
+                        *(f"{key[2]} ({key[0]}:{key[1]})" for key in reversed(stack)),
+                    )
+                ] += 1
+
+            self.samples += 1
+
+    def report(self, limit: int = 30) -> str:
+        """Functions with the most samples, sorted by samples in the function itself"""
+        duration = (self.stopped_at or time.monotonic()) - (self.started_at or 0)
+        lines = [
+            f"{self.samples} samples of all threads every {self.interval * 1000:.1f} ms "
+            f"over {duration:.1f} s",
+            "",
+            f"{'self':>8} {'self%':>7} {'total':>8} {'total%':>7}  function",
+        ]
+
+        thread_samples = sum(self.self_counts.values()) or 1
+        for key, count in self.self_counts.most_common(limit):
+            total = self.total_counts[key]
+            lines.append(
+                f"{count:>8} {count / thread_samples:>7.1%} {total:>8} "
+                f"{total / thread_samples:>7.1%}  {_format_frame_key(key)}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def collapsed_stacks(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.items()
+        )
+
+
+class CommandProfiler:
+    """
+    Deterministic profiler running `cProfile` around every command.
+
+    cProfile only sees the thread that enabled it, so each command handled while
+    the session is active gets its own profiler and the results are merged.
+    """
+
+    def __init__(self) -> None:
+        self.commands = 0
+        self.started_at = time.monotonic()
+        self._stats: typing.Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def profile(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread, e.g. a nested command
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profiler)
+                else:
+                    self._stats.add(profiler)
+                self.commands += 1
+
+    def stop(self) -> None:
+        """Commands still running finish their profile and are not merged"""
+
+    def report(self, limit: int = 30, sort: str = "cumulative") -> str:
+        with self._lock:
+            if self._stats is None:
+                return "No commands were handled during the profiling session.\n"
+
+            output = io.StringIO()
+            self._stats.stream = output  # type: ignore
+            output.write(f"{self.commands} commands profiled\n")
+            self._stats.sort_stats(sort).print_stats(limit)
+
+            return output.getvalue()
+
+
+class Profiling:
+    """Profiling session and memory snapshots of the running process"""
+
+    _session: typing.Optional[typing.Union[SamplingProfiler, CommandProfiler]] = None
+    _session_lock = threading.Lock()
+    _snapshots: typing.List[tracemalloc.Snapshot] = []
+
+    @staticmethod
+    def start_session(mode: str = "sampling", interval: float = 0.005) -> None:
+        """
+        Starts a profiling session
+
+        Args:
+            mode: "sampling" to sample all threads or "cprofile" to profile
+                  every command deterministically
+            interval: Seconds between samples in sampling mode
+
+        Raises:
+            ValueError: When the mode is unknown
+            RuntimeError: When a session is already running
+        """
+        if mode not in profiling_modes:
+            raise ValueError(f"Mode must be one of: {', '.join(profiling_modes)}")
+
+        with Profiling._session_lock:
+            if Profiling._session is not None:
+                raise RuntimeError("A profiling session is already running")
+
+            if mode == "sampling":
+                session = SamplingProfiler(interval)
+                session.start()
+            else:
+                session = CommandProfiler()
+
+            Profiling._session = session
+
+    @staticmethod
+    def stop_session(limit: int = 30, collapsed: bool = False) -> typing.Optional[str]:
+        """
+        Stops the profiling session
+
+        Args:
+            limit: Number of functions in the report
+            collapsed: Return collapsed stacks instead of a report (sampling only)
+
+        Returns:
+            The profiling report, or None when no session was running
+        """
+        with Profiling._session_lock:
+            session, Profiling._session = Profiling._session, None
+
+        if session is None:
+            return None
+
+        session.stop()
+        if collapsed and isinstance(session, SamplingProfiler):
+            return session.collapsed_stacks()
+
+        return session.report(limit)
+
+    @staticmethod
+    def get_session_mode() -> typing.Optional[str]:
+        session = Profiling._session
+        if session is None:
+            return None
+
+        return "sampling" if isinstance(session, SamplingProfiler) else "cprofile"
+
+    @staticmethod
+    @contextlib.contextmanager
+    def profile_command():
+        """Profiles the block with cProfile when a cprofile session is running"""
+        session = Profiling._session
+        if not isinstance(session, CommandProfiler):
+            yield
+            return
+
+        with session.profile():
+            yield
+
+    @staticmethod
+    def take_memory_snapshot(limit: int = 20) -> typing.Dict[str, typing.Any]:
+        """
+        Takes a tracemalloc snapshot, starting tracemalloc on the first call.
+        Only allocations made after tracemalloc was started are traced.
+
+        Returns:
+            Snapshot id, traced memory and the lines allocating the most memory
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.getenv("AI_ASSISTANT_TRACEMALLOC_FRAMES", "1")))
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        Profiling._snapshots.append(snapshot)
+        current, peak = tracemalloc.get_traced_memory()
+
+        return {
+            "id": len(Profiling._snapshots) - 1,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {
+                    "location": str(stat.traceback),
+                    "size": stat.size,
+                    "count": stat.count,
+                }
+                for stat in snapshot.statistics("lineno")[:limit]
+            ],
+        }
+
+    @staticmethod
+    def diff_memory_snapshots(
+        base: int = 0, target: typing.Optional[int] = None, limit: int = 20
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Compares two snapshots by the lines allocating memory
+
+        Args:
+            base: Id of the earlier snapshot
+            target: Id of the later snapshot, the latest by default
+
+        Raises:
+            IndexError: When a snapshot id does not exist
+        """
+        snapshots = Profiling._snapshots
+        if target is None:
+            target = len(snapshots) - 1
+        if not (0 <= base < len(snapshots) and 0 <= target < len(snapshots)):
+            raise IndexError("Snapshot not found")
+
+        return [
+            {
+                "location": str(stat.traceback),
+                "size_diff": stat.size_diff,
+                "size": stat.size,
+                "count_diff": stat.count_diff,
+            }
+            for stat in snapshots[target].compare_to(snapshots[base], "lineno")[:limit]
+        ]
+
+    @staticmethod
+    def stop_memory_tracing() -> None:
+        """Stops tracemalloc and drops all snapshots"""
+        tracemalloc.stop()
+        Profiling._snapshots.clear()
+
+
+def dump_thread_stacks() -> str:
+    """Returns the current stack of every thread, like faulthandler but with names"""
+    threads = {thread.ident: thread for thread in threading.enumerate()}
+
+    sections = []
+    for thread_id, frame in sys._current_frames().items():
+        thread = threads.get(thread_id)
+        name = thread.name if thread is not None else "unknown"
+        daemon = " daemon" if thread is not None and thread.daemon else ""
+        sections.append(
+            f'Thread "{name}" ({thread_id}{daemon}):\n'
+            + "".join(traceback.format_stack(frame))
+        )
+
+    return "\n".join(sections)
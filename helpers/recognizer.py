@@ -9,6 +9,7 @@ class Recognizer:
     _recognizer = sr.Recognizer()
 
     @decorators.exit_on_exception
+    @decorators.timed("recognize_speech_from_mic")
     @staticmethod
     def recognize_speech_from_mic() -> RecognizeResponse | str:
         audio = Audio.record_audio()
@@ -1,4 +1,7 @@
+import functools
+import inspect
 import os
+import threading
 import typing
 
 import dotenv
@@ -7,22 +10,215 @@ dotenv.load_dotenv()
 T = typing.TypeVar("T")
 
 
+class ServiceProxy:
+    """
+    Holds a registered service class and constructs its instance on first use.
+
+    Construction is single-flight: concurrent callers wait for the first one
+    to finish instead of creating several instances.
+    """
+
+    def __init__(self, service_class: type) -> None:
+        self.service_class = service_class
+        self.instance: typing.Any = None
+        self.error: typing.Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_initialized(self) -> bool:
+        return self.instance is not None
+
+    def get_instance(
+        self, give_up: typing.Optional[typing.Callable[[], bool]] = None
+    ) -> typing.Any:
+        """
+        Get the service instance, constructing it if needed.
+
+        Args:
+            give_up: Checked while another thread is constructing the service;
+                     returning True stops waiting for it
+
+        Raises:
+            RuntimeError: If the service failed to initialize.
+            TimeoutError: If waiting for another thread's construction was given up.
+        """
+        if self.instance is not None:
+            return self.instance
+
+        while not self._lock.acquire(timeout=0.1):
+            if give_up is not None and give_up():
+                raise TimeoutError(
+                    f"{self.service_class.__name__} is still initializing"
+                )
+
+        try:
+            if self.instance is None and self.error is None:
+                try:
+                    self.instance = self.service_class()
+                except Exception as e:
+                    self.error = e
+        finally:
+            self._lock.release()
+
+        if self.error is not None:
+            raise RuntimeError(
+                f"{self.service_class.__name__} failed to initialize: {self.error}"
+            )
+
+        return self.instance
+
+
 class ServiceRegistry:
     """Simplified registry for managing jobs and services."""
 
     _jobs: typing.Dict[str, typing.Callable] = {}
     _services: typing.Dict[str, typing.Any] = {}
     _service_instances: typing.Dict[str, typing.Any] = {}
+    _service_proxies: typing.Dict[str, ServiceProxy] = {}
+    _service_jobs: typing.Dict[str, typing.List[str]] = {}
+    _degraded_services: typing.Dict[str, str] = {}
+    _initializers: typing.Dict[str, typing.Callable[[], typing.Any]] = {}
+    _version: int = 0
+    _subscribers: typing.List[typing.Callable[[int], None]] = []
+    _lock = threading.RLock()
 
     @classmethod
     def get_all_jobs(cls) -> typing.Dict[str, typing.Callable]:
         """Get all registered jobs."""
-        return cls._jobs.copy()
+        with cls._lock:
+            return cls._jobs.copy()
+
+    @classmethod
+    def get_service_names(cls) -> typing.List[str]:
+        """Get names of all registered services in registration order."""
+        with cls._lock:
+            return list(cls._service_proxies)
+
+    @classmethod
+    def get_degraded_services(cls) -> typing.Dict[str, str]:
+        """Get services that failed or timed out during startup, with the reason."""
+        with cls._lock:
+            return cls._degraded_services.copy()
+
+    @classmethod
+    def mark_degraded(cls, service_name: str, reason: str) -> None:
+        """Mark a service as degraded, e.g. when its startup timed out."""
+        with cls._lock:
+            cls._degraded_services[service_name] = reason
+
+    @classmethod
+    def get_startup_timeout(cls, service_name: str) -> typing.Optional[float]:
+        """Get the per-service startup timeout declared with `STARTUP_TIMEOUT`."""
+        service_class = cls._services.get(service_name)
+        return getattr(service_class, "STARTUP_TIMEOUT", None)
+
+    @classmethod
+    def register_initializer(
+        cls, name: str, initializer: typing.Callable[[], typing.Any]
+    ) -> None:
+        """
+        Register a non-service resource (e.g. an OCR model) to warm up during startup.
+
+        Args:
+            name: Name shown in the startup timeline
+            initializer: Function loading the resource, safe to call more than once
+        """
+        with cls._lock:
+            cls._initializers[name] = initializer
+
+    @classmethod
+    def get_initializers(cls) -> typing.Dict[str, typing.Callable[[], typing.Any]]:
+        """Get all registered startup initializers."""
+        with cls._lock:
+            return cls._initializers.copy()
+
+    @classmethod
+    def get_version(cls) -> int:
+        """Get the registry version, incremented every time the set of jobs changes."""
+        return cls._version
+
+    @classmethod
+    def subscribe(cls, callback: typing.Callable[[int], None]) -> None:
+        """
+        Register a callback called with the new version whenever the registry changes.
+
+        Args:
+            callback: Function accepting the new registry version
+        """
+        with cls._lock:
+            if callback not in cls._subscribers:
+                cls._subscribers.append(callback)
+
+    @classmethod
+    def unsubscribe(cls, callback: typing.Callable[[int], None]) -> None:
+        """Remove a previously registered change callback."""
+        with cls._lock:
+            if callback in cls._subscribers:
+                cls._subscribers.remove(callback)
+
+    @classmethod
+    def _notify_change(cls) -> None:
+        """Bump the registry version and notify all subscribers."""
+        with cls._lock:
+            cls._version += 1
+            version = cls._version
+            subscribers = list(cls._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(version)
+            except Exception as e:
+                print(f"Registry subscriber {callback} failed: {e}")
 
     @classmethod
     def get_service_instance(cls, service_name: str) -> typing.Any:
-        """Get instance of a registered service."""
-        return cls._service_instances.get(service_name)
+        """
+        Get instance of a registered service, constructing it on first use.
+
+        Returns None if the service is not registered or failed to initialize.
+        """
+        if (instance := cls._service_instances.get(service_name)) is not None:
+            return instance
+
+        if (proxy := cls._service_proxies.get(service_name)) is None:
+            return None
+
+        try:
+            # A constructor that timed out during startup may still hold the
+            # proxy, commands fail fast instead of waiting for it
+            instance = proxy.get_instance(
+                give_up=lambda: service_name in cls._degraded_services
+            )
+        except TimeoutError as e:
+            print(e)
+            return None
+        except RuntimeError as e:
+            print(e)
+            cls.mark_degraded(service_name, str(e))
+            cls._unregister_service(service_name)
+            return None
+
+        with cls._lock:
+            cls._degraded_services.pop(service_name, None)
+
+        cls._service_instances[service_name] = instance
+        return instance
+
+    @classmethod
+    def set_service_instance(cls, service_name: str, instance: typing.Any) -> None:
+        """
+        Use the given instance for a registered service instead of constructing it,
+        e.g. a service backed by a fake client in benchmarks.
+
+        Raises:
+            KeyError: If the service is not registered.
+        """
+        with cls._lock:
+            if service_name not in cls._services:
+                raise KeyError(f"Service '{service_name}' is not registered")
+
+            cls._degraded_services.pop(service_name, None)
+            cls._service_instances[service_name] = instance
 
     @classmethod
     def register_job(
@@ -51,7 +247,10 @@ class ServiceRegistry:
             if not func.__doc__:
                 raise ValueError(f"Job '{job_name}' must have documentation")
 
-            cls._jobs[job_name] = func
+            with cls._lock:
+                cls._jobs[job_name] = func
+
+            cls._notify_change()
             return func
 
         if callable(name_or_func):
@@ -85,28 +284,69 @@ class ServiceRegistry:
                 print("=" * 60 + "\n")
                 return service_class
 
-        # Store service class
-        cls._services[service_name] = service_class
+        # Store service class; the instance is created on first use
+        proxy = ServiceProxy(service_class)
 
-        # Create instance and register methods
-        try:
-            instance = service_class()
-            cls._service_instances[service_name] = instance
+        # Register all methods marked with @method_job
+        with cls._lock:
+            cls._services[service_name] = service_class
+            cls._service_proxies[service_name] = proxy
+            cls._service_jobs[service_name] = []
 
-            # Register all methods marked with @method_job
-            for attr_name in dir(instance):
-                attr = getattr(instance, attr_name)
+            for attr_name in dir(service_class):
+                attr = getattr(service_class, attr_name)
                 if hasattr(attr, "_is_job_method"):
                     job_name = getattr(attr, "_job_name", attr_name)
-                    cls._jobs[job_name] = attr
+                    cls._jobs[job_name] = cls._create_lazy_job(
+                        service_name, attr_name, attr
+                    )
+                    cls._service_jobs[service_name].append(job_name)
+
+        cls._notify_change()
+
+        return service_class
+
+    @classmethod
+    def _create_lazy_job(
+        cls, service_name: str, attr_name: str, method: typing.Callable
+    ) -> typing.Callable:
+        """
+        Create a job that resolves the service instance only when called.
+
+        The job keeps the method's name, docstring and signature (without `self`),
+        so schemas and routing work before the service is constructed.
+        """
+
+        @functools.wraps(method)
+        def lazy_job(*args, **kwargs):
+            instance = cls.get_service_instance(service_name)
+            if instance is None:
+                raise RuntimeError(f"Service '{service_name}' is not available")
+
+            return getattr(instance, attr_name)(*args, **kwargs)
+
+        signature = inspect.signature(method)
+        lazy_job.__signature__ = signature.replace(  # type: ignore
+            parameters=list(signature.parameters.values())[1:]
+        )
+
+        return lazy_job
+
+    @classmethod
+    def _unregister_service(cls, service_name: str) -> None:
+        """Remove a service that failed to initialize along with its jobs."""
+        with cls._lock:
+            if service_name not in cls._services:
+                return
+
+            for job_name in cls._service_jobs.pop(service_name, []):
+                cls._jobs.pop(job_name, None)
 
-        except Exception as e:
-            print(f"Failed to initialize {service_class.__name__}: {e}")
-            # Clean up partial registration
             cls._services.pop(service_name, None)
+            cls._service_proxies.pop(service_name, None)
             cls._service_instances.pop(service_name, None)
 
-        return service_class
+        cls._notify_change()
 
     @classmethod
     def method_job(
@@ -0,0 +1,289 @@
+import inspect
+import math
+import re
+import typing
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it its me my of or please the this "
+    "that to with you your".split()
+)
+
+# Numbers are arguments the local router cannot pass on to a job
+_NUMBER_PATTERN = re.compile(r"\d")
+
+# Negated commands ("don't turn off the light") are left to the LLM
+_NEGATION_PATTERN = re.compile(
+    r"\b(?:no|not|never|nothing|without|cannot|dont|doesnt|didnt|wont|cant|isnt)\b"
+    r"|n['’]t\b"
+)
+
+
+def tokenize(text: str) -> typing.List[str]:
+    """Splits text into lowercase unigram and bigram terms, skipping stop words."""
+    words = [
+        word for word in _TOKEN_PATTERN.findall(text.lower()) if word not in _STOP_WORDS
+    ]
+    bigrams = [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+    return words + bigrams
+
+
+def get_job_description(func: typing.Callable) -> str:
+    """Returns the first paragraph of a job's docstring."""
+    docstring = inspect.getdoc(func) or ""
+
+    description_match = re.match(
+        r"\s*(.*?)(?:\n\n|\n\s*Args:|\n\s*Parameters:|\Z)", docstring, re.DOTALL
+    )
+    return description_match.group(1).strip() if description_match else ""
+
+
+def get_job_keywords(func: typing.Callable) -> typing.List[str]:
+    """Returns the comma-separated phrases from a job's `Keywords:` section."""
+    docstring = inspect.getdoc(func) or ""
+
+    keywords_match = re.search(
+        r"Keywords:(.*?)(?:\n\s*\n|\n\s*Args:|\n\s*Returns:|\Z)", docstring, re.DOTALL
+    )
+    if not keywords_match:
+        return []
+
+    return [
+        keyword.strip()
+        for keyword in keywords_match.group(1).split(",")
+        if keyword.strip()
+    ]
+
+
+def is_negated(text: str) -> bool:
+    """Checks whether the text contains a negation."""
+    return _NEGATION_PATTERN.search(text.lower()) is not None
+
+
+def accepts_no_arguments(func: typing.Callable) -> bool:
+    """Checks whether a job can be called without any arguments."""
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return False
+
+    return all(
+        param.default != inspect.Parameter.empty
+        or param.kind
+        in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+        for param in signature.parameters.values()
+    )
+
+
+class IntentRouter:
+    """
+    Local TF-IDF index over job docstrings used to route commands without the LLM.
+
+    Each job is indexed by its name, the phrases from its `Keywords:` section and its
+    description. Keyword phrases are weighted higher than the description because
+    they are written specifically for matching user commands.
+    """
+
+    KEYWORD_WEIGHT = 3.0
+    NAME_WEIGHT = 2.0
+    DESCRIPTION_WEIGHT = 1.0
+
+    def __init__(
+        self,
+        jobs: typing.Dict[str, typing.Callable],
+        min_score: float = 0.3,
+        min_margin: float = 0.15,
+        excluded_jobs: typing.Iterable[str] = (),
+    ) -> None:
+        """
+        Args:
+            jobs: Mapping of job names to callables to index
+            min_score: Minimal cosine similarity required to dispatch locally
+            min_margin: Minimal difference between the best and the second best score
+            excluded_jobs: Names of jobs that are never dispatched locally, e.g.
+                           destructive ones that should only run when the model
+                           picks them
+        """
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.excluded_jobs = frozenset(excluded_jobs)
+
+        self._job_names: typing.List[str] = []
+        self._routable: typing.List[bool] = []
+        self._needs_arguments = np.zeros(0, dtype=bool)
+        self._vocabulary: typing.Dict[str, int] = {}
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+        self._build_index(jobs)
+
+    def _build_index(self, jobs: typing.Dict[str, typing.Callable]) -> None:
+        documents: typing.List[typing.Dict[str, float]] = []
+        needs_arguments: typing.List[bool] = []
+
+        for job_name, func in jobs.items():
+            weighted_terms: typing.Dict[str, float] = {}
+
+            for term in tokenize(job_name.replace("_", " ")):
+                weighted_terms[term] = weighted_terms.get(term, 0.0) + self.NAME_WEIGHT
+
+            for keyword in get_job_keywords(func):
+                for term in tokenize(keyword):
+                    weighted_terms[term] = (
+                        weighted_terms.get(term, 0.0) + self.KEYWORD_WEIGHT
+                    )
+
+            for term in tokenize(get_job_description(func)):
+                weighted_terms[term] = (
+                    weighted_terms.get(term, 0.0) + self.DESCRIPTION_WEIGHT
+                )
+
+            self._job_names.append(job_name)
+            no_arguments = accepts_no_arguments(func)
+            needs_arguments.append(not no_arguments)
+            self._routable.append(job_name not in self.excluded_jobs and no_arguments)
+            documents.append(weighted_terms)
+
+            for term in weighted_terms:
+                self._vocabulary.setdefault(term, len(self._vocabulary))
+
+        self._needs_arguments = np.array(needs_arguments, dtype=bool)
+
+        if not documents:
+            return
+
+        term_frequencies = np.zeros(
+            (len(documents), len(self._vocabulary)), dtype=np.float32
+        )
+        for row, weighted_terms in enumerate(documents):
+            for term, weight in weighted_terms.items():
+                term_frequencies[row, self._vocabulary[term]] = weight
+
+        document_frequency = np.count_nonzero(term_frequencies, axis=0)
+        self._idf = (
+            np.log((1 + len(documents)) / (1 + document_frequency)) + 1.0
+        ).astype(np.float32)
+
+        matrix = np.log1p(term_frequencies) * self._idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._matrix = matrix / norms
+
+    def _vectorize(self, text: str) -> typing.Optional[np.ndarray]:
+        vector = np.zeros(len(self._vocabulary), dtype=np.float32)
+
+        for term in tokenize(text):
+            if (index := self._vocabulary.get(term)) is not None:
+                vector[index] += 1.0
+
+        if not vector.any():
+            return None
+
+        vector = np.log1p(vector) * self._idf
+        return vector / np.linalg.norm(vector)
+
+    def rank(self, user_input: str) -> typing.List[typing.Tuple[str, float]]:
+        """
+        Scores every indexed job against the user input.
+
+        Args:
+            user_input: The user's command
+
+        Returns:
+            List of (job name, cosine similarity) pairs sorted from the best match.
+        """
+        if (scores := self._score(user_input)) is None:
+            return []
+
+        order = np.argsort(-scores, kind="stable")
+
+        return [(self._job_names[index], float(scores[index])) for index in order]
+
+    def select(
+        self, user_input: str, k: int, min_score: float = 0.0
+    ) -> typing.List[str]:
+        """
+        Picks the jobs most relevant to the user input, e.g. to offer only those
+        to the LLM.
+
+        Args:
+            user_input: The user's command
+            k: Maximal number of jobs to return
+            min_score: Minimal cosine similarity of the best match, below which
+                       no job is selected
+
+        Returns:
+            Names of at most k jobs sharing a term with the input, best match first.
+        """
+        if k <= 0 or (scores := self._score(user_input)) is None:
+            return []
+
+        if float(scores.max()) < min_score:
+            return []
+
+        candidates = np.arange(len(scores))
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return [self._job_names[index] for index in candidates if scores[index] > 0]
+
+    def _has_unknown_words(self, user_input: str) -> bool:
+        """Checks whether the input has words, besides stop words, no job is indexed by"""
+        return any(
+            word not in self._vocabulary
+            for word in _TOKEN_PATTERN.findall(user_input.lower())
+            if word not in _STOP_WORDS
+        )
+
+    def _score(self, user_input: str) -> typing.Optional[np.ndarray]:
+        if not self._job_names or (vector := self._vectorize(user_input)) is None:
+            return None
+
+        return self._matrix @ vector
+
+    def route(self, user_input: str) -> typing.Optional[typing.Tuple[str, float]]:
+        """
+        Picks a job for the user input if the match is confident enough to skip the LLM.
+
+        Only jobs that can be called without arguments are dispatched locally, since
+        arguments still have to be extracted by the model. For the same reason,
+        commands with numbers or with words unknown to the index, and commands
+        also matching a job that needs arguments, are left to the model, as are
+        excluded jobs and negated commands.
+
+        Args:
+            user_input: The user's command
+
+        Returns:
+            Tuple of (job name, score) or None if the decision should be left to the LLM.
+        """
+        if (
+            is_negated(user_input)
+            or _NUMBER_PATTERN.search(user_input)
+            or self._has_unknown_words(user_input)
+            or (scores := self._score(user_input)) is None
+        ):
+            return None
+
+        # e.g. "volume down to 10 percent" is meant for set_volume, not volume_down
+        if bool((scores[self._needs_arguments] >= self.min_score).any()):
+            return None
+
+        best_index = int(np.argmax(scores))
+        best_score = float(scores[best_index])
+        second_score = float(np.partition(scores, -2)[-2]) if len(scores) > 1 else 0.0
+
+        if best_score < self.min_score or math.isclose(best_score, 0.0):
+            return None
+
+        if best_score - second_score < self.min_margin:
+            return None
+
+        if not self._routable[best_index]:
+            return None
+
+        return self._job_names[best_index], best_score
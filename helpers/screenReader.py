@@ -1,28 +1,40 @@
+import threading
 import typing
 
-import mss
-import numpy as np
-import pyautogui
-from PIL import Image
-
 from helpers import model as helper_model
-from modules.ai import AI
+from helpers.registry import ServiceRegistry
+
+if typing.TYPE_CHECKING:
+    import numpy as np
 
 
 class ScreenReader:
     _reader = None
-    _model = helper_model.get_model()
+    _reader_lock = threading.Lock()
+
+    @staticmethod
+    def load_reader() -> None:
+        """
+        Load the EasyOCR reader unless screenshots are read with Gemini vision.
+        Loading is slow (it loads torch models), so it is done once, on first use or
+        during eager startup.
+        """
 
-    if _model is None or (isinstance(_model, (list, tuple)) and _model[0] != "gemini"):
-        import easyocr
+        model = helper_model.get_model()
+        if model is not None and model[0] == "gemini":
+            return
 
-        _reader = easyocr.Reader(["en"])
+        with ScreenReader._reader_lock:
+            if ScreenReader._reader is None:
+                import easyocr
+
+                ScreenReader._reader = easyocr.Reader(["en"])
 
     @staticmethod
     def take_screenshot(
         gray: bool = False,
         target: typing.Literal["main", "active", "all"] = "main",
-    ) -> np.ndarray:
+    ) -> "np.ndarray":
         """
         Take a screenshot of the specified display.
 
@@ -38,12 +50,18 @@ class ScreenReader:
         if target not in ["main", "active", "all"]:
             raise ValueError("target must be one of: 'main', 'active', or 'all'")
 
+        import mss
+        import numpy as np
+        from PIL import Image
+
         with mss.mss() as sct:
             if target == "all":
                 monitor = sct.monitors[0]  # All monitors combined
 
             elif target == "active":
                 # Get monitor containing the mouse cursor
+                import pyautogui
+
                 x, y = pyautogui.position()
                 monitor = sct.monitors[1]  # Default to first monitor
                 for mon in sct.monitors[1:]:
@@ -68,13 +86,13 @@ class ScreenReader:
         return np.array(screenshot)
 
     @staticmethod
-    def find_text_in_screenshot(screenshot: np.ndarray, text: str):
-        if (
-            ScreenReader._model is not None
-            and isinstance(ScreenReader._model, (list, tuple))
-            and ScreenReader._model[0] == "gemini"
-        ):
-            ai_model = AI()
+    def find_text_in_screenshot(screenshot: "np.ndarray", text: str):
+        model = helper_model.get_model()
+        if model is not None and model[0] == "gemini":
+            ai_model = ServiceRegistry.get_service_instance("ai")
+            if ai_model is None:
+                print("Error finding text with AI: AI service not available")
+                return None
 
             try:
                 response = ai_model.find_text_in_screenshot(screenshot, text)
@@ -101,7 +119,8 @@ class ScreenReader:
                 print(f"Error finding text with AI: {e}")
                 return None
 
-        elif ScreenReader._reader is None:
+        ScreenReader.load_reader()
+        if ScreenReader._reader is None:
             raise RuntimeError("EasyOCR reader is not initialized.")
 
         result = ScreenReader._reader.readtext(screenshot)
@@ -121,3 +140,6 @@ class ScreenReader:
                 "bottom_right": (int(br[0]), int(br[1])),
                 "bottom_left": (int(bl[0]), int(bl[1])),
             }
+
+
+ServiceRegistry.register_initializer("easyocr", ScreenReader.load_reader)
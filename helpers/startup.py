@@ -0,0 +1,181 @@
+import concurrent.futures
+import threading
+import time
+import typing
+
+from helpers.registry import ServiceRegistry
+
+startup_modes = ["lazy", "eager", "parallel"]
+
+DEFAULT_STARTUP_TIMEOUT = 15.0
+
+
+def _run_in_daemon_thread(
+    name: str, func: typing.Callable[[], typing.Any]
+) -> concurrent.futures.Future:
+    """
+    Runs a function in a daemon thread and returns a future for its result.
+
+    Daemon threads are used instead of a ThreadPoolExecutor so that a constructor
+    stuck on the network (e.g. waiting for an OAuth callback) never blocks exit.
+    """
+    future: concurrent.futures.Future = concurrent.futures.Future()
+
+    def worker():
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=worker, name=f"startup-{name}", daemon=True).start()
+
+    return future
+
+
+def _get_startup_tasks() -> typing.Dict[str, typing.Callable[[], typing.Any]]:
+    """Collects service constructors and registered initializers in discovery order."""
+    tasks: typing.Dict[str, typing.Callable[[], typing.Any]] = {}
+
+    for service_name in ServiceRegistry.get_service_names():
+
+        def initialize_service(service_name=service_name):
+            if ServiceRegistry.get_service_instance(service_name) is None:
+                raise RuntimeError(
+                    ServiceRegistry.get_degraded_services().get(
+                        service_name, f"Service '{service_name}' is not available"
+                    )
+                )
+
+        tasks[service_name] = initialize_service
+
+    tasks.update(ServiceRegistry.get_initializers())
+
+    return tasks
+
+
+def initialize_services(
+    mode: str = "parallel",
+    timeout: float = DEFAULT_STARTUP_TIMEOUT,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    Eagerly initializes all registered services and startup initializers.
+
+    In "parallel" mode all constructors run concurrently, in "eager" mode they run
+    one after another in discovery order. In "lazy" mode services are constructed
+    on first use and registered initializers (e.g. the OCR model) only warm up in
+    background threads without being waited for.
+    Services that fail or exceed their timeout are marked as degraded; a timed out
+    constructor keeps running in the background and the service becomes available
+    once it finishes; until then its jobs fail immediately instead of waiting.
+
+    Args:
+        mode: One of "lazy", "eager" or "parallel"
+        timeout: Default per-service timeout in seconds, overridden by a service's
+                 `STARTUP_TIMEOUT` class attribute
+
+    Returns:
+        Timeline entries with the task name, status ("ready", "failed" or "timeout"),
+        start and end offsets in seconds and an optional error message.
+    """
+    if mode not in startup_modes:
+        raise ValueError(f"Startup mode must be one of: {', '.join(startup_modes)}")
+
+    if mode == "lazy":
+        for name, initializer in ServiceRegistry.get_initializers().items():
+            _run_in_daemon_thread(name, initializer)
+
+        return []
+
+    tasks = _get_startup_tasks()
+    timeline = []
+    finished_at: typing.Dict[str, float] = {}
+    started_at = time.perf_counter()
+
+    def start(name: str) -> typing.Tuple[float, concurrent.futures.Future]:
+        func = tasks[name]
+
+        def run():
+            try:
+                return func()
+            finally:
+                finished_at[name] = time.perf_counter()
+
+        return time.perf_counter(), _run_in_daemon_thread(name, run)
+
+    def wait_for(name: str, task_start: float, future: concurrent.futures.Future):
+        task_timeout = ServiceRegistry.get_startup_timeout(name) or timeout
+        deadline = task_start + task_timeout
+
+        entry: typing.Dict[str, typing.Any] = {
+            "name": name,
+            "status": "ready",
+            "start": task_start - started_at,
+            "error": None,
+        }
+
+        try:
+            future.result(timeout=max(deadline - time.perf_counter(), 0))
+        except concurrent.futures.TimeoutError:
+            entry["status"] = "timeout"
+            entry["error"] = f"Initialization exceeded {task_timeout:.1f}s"
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+
+        if entry["error"]:
+            ServiceRegistry.mark_degraded(name, entry["error"])
+
+        entry["end"] = finished_at.get(name, deadline) - started_at
+        timeline.append(entry)
+
+    if mode == "parallel":
+        running = [(name, *start(name)) for name in tasks]
+        for name, task_start, future in running:
+            wait_for(name, task_start, future)
+    else:
+        for name in tasks:
+            wait_for(name, *start(name))
+
+    return timeline
+
+
+def format_startup_timeline(
+    timeline: typing.List[typing.Dict[str, typing.Any]], mode: str
+) -> typing.List[str]:
+    """
+    Formats a startup timeline into report lines, ending with the critical path.
+
+    The critical path is the chain of tasks that determined when startup finished:
+    the slowest task in parallel mode, every task in eager mode.
+    """
+    if not timeline:
+        return [f"Startup mode '{mode}': no services initialized eagerly"]
+
+    total = max(entry["end"] for entry in timeline)
+    name_width = max(len(entry["name"]) for entry in timeline)
+
+    lines = [f"Startup timeline ({mode}, {total:.3f}s):"]
+    for entry in sorted(timeline, key=lambda entry: entry["start"]):
+        duration = entry["end"] - entry["start"]
+        line = (
+            f"  {entry['name']:<{name_width}}  {entry['status']:<7}  "
+            f"{entry['start']:7.3f}s -> {entry['end']:7.3f}s  ({duration:.3f}s)"
+        )
+        if entry["error"]:
+            line += f"  {entry['error']}"
+        lines.append(line)
+
+    if mode == "parallel":
+        critical = [max(timeline, key=lambda entry: entry["end"])]
+    else:
+        critical = timeline
+
+    critical_path = " -> ".join(
+        f"{entry['name']} ({entry['end'] - entry['start']:.3f}s)" for entry in critical
+    )
+    lines.append(f"Critical path: {critical_path}")
+
+    return lines
@@ -0,0 +1,139 @@
+import argparse
+import re
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import_times(module: str = "assistant") -> List[Dict]:
+    """
+    Imports a module in a fresh interpreter with `-X importtime` and parses the output.
+
+    Returns:
+        One entry per imported module with its name, nesting depth and self and
+        cumulative import time in microseconds, in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        raise RuntimeError(
+            f"Importing '{module}' failed: {error[-1] if error else 'unknown error'}"
+        )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+
+        self_us, cumulative_us, indent, name = match.groups()
+        imports.append(
+            {
+                "name": name,
+                "depth": (len(indent) - 1) // 2,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            }
+        )
+
+    return imports
+
+
+def generate_startup_report(module: str = "assistant", top: int = 20) -> str:
+    """Generate a report of the slowest imports when starting the assistant"""
+    try:
+        imports = measure_import_times(module)
+    except RuntimeError as e:
+        return str(e)
+
+    if not imports:
+        return f"No import timings recorded for '{module}'."
+
+    total_us = max(entry["cumulative_us"] for entry in imports if entry["depth"] == 0)
+
+    # Top-level packages, e.g. "google" for "google.genai.types"
+    packages: Dict[str, int] = {}
+    for entry in imports:
+        package = entry["name"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+
+    report = []
+    report.append("=" * 60)
+    report.append("AI ASSISTANT STARTUP IMPORT REPORT")
+    report.append("=" * 60)
+    report.append(f"Module: {module}")
+    report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report.append(f"Total import time: {total_us / 1000:.1f} ms")
+    report.append(f"Modules imported: {len(imports)}")
+    report.append("")
+
+    report.append(f"TOP {top} IMPORTS BY CUMULATIVE TIME")
+    report.append("-" * 30)
+    for entry in sorted(imports, key=lambda e: e["cumulative_us"], reverse=True)[:top]:
+        report.append(f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['name']}")
+    report.append("")
+
+    report.append(f"TOP {top} IMPORTS BY SELF TIME")
+    report.append("-" * 30)
+    for entry in sorted(imports, key=lambda e: e["self_us"], reverse=True)[:top]:
+        report.append(f"  {entry['self_us'] / 1000:8.1f} ms  {entry['name']}")
+    report.append("")
+
+    report.append(f"TOP {top} PACKAGES BY TOTAL TIME")
+    report.append("-" * 30)
+    for package, package_us in sorted(
+        packages.items(), key=lambda item: item[1], reverse=True
+    )[:top]:
+        report.append(f"  {package_us / 1000:8.1f} ms  {package}")
+
+    return "\n".join(report)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Report import times of the AI Assistant startup"
+    )
+    parser.add_argument(
+        "--module",
+        "-m",
+        type=str,
+        default="assistant",
+        help="Module to import (default: assistant)",
+    )
+    parser.add_argument(
+        "--top",
+        "-n",
+        type=int,
+        default=20,
+        help="Number of entries per section (default: 20)",
+    )
+    parser.add_argument(
+        "--output", "-o", type=str, help="Save report to file instead of printing"
+    )
+
+    args = parser.parse_args(argv)
+
+    report = generate_startup_report(args.module, args.top)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+        print(f"Report saved to: {args.output}")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
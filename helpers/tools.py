@@ -4,357 +4,256 @@ import io
 import re
 import typing
 
-import numpy as np
-from PIL import Image
-
 import helpers.model as helpers_model
-
-
-def function_to_schema(func: typing.Callable) -> typing.Dict[str, typing.Any]:
+from helpers.registry import ServiceRegistry
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+
+_DESCRIPTION_PATTERN = re.compile(
+    r"\s*(.*?)(?:\n\n|\n\s*Args:|\n\s*Parameters:|\Z)", re.DOTALL
+)
+_PARAMS_SECTION_PATTERN = re.compile(
+    r"(?:Args|Parameters):(.*?)(?:\n\s*Returns:|\n\s*Raises:|\Z)", re.DOTALL
+)
+_PARAM_PATTERN = re.compile(
+    r"\s*(\w+)(?:\s*\(\w+\))?\s*:\s*(.*?)(?=\n\s*\w+\s*:|$)", re.DOTALL
+)
+
+# Compiled tool specs and rendered schemas, dropped whenever the registry changes.
+# Cached schemas are shared between requests and must not be mutated by callers.
+_spec_cache: typing.Dict[typing.Callable, typing.Dict[str, typing.Any]] = {}
+_schema_cache: typing.Dict[
+    typing.Tuple[typing.Callable, str], typing.Dict[str, typing.Any]
+] = {}
+
+
+def function_to_schema(
+    func: typing.Callable, backend: typing.Optional[str] = None
+) -> typing.Dict[str, typing.Any]:
     """
     Converts a function's docstring into a structured JSON schema object.
 
     Args:
         func: The function to parse
+        backend: Model backend to render the schema for ("ollama", "gemini" or "sonnet").
+                 Defaults to the currently configured model.
 
     Returns:
         A dictionary representing the function in the requested schema format
     """
 
-    model = helpers_model.get_model()
+    if backend is None:
+        model = helpers_model.get_model()
 
-    if model is None:
-        raise Exception("Model is not initialized.")
+        if model is None:
+            raise Exception("Model is not initialized.")
 
-    if model[0] == "ollama":
-        return function_to_schema_ollama(func)
+        backend = typing.cast(str, model[0])
 
-    elif model[0] == "gemini":
-        return function_to_schema_gemini(func)
+    if backend not in _schema_renderers:
+        raise Exception("Unsupported model type.")
 
-    elif model[0] == "sonnet":
-        return function_to_schema_anthropic(func)
+    key = (func, backend)
+    if (schema := _schema_cache.get(key)) is None:
+        schema = _schema_renderers[backend](compile_function(func))
+        _schema_cache[key] = schema
 
-    raise Exception("Unsupported model type.")
+    return schema
 
 
-def function_to_schema_ollama(func: typing.Callable) -> typing.Dict[str, typing.Any]:
-    # Get function name
-    name = func.__name__
+def functions_to_schemas(
+    functions: typing.Iterable[typing.Callable], backend: str
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Converts multiple functions to schemas for a single backend."""
+    return [function_to_schema(func, backend) for func in functions]
 
-    # Get docstring and clean it up
-    docstring = inspect.getdoc(func) or ""
 
-    # Extract description (first paragraph of docstring)
-    description_match = re.match(
-        r"\s*(.*?)(?:\n\n|\n\s*Args:|\n\s*Parameters:|\Z)", docstring, re.DOTALL
-    )
-    description = description_match.group(1).strip() if description_match else ""
+def clear_schema_cache() -> None:
+    """Drops all compiled tool specs and rendered schemas."""
+    _spec_cache.clear()
+    _schema_cache.clear()
 
-    # Extract parameters section
-    params_match = re.search(
-        r"(?:Args|Parameters):(.*?)(?:\n\s*Returns:|\n\s*Raises:|\Z)",
-        docstring,
-        re.DOTALL,
-    )
-    params_text = params_match.group(1).strip() if params_match else ""
 
-    # Parse parameters
-    properties = {}
-    required = []
+ServiceRegistry.subscribe(lambda version: clear_schema_cache())
 
-    # Get type hints from function signature
-    type_hints = typing.get_type_hints(func)
-
-    # Parse parameter definitions
-    param_pattern = re.compile(
-        r"\s*(\w+)(?:\s*\(\w+\))?\s*:\s*(.*?)(?=\n\s*\w+\s*:|$)", re.DOTALL
-    )
-    for match in param_pattern.finditer(params_text):
-        param_name = match.group(1).strip()
-        param_desc = match.group(2).strip()
 
-        # Check if parameter is in kwargs (optional) or args (required)
-        sig = inspect.signature(func)
-        is_kwarg = False
-
-        for param in sig.parameters.values():
-            if param.name == param_name:
-                if param.default != inspect.Parameter.empty:
-                    is_kwarg = True
-                break
-
-        # Determine parameter type
-        param_type = "string"  # Default type
-        if param_name in type_hints:
-            hint = type_hints[param_name]
-            hint_str = str(hint)
-            if "int" in hint_str:
-                param_type = "integer"
-            elif "float" in hint_str:
-                param_type = "number"
-            elif "bool" in hint_str:
-                param_type = "boolean"
-            elif "list" in hint_str or "List" in hint_str:
-                param_type = "array"
-                properties[param_name] = {
-                    "type": param_type,
-                    "items": {"type": "string"},
-                    "description": param_desc,
-                }
-                continue
-            elif "dict" in hint_str or "Dict" in hint_str:
-                param_type = "object"
-
-        properties[param_name] = {"type": param_type, "description": param_desc}
-
-        # If not a kwarg and not "kwargs" itself, mark as required
-        if not is_kwarg and param_name != "kwargs" and not param_name.startswith("*"):
-            required.append(param_name)
-
-    # Handle  case separately by checking the function signature
-    sig = inspect.signature(func)
-    for param_name, param in sig.parameters.items():
-        if param.kind == inspect.Parameter.VAR_KEYWORD:  # This is
-            # Don't add kwargs to the properties or required list
-            pass
-        elif param_name not in properties:
-            # Handle parameters that weren't documented in the docstring
-            properties[param_name] = {
-                "type": "string",
-                "description": "No description available",
-            }
-            if (
-                param.default == inspect.Parameter.empty
-                and param.kind != inspect.Parameter.VAR_POSITIONAL
-            ):
-                required.append(param_name)
-
-    # Build the schema in the format required for Ollama
-    schema = {
-        "type": "function",
-        "function": {
-            "name": name,
-            "description": description,
-            "parameters": {
-                "type": "object",
-                "properties": properties,
-                "required": required,
-            },
-        },
-    }
+def compile_function(func: typing.Callable) -> typing.Dict[str, typing.Any]:
+    """
+    Parses a function's docstring and signature into a backend-neutral tool spec.
 
-    return schema
+    Args:
+        func: The function to parse
 
+    Returns:
+        Dictionary with the function name, description and a list of parameters,
+        each described by its name, JSON type, description and whether it is required.
+    """
 
-def function_to_schema_gemini(func: typing.Callable) -> typing.Dict[str, typing.Any]:
-    # Get function name
-    name = func.__name__
+    if (spec := _spec_cache.get(func)) is not None:
+        return spec
 
     # Get docstring and clean it up
     docstring = inspect.getdoc(func) or ""
 
     # Extract description (first paragraph of docstring)
-    description_match = re.match(
-        r"\s*(.*?)(?:\n\n|\n\s*Args:|\n\s*Parameters:|\Z)", docstring, re.DOTALL
-    )
+    description_match = _DESCRIPTION_PATTERN.match(docstring)
     description = description_match.group(1).strip() if description_match else ""
 
     # Extract parameters section
-    params_match = re.search(
-        r"(?:Args|Parameters):(.*?)(?:\n\s*Returns:|\n\s*Raises:|\Z)",
-        docstring,
-        re.DOTALL,
-    )
+    params_match = _PARAMS_SECTION_PATTERN.search(docstring)
     params_text = params_match.group(1).strip() if params_match else ""
 
-    # Parse parameters
-    properties = {}
-    required = []
-
-    # Get type hints from function signature
     type_hints = typing.get_type_hints(func)
+    signature_params = inspect.signature(func).parameters
 
-    # Parse parameter definitions
-    param_pattern = re.compile(
-        r"\s*(\w+)(?:\s*\(\w+\))?\s*:\s*(.*?)(?=\n\s*\w+\s*:|$)", re.DOTALL
-    )
-    for match in param_pattern.finditer(params_text):
+    parameters = []
+    documented = set()
+
+    for match in _PARAM_PATTERN.finditer(params_text):
         param_name = match.group(1).strip()
         param_desc = match.group(2).strip()
 
-        # Check if parameter is in kwargs (optional) or args (required)
-        sig = inspect.signature(func)
-        is_kwarg = False
-
-        for param in sig.parameters.values():
-            if param.name == param_name:
-                if param.default != inspect.Parameter.empty:
-                    is_kwarg = True
-                break
-
-        # Determine parameter type
-        param_type = "string"  # Default type
-        if param_name in type_hints:
-            hint = type_hints[param_name]
-            hint_str = str(hint)
-            if "int" in hint_str:
-                param_type = "integer"
-            elif "float" in hint_str:
-                param_type = "number"
-            elif "bool" in hint_str:
-                param_type = "boolean"
-            elif "list" in hint_str or "List" in hint_str:
-                param_type = "array"
-                properties[param_name] = {
-                    "type": param_type,
-                    "items": {"type": "string"},
-                    "description": param_desc,
-                }
-                continue
-            elif "dict" in hint_str or "Dict" in hint_str:
-                param_type = "object"
-
-        properties[param_name] = {"type": param_type, "description": param_desc}
-
-        # If not a kwarg and not "kwargs" itself, mark as required
-        if not is_kwarg and param_name != "kwargs" and not param_name.startswith("*"):
-            required.append(param_name)
-
-    # Handle  case separately by checking the function signature
-    sig = inspect.signature(func)
-    for param_name, param in sig.parameters.items():
-        if param.kind == inspect.Parameter.VAR_KEYWORD:  # This is
-            # Don't add kwargs to the properties or required list
-            pass
-        elif param_name not in properties:
-            # Handle parameters that weren't documented in the docstring
-            properties[param_name] = {
+        # Parameters with default values are optional
+        param = signature_params.get(param_name)
+        is_kwarg = param is not None and param.default != inspect.Parameter.empty
+
+        documented.add(param_name)
+        parameters.append(
+            {
+                "name": param_name,
+                "type": _get_json_type(type_hints.get(param_name)),
+                "description": param_desc,
+                "required": not is_kwarg
+                and param_name != "kwargs"
+                and not param_name.startswith("*"),
+            }
+        )
+
+    # Handle parameters that weren't documented in the docstring
+    for param_name, param in signature_params.items():
+        if param.kind == inspect.Parameter.VAR_KEYWORD or param_name in documented:
+            continue
+
+        parameters.append(
+            {
+                "name": param_name,
                 "type": "string",
                 "description": "No description available",
+                "required": param.default == inspect.Parameter.empty
+                and param.kind != inspect.Parameter.VAR_POSITIONAL,
             }
-            if (
-                param.default == inspect.Parameter.empty
-                and param.kind != inspect.Parameter.VAR_POSITIONAL
-            ):
-                required.append(param_name)
-
-    # Build the schema
-    schema = {
-        "name": name,
+        )
+
+    spec = {
+        "name": func.__name__,
         "description": description,
-        "parameters": {
-            "type": "object",
-            "properties": properties,
-            "required": required,
-        },
+        "parameters": parameters,
     }
+    _spec_cache[func] = spec
 
-    return schema
+    return spec
 
 
-def function_to_schema_anthropic(func: typing.Callable) -> typing.Dict[str, typing.Any]:
-    # Get function name
-    name = func.__name__
+def _get_json_type(hint: typing.Any) -> str:
+    if hint is None:
+        return "string"
 
-    # Get docstring and clean it up
-    docstring = inspect.getdoc(func) or ""
+    hint_str = str(hint)
+    if "int" in hint_str:
+        return "integer"
+    elif "float" in hint_str:
+        return "number"
+    elif "bool" in hint_str:
+        return "boolean"
+    elif "list" in hint_str or "List" in hint_str:
+        return "array"
+    elif "dict" in hint_str or "Dict" in hint_str:
+        return "object"
 
-    # Extract description (first paragraph of docstring)
-    description_match = re.match(
-        r"\s*(.*?)(?:\n\n|\n\s*Args:|\n\s*Parameters:|\Z)", docstring, re.DOTALL
-    )
-    description = description_match.group(1).strip() if description_match else ""
+    return "string"
 
-    # Extract parameters section
-    params_match = re.search(
-        r"(?:Args|Parameters):(.*?)(?:\n\s*Returns:|\n\s*Raises:|\Z)",
-        docstring,
-        re.DOTALL,
-    )
-    params_text = params_match.group(1).strip() if params_match else ""
 
-    # Parse parameters
+def _spec_to_parameters(
+    spec: typing.Dict[str, typing.Any], array_items: bool = True
+) -> typing.Dict[str, typing.Any]:
+    """
+    Args:
+        array_items: Give array parameters string items and leave them out of
+                     the required list, as the Ollama and Gemini schemas do
+    """
     properties = {}
     required = []
+    for param in spec["parameters"]:
+        prop = {"type": param["type"], "description": param["description"]}
+        is_array = param["type"] == "array"
+        if is_array and array_items:
+            prop["items"] = {"type": "string"}
 
-    # Get type hints from function signature
-    type_hints = typing.get_type_hints(func)
+        properties[param["name"]] = prop
 
-    # Parse parameter definitions
-    param_pattern = re.compile(
-        r"\s*(\w+)(?:\s*\(\w+\))?\s*:\s*(.*?)(?=\n\s*\w+\s*:|$)", re.DOTALL
-    )
-    for match in param_pattern.finditer(params_text):
-        param_name = match.group(1).strip()
-        param_desc = match.group(2).strip()
+        if param["required"] and not (is_array and array_items):
+            required.append(param["name"])
 
-        # Check if parameter is in kwargs (optional) or args (required)
-        sig = inspect.signature(func)
-        is_kwarg = False
-
-        for param in sig.parameters.values():
-            if param.name == param_name:
-                if param.default != inspect.Parameter.empty:
-                    is_kwarg = True
-                break
-
-        # Determine parameter type
-        param_type = "string"  # Default type
-        if param_name in type_hints:
-            hint = type_hints[param_name]
-            hint_str = str(hint)
-            if "int" in hint_str:
-                param_type = "integer"
-            elif "float" in hint_str:
-                param_type = "number"
-            elif "bool" in hint_str:
-                param_type = "boolean"
-            elif "list" in hint_str or "List" in hint_str:
-                param_type = "array"
-            elif "dict" in hint_str or "Dict" in hint_str:
-                param_type = "object"
-
-        properties[param_name] = {"type": param_type, "description": param_desc}
-
-        # If not a kwarg and not "kwargs" itself, mark as required
-        if not is_kwarg and param_name != "kwargs" and not param_name.startswith("*"):
-            required.append(param_name)
-
-    # Handle  case separately by checking the function signature
-    sig = inspect.signature(func)
-    for param_name, param in sig.parameters.items():
-        if param.kind == inspect.Parameter.VAR_KEYWORD:  # This is
-            # Don't add kwargs to the properties or required list
-            pass
-        elif param_name not in properties:
-            # Handle parameters that weren't documented in the docstring
-            properties[param_name] = {
-                "type": "string",
-                "description": "No description available",
-            }
-            if (
-                param.default == inspect.Parameter.empty
-                and param.kind != inspect.Parameter.VAR_POSITIONAL
-            ):
-                required.append(param_name)
-
-    # Build the schema
-    schema = {
-        "name": name,
-        "description": description,
-        "input_schema": {
-            "type": "object",
-            "properties": properties,
-            "required": required,
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": required,
+    }
+
+
+def _render_ollama(spec: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    return {
+        "type": "function",
+        "function": {
+            "name": spec["name"],
+            "description": spec["description"],
+            "parameters": _spec_to_parameters(spec),
         },
     }
 
-    return schema
+
+def _render_gemini(spec: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    return {
+        "name": spec["name"],
+        "description": spec["description"],
+        "parameters": _spec_to_parameters(spec),
+    }
+
+
+def _render_anthropic(
+    spec: typing.Dict[str, typing.Any],
+) -> typing.Dict[str, typing.Any]:
+    return {
+        "name": spec["name"],
+        "description": spec["description"],
+        "input_schema": _spec_to_parameters(spec, array_items=False),
+    }
+
+
+_schema_renderers: typing.Dict[
+    str, typing.Callable[[typing.Dict[str, typing.Any]], typing.Dict[str, typing.Any]]
+] = {
+    "ollama": _render_ollama,
+    "gemini": _render_gemini,
+    "sonnet": _render_anthropic,
+}
+
+
+def function_to_schema_ollama(func: typing.Callable) -> typing.Dict[str, typing.Any]:
+    return function_to_schema(func, "ollama")
+
+
+def function_to_schema_gemini(func: typing.Callable) -> typing.Dict[str, typing.Any]:
+    return function_to_schema(func, "gemini")
+
+
+def function_to_schema_anthropic(func: typing.Callable) -> typing.Dict[str, typing.Any]:
+    return function_to_schema(func, "sonnet")
 
 
 def numpy_image_to_base64_bytes(
-    image_array: np.ndarray, image_format: str = "PNG"
+    image_array: "np.ndarray", image_format: str = "PNG"
 ) -> typing.Optional[bytes]:
     """
     Encodes a NumPy array image into a base64 byte string.
@@ -367,6 +266,9 @@ def numpy_image_to_base64_bytes(
         A bytes object containing the base64 encoded image data.
         Returns None if the conversion fails.
     """
+    import numpy as np
+    from PIL import Image
+
     # Ensure the array is in a format Pillow can handle (e.g., uint8)
     if image_array.dtype != np.uint8:
         print(f"Warning: Converting image data from {image_array.dtype} to uint8.")
@@ -0,0 +1,452 @@
+import argparse
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import typing
+from pathlib import Path
+
+import dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from helpers import events  # noqa: E402
+from helpers.log_rotation import (  # noqa: E402
+    COMPRESSED_SUFFIXES,
+    get_base_suffix,
+    open_log_file,
+)
+
+if typing.TYPE_CHECKING:
+    import requests
+
+T = typing.TypeVar("T")
+
+# Read on the first span, once `.env` can be loaded
+_tracing_enabled: typing.Optional[bool] = None
+
+_current_span: contextvars.ContextVar[typing.Optional["Span"]] = contextvars.ContextVar(
+    "ai_assistant_span", default=None
+)
+
+# Threads whose name was already exported as trace metadata
+_named_threads: typing.Set[int] = set()
+_named_threads_lock = threading.Lock()
+
+
+class Span:
+    """
+    Timed operation within a trace, with a parent span and attributes.
+
+    Spans are exported as Chrome trace events when they end. The start time is
+    taken from the wall clock so spans of different threads line up, while the
+    duration is measured with a monotonic clock.
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent",
+        "attributes",
+        "start_ns",
+        "duration_ns",
+        "thread_id",
+        "_start_perf_ns",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: typing.Optional["Span"] = None,
+        attributes: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    ) -> None:
+        # Lazy import, so exporting traces from the command line writes no logs
+        from helpers.logger import logger
+
+        self.name = name
+        self.parent = parent
+        self.trace_id = (
+            parent.trace_id
+            if parent is not None
+            else logger.get_request_id() or secrets.token_hex(8)
+        )
+        self.span_id = secrets.token_hex(8)
+        self.attributes: typing.Dict[str, typing.Any] = dict(attributes or {})
+        self.thread_id = threading.get_native_id()
+        self.start_ns = time.time_ns()
+        self.duration_ns: typing.Optional[int] = None
+        self._start_perf_ns = time.perf_counter_ns()
+
+    def set_attribute(self, key: str, value: typing.Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: typing.Any) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.attributes["error"] = f"{type(exception).__name__}: {exception}"
+
+    def end(self) -> None:
+        if self.duration_ns is not None:
+            return
+
+        from helpers.logger import logger
+
+        self.duration_ns = time.perf_counter_ns() - self._start_perf_ns
+        logger.log_trace_events(self.to_trace_events())
+
+    def to_trace_events(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Returns the Chrome trace events describing the span"""
+        pid = os.getpid()
+        ts = self.start_ns / 1000
+        trace_events = []
+
+        with _named_threads_lock:
+            if self.thread_id not in _named_threads:
+                _named_threads.add(self.thread_id)
+                trace_events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": pid,
+                        "tid": self.thread_id,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+
+        args = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            **{key: _to_json_value(value) for key, value in self.attributes.items()},
+        }
+        trace_events.append(
+            {
+                "name": self.name,
+                "cat": "span",
+                "ph": "X",
+                "ts": ts,
+                "dur": (self.duration_ns or 0) / 1000,
+                "pid": pid,
+                "tid": self.thread_id,
+                "args": args,
+            }
+        )
+
+        # Flow arrow from the parent's thread to spans started on another thread
+        if self.parent is not None and self.parent.thread_id != self.thread_id:
+            flow = {
+                "name": "thread",
+                "cat": "flow",
+                "id": self.span_id,
+                "ts": ts,
+                "pid": pid,
+                "args": {"trace_id": self.trace_id},
+            }
+            trace_events.append({**flow, "ph": "s", "tid": self.parent.thread_id})
+            trace_events.append({**flow, "ph": "f", "bp": "e", "tid": self.thread_id})
+
+        return trace_events
+
+
+class _NoopSpan:
+    """Span returned while tracing is disabled, ignoring all attributes"""
+
+    def set_attribute(self, key: str, value: typing.Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: typing.Any) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _to_json_value(value: typing.Any) -> typing.Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    return str(value)
+
+
+def is_tracing_enabled() -> bool:
+    """Whether spans are recorded, unless disabled with AI_ASSISTANT_TRACING=0"""
+    global _tracing_enabled
+
+    if _tracing_enabled is None:
+        dotenv.load_dotenv()
+        _tracing_enabled = os.getenv("AI_ASSISTANT_TRACING", "1") != "0"
+
+    return _tracing_enabled
+
+
+def get_current_span() -> typing.Union[Span, _NoopSpan]:
+    """Returns the innermost active span, or a no-op span outside of any span"""
+    return _current_span.get() or _NOOP_SPAN
+
+
+@contextlib.contextmanager
+def start_span(
+    name: str, **attributes: typing.Any
+) -> typing.Iterator[typing.Union[Span, _NoopSpan]]:
+    """
+    Context manager running its block in a new child span of the current span.
+
+    Spans started outside of any span begin a new trace, identified by the
+    current request id when there is one.
+    """
+    if not is_tracing_enabled():
+        yield _NOOP_SPAN
+        return
+
+    span = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name: typing.Optional[str] = None, **attributes: typing.Any):
+    """Decorator running every call of the function in a span"""
+
+    def decorator(func: typing.Callable[..., T]) -> typing.Callable[..., T]:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            with start_span(span_name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def bind_context(func: typing.Callable[..., T]) -> typing.Callable[..., T]:
+    """
+    Binds the function to the current context, so spans it starts on another
+    thread are children of the current span and its events keep the request id.
+
+    Example:
+        threading.Thread(target=tracing.bind_context(watch_screen)).start()
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> T:
+        return context.run(func, *args, **kwargs)
+
+    return wrapper
+
+
+def http_request(method: str, url: str, **kwargs) -> "requests.Response":
+    """
+    Sends an HTTP request with `requests` inside an "http" span.
+
+    The query string is left out of the recorded URL, since it may hold API keys.
+    """
+    import requests
+
+    with start_span(
+        "http", **{"http.method": method.upper(), "http.url": url.split("?", 1)[0]}
+    ) as span:
+        response = requests.request(method.upper(), url, **kwargs)
+        span.set_attribute("http.status_code", response.status_code)
+
+        return response
+
+
+def _segment_order(file: Path) -> typing.Tuple[str, int]:
+    # Segments are named <prefix>_<timestamp>[_<counter>]<suffix>
+    match = re.match(r"(.*_\d{8}_\d{6})(?:_(\d+))?$", file.name.split(".", 1)[0])
+    if match is None:
+        return file.name, 0
+
+    return match.group(1), int(match.group(2) or 0)
+
+
+def find_trace_segments(logs_dir: Path) -> typing.List[Path]:
+    """Returns the trace segments in the logs directory, oldest first"""
+    return sorted(
+        (
+            file
+            for file in events.find_log_segments(logs_dir)
+            if get_base_suffix(file) == events.TRACE_SUFFIX
+        ),
+        key=_segment_order,
+    )
+
+
+def read_trace_events(
+    paths: typing.Iterable[Path],
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """Streams trace events from trace segments, compressed or not"""
+    for path in paths:
+        if not path.exists():
+            # Compressed since it was listed
+            path = next(
+                (
+                    compressed
+                    for suffix in COMPRESSED_SUFFIXES.values()
+                    if (compressed := path.with_name(path.name + suffix)).exists()
+                ),
+                path,
+            )
+
+        try:
+            with open_log_file(path) as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line of a segment that is still being written
+                        continue
+        except FileNotFoundError:
+            # Deleted by the log retention meanwhile
+            continue
+
+
+def _find_trace_id(
+    trace_events: typing.Iterable[typing.Dict[str, typing.Any]], slowest: bool
+) -> typing.Optional[str]:
+    """Returns the id of the trace whose latest span ended last, or the slowest"""
+    latest_id = None
+    slowest_id = None
+    slowest_duration = -1.0
+
+    for trace_event in trace_events:
+        if trace_event.get("ph") == "M":
+            continue
+
+        event_trace_id = trace_event.get("args", {}).get("trace_id")
+        if event_trace_id is None:
+            continue
+
+        latest_id = event_trace_id
+        if (
+            trace_event.get("ph") == "X"
+            and trace_event["args"].get("parent_id") is None
+            and trace_event["dur"] > slowest_duration
+        ):
+            slowest_id = event_trace_id
+            slowest_duration = trace_event["dur"]
+
+    if slowest and slowest_id is not None:
+        return slowest_id
+
+    return latest_id
+
+
+def export_trace(
+    read_events: typing.Callable[[], typing.Iterable[typing.Dict[str, typing.Any]]],
+    trace_id: typing.Optional[str] = None,
+    slowest: bool = False,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Selects a single trace from trace events, as a Chrome trace JSON object.
+
+    The events are streamed, only the selected trace is kept in memory. Without
+    a trace id they are read twice, first to find the trace to select.
+
+    Args:
+        read_events: Returns a fresh iterable of the recorded trace events
+        trace_id: Id of the trace to select, the latest trace by default
+        slowest: Select the trace with the longest root span instead
+
+    Returns:
+        Object loadable by chrome://tracing, Perfetto or speedscope
+    """
+    if trace_id is None:
+        trace_id = _find_trace_id(read_events(), slowest)
+
+    # Latest thread name metadata by process and thread id
+    metadata: typing.Dict[typing.Tuple[int, int], typing.Dict[str, typing.Any]] = {}
+    selected = []
+
+    if trace_id is not None:
+        for trace_event in read_events():
+            if trace_event.get("ph") == "M":
+                metadata[(trace_event["pid"], trace_event["tid"])] = trace_event
+            elif trace_event.get("args", {}).get("trace_id") == trace_id:
+                selected.append(trace_event)
+
+    threads = {(trace_event["pid"], trace_event["tid"]) for trace_event in selected}
+
+    return {
+        "traceEvents": [metadata[thread] for thread in threads if thread in metadata]
+        + selected,
+        "displayTimeUnit": "ms",
+    }
+
+
+def main(argv: typing.Optional[typing.Iterable[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Export a single trace of the AI Assistant for a trace viewer"
+    )
+    parser.add_argument(
+        "--input",
+        "-i",
+        type=str,
+        default="logs",
+        help="Logs directory or a single trace segment (default: logs)",
+    )
+    parser.add_argument(
+        "--trace-id", "-t", type=str, help="Trace (request) id, the latest by default"
+    )
+    parser.add_argument(
+        "--slowest", action="store_true", help="Export the slowest trace"
+    )
+    parser.add_argument(
+        "--output", "-o", type=str, default="trace.json", help="Output JSON file"
+    )
+
+    args = parser.parse_args(argv)
+
+    input_path = Path(args.input)
+    if input_path.is_dir():
+        paths = find_trace_segments(input_path)
+    else:
+        paths = [input_path] if input_path.exists() else []
+
+    if not paths:
+        print("No traces found. Run the AI Assistant first to record traces.")
+        return
+
+    # Segments are listed again for each pass, the assistant may have rotated them
+    trace = export_trace(
+        lambda: read_trace_events(
+            find_trace_segments(input_path) if input_path.is_dir() else paths
+        ),
+        args.trace_id,
+        args.slowest,
+    )
+    if not trace["traceEvents"]:
+        print("Trace not found")
+        return
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(trace, file)
+
+    print(
+        f"Trace with {len(trace['traceEvents'])} events saved to: {args.output}, "
+        "open it in chrome://tracing or https://ui.perfetto.dev"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,26 @@
 import typing
 
-import anthropic
-import numpy as np
-import ollama
-from google import genai
-
 import helpers.model as helpers_model
-from helpers.audio import Audio
+from helpers import event_loop
+from helpers.audio import SpeechStream, SpokenText
 from helpers.cache import Cache
-from helpers.decorators import capture_response
+from helpers.decorators import capture_response, timed
 from helpers.logger import logger
+from helpers.model_router import ModelRouter
 from helpers.registry import method_job, simple_service
 
+if typing.TYPE_CHECKING:
+    import numpy as np
+
 
 @simple_service
 class AI:
-    client = None
+    router: ModelRouter
+    backend: typing.Optional[str] = None
 
     def __init__(self) -> None:
-        local = Cache.get_local()
-        if local:
-            self.client = ollama.Client()
-            return
-
-        response = helpers_model.get_model()
-        if response is None:
-            raise Exception(
-                "You need to set either the GEMINI_API_KEY or ANTHROPIC_API_KEY environment variable."
-            )
-
-        model, api_key = response
-        if model == "gemini":
-            self.client = genai.Client(api_key=api_key)
-
-        elif model == "sonnet":
-            self.client = anthropic.Anthropic(api_key=api_key)
+        self.router = ModelRouter.from_environment()
+        self.backend = self.router.backends[0]
 
     @capture_response
     @method_job
@@ -63,26 +49,38 @@ class AI:
         if not question:
             return "Error: No question provided."
 
-        audio = Cache.get_audio()
-        if audio:
-            Audio.text_to_speech(f"Asking {question}...")
+        # With audio, the answer is spoken sentence by sentence while it is generated
+        speech = SpeechStream() if Cache.get_audio() else None
+        if speech is not None:
+            speech.say(f"Asking {question}...")
         print(f"Asking {question}...")
 
         assistant_instructions = "Answer the question as if you are a human. Keep the answer short and simple."
 
-        response = helpers_model.send_message(
-            client=self.client,
-            message=question,
-            system_instructions=assistant_instructions,
-        )
-
-        answer = helpers_model.get_text_from_response(response)
-
-        if answer is None:
+        deltas = []
+        try:
+            for delta in event_loop.iterate_sync(
+                self.router.stream_message(
+                    message=question,
+                    system_instructions=assistant_instructions,
+                )
+            ):
+                deltas.append(delta)
+                if speech is not None:
+                    speech.feed(delta)
+        finally:
+            if speech is not None:
+                speech.close()
+
+        if not (answer := "".join(deltas)):
             return "Error: Could not retrieve an answer."
 
+        if speech is not None:
+            return SpokenText(answer)
+
         return answer
 
+    @timed("get_function_to_call")
     def get_function_to_call(
         self,
         user_input: str,
@@ -101,11 +99,12 @@ class AI:
 
         assistant_instructions = "You are tasked with determining the function to call based on the user's input. Make use of the keywords in the input to identify the appropriate function. If no function is applicable, return 'ask_question' as the default function."
 
-        response = helpers_model.send_message(
-            client=self.client,
-            message=user_input,
-            available_tools=available_tools,
-            system_instructions=assistant_instructions,
+        response = event_loop.run_sync(
+            self.router.send_message(
+                message=user_input,
+                available_tools=available_tools,
+                system_instructions=assistant_instructions,
+            )
         )
 
         function_to_call = helpers_model.get_function_from_response(response)
@@ -128,16 +127,17 @@ class AI:
     def explain_screenshot(
         self,
         user_input: str,
-        screenshot: np.ndarray,
+        screenshot: "np.ndarray",
     ) -> str:
         assistant_instructions = "You are tasked with explaining the contents of the screenshot. If there is a highlighted text then focus on that and provide a concise explanation. Keep the answer short and simple."
 
         try:
-            response = helpers_model.send_message(
-                client=self.client,
-                message=user_input,
-                system_instructions=assistant_instructions,
-                image=screenshot,
+            response = event_loop.run_sync(
+                self.router.send_message(
+                    message=user_input,
+                    system_instructions=assistant_instructions,
+                    image=screenshot,
+                )
             )
 
         except:
@@ -151,17 +151,18 @@ class AI:
 
     def find_text_in_screenshot(
         self,
-        screenshot: np.ndarray,
+        screenshot: "np.ndarray",
         text: str,
     ) -> typing.Optional[typing.List[float]]:
         assistant_instructions = "You are tasked with finding the text specified by user in the screenshot. Provide the bounding box coordinates in the format [ymin, xmin, ymax, xmax] normalized to 0-1000."
 
         try:
-            response = helpers_model.send_message(
-                client=self.client,
-                message=text,
-                system_instructions=assistant_instructions,
-                image=screenshot,
+            response = event_loop.run_sync(
+                self.router.send_message(
+                    message=text,
+                    system_instructions=assistant_instructions,
+                    image=screenshot,
+                )
             )
 
         except:
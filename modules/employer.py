@@ -1,87 +1,331 @@
 import os
 import threading
+import time
+import types
 import typing
 
+from helpers import metrics, model_router, tracing
 from helpers.audio import Audio
 from helpers.cache import Cache
-from helpers.commands import Commands
+from helpers.commands import Commands, normalize_command
 from helpers.decorators import capture_response, exit_on_exception
 from helpers.logger import logger
+from helpers.profiling import Profiling
 from helpers.recognizer import Recognizer
 from helpers.registry import ServiceRegistry, register_job
+from helpers.router import IntentRouter, accepts_no_arguments
 from modules.ai import AI
 
+# Jobs offered to the model per command, 0 offers all of them
+TOOL_TOP_K = int(os.getenv("AI_ASSISTANT_TOOL_TOP_K", "8"))
+
+# Job the model is told to pick when no other job applies, always offered
+FALLBACK_JOB = "ask_question"
+
+# Destructive jobs, only run when the model picks them and never by the local router
+LLM_ONLY_JOBS = frozenset({"close_computer", "exit"})
+
+
+class JobSnapshot:
+    """
+    Immutable view of the registered jobs for a single registry version.
+
+    Holds everything the command path needs precomputed: the name to callable
+    mapping, the job list offered to the model, the alias index for direct
+    commands and the local intent router.
+    """
+
+    __slots__ = (
+        "version",
+        "jobs",
+        "functions",
+        "command_index",
+        "intent_router",
+    )
+
+    def __init__(self, version: int, jobs: typing.Dict[str, typing.Callable]) -> None:
+        self.version = version
+        self.jobs: typing.Mapping[str, typing.Callable] = types.MappingProxyType(
+            dict(jobs)
+        )
+        self.functions: typing.Tuple[typing.Callable, ...] = tuple(jobs.values())
+        self.command_index: typing.Mapping[str, str] = types.MappingProxyType(
+            self._build_command_index(jobs)
+        )
+        # The fallback job needs the question the model extracts from the input
+        self.intent_router = IntentRouter(
+            jobs, excluded_jobs=LLM_ONLY_JOBS | {FALLBACK_JOB}
+        )
+
+    def select_tools(
+        self, user_input: str, top_k: int = TOOL_TOP_K
+    ) -> typing.Mapping[str, typing.Callable]:
+        """
+        Jobs to offer the model for the user input: the top_k best matches of
+        the intent router and the fallback job.
+
+        All jobs are offered when pruning is disabled, would not make the set
+        smaller, or the best match is less confident than a local routing
+        match, e.g. for general questions. Selected jobs keep the registration
+        order, so commands selecting the same jobs send the same prompt prefix
+        and share the provider's prompt cache.
+        """
+        if top_k <= 0 or len(self.jobs) <= top_k + 1:
+            return self.jobs
+
+        if not (
+            matches := self.intent_router.select(
+                user_input, top_k, self.intent_router.min_score
+            )
+        ):
+            return self.jobs
+
+        selected = {*matches, FALLBACK_JOB}
+        return {
+            job_name: func
+            for job_name, func in self.jobs.items()
+            if job_name in selected
+        }
+
+    def is_tool_set_miss(
+        self,
+        user_input: str,
+        tools: typing.Mapping[str, typing.Callable],
+        function_name: typing.Optional[str],
+        top_k: int = TOOL_TOP_K,
+    ) -> bool:
+        """
+        Checks whether the model's choice from a pruned tool set has to be
+        repeated with all jobs: it chose no job, a job it was not offered, or
+        the fallback job although the input did not match it, which suggests
+        the right job was pruned.
+        """
+        if len(tools) >= len(self.jobs):
+            return False
+
+        if function_name is None or function_name not in tools:
+            return True
+
+        return function_name == FALLBACK_JOB and FALLBACK_JOB not in (
+            self.intent_router.select(user_input, top_k)
+        )
+
+    @staticmethod
+    def _build_command_index(
+        jobs: typing.Dict[str, typing.Callable],
+    ) -> typing.Dict[str, str]:
+        """
+        Maps normalized job names, human names and synonyms from commands.yaml to jobs.
+
+        Only jobs callable without arguments are indexed, since direct commands
+        carry no arguments.
+        """
+        direct_jobs = {
+            job_name for job_name, func in jobs.items() if accepts_no_arguments(func)
+        }
+
+        command_index = {}
+        for job_name in direct_jobs:
+            command_index[normalize_command(job_name)] = job_name
+            command_index[normalize_command(jobs[job_name].__name__)] = job_name
+
+        for alias, job_name in Commands.get_command_aliases().items():
+            if job_name in direct_jobs:
+                command_index.setdefault(alias, job_name)
+
+        return command_index
+
 
 class Employer:
-    available_jobs: typing.Dict[str, typing.Callable] = {}
     _active_jobs: typing.Dict[str, threading.Thread] = {}
-    _services = {}
 
     def __init__(self) -> None:
-        self.service_instances = {}
-        self.ai_model = AI()
+        self._snapshot: typing.Optional[JobSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+
+        ServiceRegistry.subscribe(self._on_registry_change)
+
+    @property
+    def ai_model(self) -> AI:
+        """AI service used for routing, constructed on the first LLM request"""
+        if (ai_model := ServiceRegistry.get_service_instance("ai")) is None:
+            raise RuntimeError("AI service is not available")
+
+        return ai_model
+
+    def get_job(self, job_name: str) -> typing.Optional[typing.Callable]:
+        """Returns the registered job with the given name or command alias, if any"""
+        snapshot = self.get_snapshot()
+
+        if (job := snapshot.jobs.get(job_name)) is not None:
+            return job
+
+        if alias_target := snapshot.command_index.get(normalize_command(job_name)):
+            return snapshot.jobs[alias_target]
+
+        return None
+
+    def get_snapshot(self) -> JobSnapshot:
+        """Returns the current job snapshot, rebuilding it only after registry changes"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == ServiceRegistry.get_version():
+            return snapshot
+
+        with self._snapshot_lock:
+            version = ServiceRegistry.get_version()
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = JobSnapshot(version, ServiceRegistry.get_all_jobs())
+
+            return self._snapshot
+
+    def _on_registry_change(self, version: int) -> None:
+        self._snapshot = None
 
     @exit_on_exception
     def speak(self) -> None:
-        user_input = str(Recognizer.recognize_speech_from_mic())
-
-        if not user_input:
-            print("I didn't hear anything.")
-            logger.log_system_event(
-                "speech_recognition_failed", "No speech detected or recognized"
-            )
-            return
+        with logger.request_context(), tracing.start_span("speak"), logger.timer(
+            "speak"
+        ):
+            user_input = str(Recognizer.recognize_speech_from_mic())
+
+            if not user_input:
+                print("I didn't hear anything.")
+                logger.log_system_event(
+                    "speech_recognition_failed", "No speech detected or recognized"
+                )
+                return
 
-        print(f"\nTranscribed text: {user_input}")
-        logger.log_user_input(user_input, "speech")
+            print(f"\nTranscribed text: {user_input}")
+            logger.log_user_input(user_input, "speech")
+            metrics.COMMANDS.inc(source="speech")
 
-        self.job_on_command(user_input)
+            self.job_on_command(user_input)
 
     def job_on_command(self, user_input: str) -> None:
-        self._refresh_available_jobs()
+        with logger.request_context(), tracing.start_span(
+            "job_on_command", user_input=user_input
+        ), logger.timer("job_on_command"), Profiling.profile_command():
+            # Model requests of the whole command share one latency budget
+            with model_router.command_budget():
+                snapshot = self.get_snapshot()
+
+                with tracing.start_span("routing") as span:
+                    route = self._route_command(user_input, snapshot)
+                    if route is not None:
+                        span.set_attributes(path=route[2], job=route[0])
+                    metrics.ROUTING.inc(path=route[2] if route is not None else "none")
+
+                if route is None:
+                    return
+
+                function_name, function_args, _ = route
+                self._run_job(
+                    function_name,
+                    snapshot.jobs[function_name],
+                    user_input,
+                    function_args,
+                )
 
-        if (function := self._check_if_user_input_is_command(user_input)) is not None:
-            function_name = (
-                function.__name__
-                if hasattr(function, "__name__")
-                else "unknown_command"
-            )
-            logger.log_function_call(function_name, user_input)
-            result = function()
-            logger.log_function_response(
-                function_name, str(result) if result else "No response", user_input
-            )
-            return
+    def _route_command(
+        self, user_input: str, snapshot: JobSnapshot
+    ) -> typing.Optional[
+        typing.Tuple[str, typing.Optional[typing.Dict[str, typing.Any]], str]
+    ]:
+        """
+        Selects the job for the user input: a direct command, a confident match
+        of the local router, or the job chosen by the AI model.
 
+        Returns:
+            Job name, job arguments and the routing path ("direct", "local" or
+            "llm"), or None when no available job was selected
+        """
         if (
-            bot_response := self.ai_model.get_function_to_call(
-                user_input, self.available_functions
+            function_name := self._check_if_user_input_is_command(user_input, snapshot)
+        ) is not None:
+            return function_name, None, "direct"
+
+        if (local_match := snapshot.intent_router.route(user_input)) is not None:
+            function_name, score = local_match
+            logger.log_custom(
+                "local_function_selected",
+                f"Local router selected function: {function_name} (score {score:.2f})",
+                user_input,
+                function_name,
+                "",
+            )
+            return function_name, None, "local"
+
+        tools = snapshot.select_tools(user_input)
+        tracing.get_current_span().set_attribute("tools", len(tools))
+        bot_response = self.ai_model.get_function_to_call(
+            user_input, list(tools.values())
+        )
+
+        if snapshot.is_tool_set_miss(
+            user_input,
+            tools,
+            bot_response["name"] if bot_response is not None else None,
+        ):
+            # The pruned tool set missed the command, ask again with every job
+            metrics.TOOL_SET_RETRIES.inc()
+            tracing.get_current_span().set_attribute("tools_retry", True)
+            logger.log_custom(
+                "ai_tool_set_retry",
+                f"Retrying function selection with all {len(snapshot.jobs)} jobs",
+                user_input,
+                bot_response["name"] if bot_response is not None else "",
+                "",
+            )
+            bot_response = self.ai_model.get_function_to_call(
+                user_input, list(snapshot.functions)
             )
-        ) is None:
+
+        if bot_response is None:
             error_msg = "Error: Could not determine function to call."
             print(error_msg)
             logger.log_error(error_msg, "job_on_command")
-            return
+            return None
 
         function_name = bot_response["name"]
-        function_args = bot_response["args"]
 
-        if function_name in self.available_jobs:
-            logger.log_function_call(function_name, user_input, function_args)
+        if function_name not in snapshot.jobs:
+            logger.log_error(
+                f"Function {function_name} not found in available jobs",
+                "job_on_command",
+            )
+            return None
+
+        return function_name, bot_response["args"], "llm"
+
+    def _run_job(
+        self,
+        function_name: str,
+        function: typing.Callable,
+        user_input: str,
+        function_args: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    ) -> None:
+        logger.log_function_call(function_name, user_input, function_args)
+        start_ns = time.perf_counter_ns()
+        with tracing.start_span("job", job=function_name) as span:
             try:
-                result = self.available_jobs[function_name](**function_args)
+                result = function(**(function_args or {}))
+                duration_ns = time.perf_counter_ns() - start_ns
+                metrics.JOB_DURATION.observe(duration_ns / 1e9, job=function_name)
                 logger.log_function_response(
-                    function_name, str(result) if result else "No response", user_input
+                    function_name,
+                    str(result) if result else "No response",
+                    user_input,
+                    duration_ns,
                 )
             except Exception as e:
-                logger.log_error(
-                    f"Function {function_name} failed: {str(e)}", "job_on_command"
+                span.record_exception(e)
+                metrics.JOB_ERRORS.inc(job=function_name)
+                logger.log_job_error(
+                    function_name,
+                    f"Function {function_name} failed: {str(e)}",
+                    user_input,
+                    time.perf_counter_ns() - start_ns,
                 )
-        else:
-            logger.log_error(
-                f"Function {function_name} not found in available jobs",
-                "job_on_command",
-            )
 
     @capture_response
     @register_job
@@ -187,33 +431,13 @@ class Employer:
             Audio.text_to_speech("Exiting program. o7")
         print("Exiting program. o7")
 
+        # os._exit skips atexit handlers, so write pending cache values and logs first
+        Cache.flush()
+        logger.shutdown()
         os._exit(0)
 
-    def _refresh_available_jobs(self):
-        """Refresh available jobs from registry"""
-        # Get all jobs from ServiceRegistry
-        all_jobs = ServiceRegistry.get_all_jobs()
-
-        # Add new jobs to available_jobs
-        for job_name, job in all_jobs.items():
-            if job_name not in self.available_jobs:
-                self.available_jobs[job_name] = job
-
-        # Create service instances for service-based jobs
-        for service_name, service_class in ServiceRegistry._services.items():
-            if service_name not in self.service_instances:
-                instance = ServiceRegistry.get_service_instance(service_name)
-                if instance:
-                    self.service_instances[service_name] = instance
-
-        self.available_functions = list(self.available_jobs.values())
-
     def _check_if_user_input_is_command(
-        self, user_input: str
-    ) -> typing.Optional[typing.Callable]:
-        normalized_input = user_input.lower().strip()
-        for func in self.available_functions:
-            func_name = func.__name__.replace("_", " ").lower()
-
-            if normalized_input == func_name:
-                return func()
+        self, user_input: str, snapshot: JobSnapshot
+    ) -> typing.Optional[str]:
+        """Returns the name of the job the user input directly refers to, if any"""
+        return snapshot.command_index.get(normalize_command(user_input))
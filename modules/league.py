@@ -2,9 +2,9 @@ import os
 import threading
 import time
 
+from helpers import metrics, model_router, tracing
 from helpers.audio import Audio
 from helpers.cache import Cache
-from helpers.controllers import MouseController
 from helpers.registry import register_job
 from helpers.screenReader import ScreenReader
 
@@ -37,26 +37,38 @@ def accept_game() -> None:
     print("Accepting game...")
 
     def wrapper():
-        mouse_controller = MouseController()
-
-        while True:
-            screenshot = ScreenReader.take_screenshot(gray=True, target="main")
-
-            accept_object = ScreenReader.find_text_in_screenshot(screenshot, "Accept!")
-            if accept_object is not None:
-                mouse_controller.go_to_center_of_bbox(accept_object)
-                mouse_controller.click_left_button()
+        # Lazy import, pynput needs a display as soon as it is imported
+        from helpers.controllers import MouseController
 
-                # Note: This would need to be integrated with the new employer system
-                # for proper job tracking
-                if audio:
-                    Audio.text_to_speech("Game accepted.")
-                print("Game accepted.")
-                break
-
-            time.sleep(5)
+        mouse_controller = MouseController()
 
-    thread = threading.Thread(target=wrapper)
+        metrics.BACKGROUND_JOBS_STARTED.inc(job="accept_game")
+        metrics.BACKGROUND_JOBS.inc(job="accept_game")
+        with tracing.start_span("accept_game.watch"), model_router.detach_budget():
+            try:
+                while True:
+                    screenshot = ScreenReader.take_screenshot(gray=True, target="main")
+
+                    accept_object = ScreenReader.find_text_in_screenshot(
+                        screenshot, "Accept!"
+                    )
+                    if accept_object is not None:
+                        mouse_controller.go_to_center_of_bbox(accept_object)
+                        mouse_controller.click_left_button()
+
+                        # Note: This would need to be integrated with the new employer system
+                        # for proper job tracking
+                        if audio:
+                            Audio.text_to_speech("Game accepted.")
+                        print("Game accepted.")
+                        break
+
+                    time.sleep(5)
+            finally:
+                metrics.BACKGROUND_JOBS.dec(job="accept_game")
+
+    # The background thread continues the trace of the command that started it
+    thread = threading.Thread(target=tracing.bind_context(wrapper))
     thread.daemon = True
     thread.start()
 
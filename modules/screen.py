@@ -1,8 +1,6 @@
 import datetime
 import os
 
-from PIL import Image
-
 from helpers.audio import Audio
 from helpers.cache import Cache
 from helpers.decorators import capture_response
@@ -48,6 +46,8 @@ def save_screenshot() -> None:
     filename = datetime.datetime.now().strftime("%Y-%m-%dT%H-%M-%S") + ".png"
     file_path = os.path.join(SCREENSHOTS_DIR, filename)
 
+    from PIL import Image
+
     image = Image.fromarray(screenshot)
     image.save(file_path)
 
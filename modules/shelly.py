@@ -1,12 +1,15 @@
+import os
+
 import requests
 
+from helpers import tracing
 from helpers.audio import Audio
 from helpers.cache import Cache
 from helpers.decorators import capture_response
 from helpers.registry import register_job
 
 # Shelly device configuration
-SHELLY_BASE_URL = "http://192.168.18.53"
+SHELLY_BASE_URL = os.getenv("SHELLY_BASE_URL", "http://192.168.18.53")
 
 
 @register_job
@@ -35,7 +38,7 @@ def turn_light_on() -> str:
     print("Turning light on...")
 
     try:
-        response = requests.get(f"{SHELLY_BASE_URL}/light/0/?turn=on")
+        response = tracing.http_request("get", f"{SHELLY_BASE_URL}/light/0/?turn=on")
 
         if response.status_code == 200:
             return "Light turned on successfully."
@@ -76,7 +79,7 @@ def turn_light_off() -> str:
     print("Turning light off...")
 
     try:
-        response = requests.get(f"{SHELLY_BASE_URL}/light/0/?turn=off")
+        response = tracing.http_request("get", f"{SHELLY_BASE_URL}/light/0/?turn=off")
 
         if response.status_code == 200:
             return "Light turned off successfully."
@@ -117,7 +120,7 @@ def toggle_light() -> str:
 
     try:
         # First, get the current status
-        status_response = requests.get(f"{SHELLY_BASE_URL}/light/0")
+        status_response = tracing.http_request("get", f"{SHELLY_BASE_URL}/light/0")
 
         if status_response.status_code != 200:
             return f"Error: Failed to get light status. Status code: {status_response.status_code}"
@@ -127,7 +130,9 @@ def toggle_light() -> str:
 
         # Toggle to opposite state
         new_state = "off" if current_state else "on"
-        toggle_response = requests.get(f"{SHELLY_BASE_URL}/light/0/?turn={new_state}")
+        toggle_response = tracing.http_request(
+            "get", f"{SHELLY_BASE_URL}/light/0/?turn={new_state}"
+        )
 
         if toggle_response.status_code == 200:
             return f"Light toggled successfully. Light is now {'on' if new_state == 'on' else 'off'}."
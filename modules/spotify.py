@@ -10,9 +10,10 @@ import webbrowser
 
 import requests
 
+from helpers import tracing
 from helpers.audio import Audio
 from helpers.cache import Cache
-from helpers.decorators import capture_exception, retry_on_unauthorized
+from helpers.decorators import capture_exception, memoize, retry_on_unauthorized
 from helpers.registry import method_job, service_with_env_check
 
 auth_code = None
@@ -61,6 +62,11 @@ class Spotify:
     REDIRECT_URI = f"http://127.0.0.1:{PORT}/callback"
     SCOPE = "user-read-playback-state user-modify-playback-state"
 
+    API_BASE_URL = os.getenv("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1")
+    ACCOUNTS_BASE_URL = os.getenv(
+        "SPOTIFY_ACCOUNTS_BASE_URL", "https://accounts.spotify.com"
+    )
+
     @capture_exception
     def __init__(self):
         self.albums = {}
@@ -139,7 +145,7 @@ class Spotify:
         )
 
         songs = self._get_songs_from_search(search_response)
-        url = self._build_url_with_device("https://api.spotify.com/v1/me/player/play")
+        url = self._build_url_with_device(f"{self.API_BASE_URL}/me/player/play")
 
         data = {"uris": songs}
 
@@ -181,7 +187,7 @@ class Spotify:
             f"Adding {search_response['name']} by {search_response['artist']} to the queue"
         )
 
-        base_url = "https://api.spotify.com/v1/me/player/queue"
+        base_url = f"{self.API_BASE_URL}/me/player/queue"
         url = self._build_url_with_device(base_url)
 
         songs = self._get_songs_from_search(search_response)
@@ -246,7 +252,7 @@ class Spotify:
             None: Spotify playback will start/resume.
         """
 
-        url = self._build_url_with_device("https://api.spotify.com/v1/me/player/play")
+        url = self._build_url_with_device(f"{self.API_BASE_URL}/me/player/play")
         self._make_spotify_request("put", url)
         print("Playback resumed")
 
@@ -274,7 +280,7 @@ class Spotify:
             None: Spotify playback will be paused.
         """
 
-        url = self._build_url_with_device("https://api.spotify.com/v1/me/player/pause")
+        url = self._build_url_with_device(f"{self.API_BASE_URL}/me/player/pause")
         self._make_spotify_request("put", url)
         print("Playback paused")
 
@@ -302,7 +308,7 @@ class Spotify:
             None: Playback will advance to the next track.
         """
 
-        url = self._build_url_with_device("https://api.spotify.com/v1/me/player/next")
+        url = self._build_url_with_device(f"{self.API_BASE_URL}/me/player/next")
         self._make_spotify_request("post", url)
         print("Skipped a song")
 
@@ -321,9 +327,7 @@ class Spotify:
             None
         """
 
-        url = self._build_url_with_device(
-            "https://api.spotify.com/v1/me/player/previous"
-        )
+        url = self._build_url_with_device(f"{self.API_BASE_URL}/me/player/previous")
         self._make_spotify_request("post", url)
         print("Skipped to the previous song")
 
@@ -422,9 +426,7 @@ class Spotify:
         if not 0 <= volume <= 100:
             return
 
-        base_url = (
-            f"https://api.spotify.com/v1/me/player/volume?volume_percent={volume}"
-        )
+        base_url = f"{self.API_BASE_URL}/me/player/volume?volume_percent={volume}"
         url = self._build_url_with_device(base_url, "&")
 
         self._make_spotify_request("put", url)
@@ -451,9 +453,7 @@ class Spotify:
                 return
             state = not playback_state.get("shuffle_state", False)
 
-        base_url = (
-            f"https://api.spotify.com/v1/me/player/shuffle?state={str(state).lower()}"
-        )
+        base_url = f"{self.API_BASE_URL}/me/player/shuffle?state={str(state).lower()}"
         url = self._build_url_with_device(base_url, "&")
 
         self._make_spotify_request("put", url)
@@ -479,7 +479,7 @@ class Spotify:
     ) -> requests.Response:
         """Make a Spotify API request with standard headers and error handling"""
         headers = kwargs.pop("headers", self._get_auth_headers())
-        response = getattr(requests, method.lower())(url, headers=headers, **kwargs)
+        response = tracing.http_request(method, url, headers=headers, **kwargs)
         response.raise_for_status()
         return response
 
@@ -514,7 +514,7 @@ class Spotify:
     def _get_playback_state(self) -> typing.Optional[typing.Dict[str, typing.Any]]:
         try:
             response = self._make_spotify_request(
-                "get", "https://api.spotify.com/v1/me/player"
+                "get", f"{self.API_BASE_URL}/me/player"
             )
             return response.json()
         except requests.exceptions.HTTPError as e:
@@ -525,7 +525,7 @@ class Spotify:
     @retry_on_unauthorized("_refresh_access_token")
     def _get_active_devices(self) -> typing.Optional[str]:
         response = self._make_spotify_request(
-            "get", "https://api.spotify.com/v1/me/player/devices"
+            "get", f"{self.API_BASE_URL}/me/player/devices"
         )
         devices = response.json().get("devices", [])
 
@@ -546,8 +546,8 @@ class Spotify:
 
         data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
 
-        response = requests.post(
-            "https://accounts.spotify.com/api/token", headers=headers, data=data
+        response = tracing.http_request(
+            "post", f"{self.ACCOUNTS_BASE_URL}/api/token", headers=headers, data=data
         )
 
         if response.status_code == 200:
@@ -582,7 +582,7 @@ class Spotify:
         return None, None
 
     def _get_auth_code(self):
-        auth_url = "https://accounts.spotify.com/authorize?" + urllib.parse.urlencode(
+        auth_url = f"{self.ACCOUNTS_BASE_URL}/authorize?" + urllib.parse.urlencode(
             {
                 "client_id": self.client_id,
                 "response_type": "code",
@@ -617,8 +617,8 @@ class Spotify:
             "redirect_uri": self.REDIRECT_URI,
         }
 
-        response = requests.post(
-            "https://accounts.spotify.com/api/token", headers=headers, data=data
+        response = tracing.http_request(
+            "post", f"{self.ACCOUNTS_BASE_URL}/api/token", headers=headers, data=data
         )
 
         if response.status_code == 200:
@@ -638,13 +638,14 @@ class Spotify:
         Cache.set_value(self.SPOTIFY_OAUTH_REFRESH_KEY, refresh_token)
         Cache.set_value(self.SPOTIFY_OAUTH_EXPIRATION_DATE, expiration_date.isoformat())
 
+    @memoize(ttl=3600, maxsize=256)
     @retry_on_unauthorized("_refresh_access_token")
     def _search(
         self, query: str, artist: str = ""
     ) -> typing.Optional[typing.Dict[str, typing.Any]]:
         final_query = query or artist
 
-        url = f"https://api.spotify.com/v1/search?q={final_query}&limit=10&type=album%2Ctrack%2Cartist"
+        url = f"{self.API_BASE_URL}/search?q={final_query}&limit=10&type=album%2Ctrack%2Cartist"
         response = self._make_spotify_request("get", url)
         response_data = response.json()
 
@@ -689,8 +690,9 @@ class Spotify:
             "type": "artists",
         }
 
+    @memoize(ttl=24 * 3600, maxsize=256)
     def _get_tracks_from_album(self, album_id: str) -> typing.List[str]:
-        url = f"https://api.spotify.com/v1/albums/{album_id}"
+        url = f"{self.API_BASE_URL}/albums/{album_id}"
 
         try:
             response = self._make_spotify_request("get", url)
@@ -700,7 +702,7 @@ class Spotify:
             return []
 
     def _get_artists_top_tracks(self, artist_id: str) -> typing.List[str]:
-        url = f"https://api.spotify.com/v1/artists/{artist_id}/top-tracks"
+        url = f"{self.API_BASE_URL}/artists/{artist_id}/top-tracks"
 
         try:
             response = self._make_spotify_request("get", url)
@@ -709,8 +711,9 @@ class Spotify:
         except requests.exceptions.HTTPError:
             return []
 
+    @memoize(ttl=24 * 3600, maxsize=128)
     def _get_artists_albums(self, artist_id: str) -> typing.List[str]:
-        url = f"https://api.spotify.com/v1/artists/{artist_id}/albums"
+        url = f"{self.API_BASE_URL}/artists/{artist_id}/albums"
 
         try:
             response = self._make_spotify_request("get", url)
@@ -4,11 +4,16 @@ import typing
 import geocoder
 import requests
 
+from helpers import tracing
 from helpers.audio import Audio
 from helpers.cache import Cache
-from helpers.decorators import capture_response
+from helpers.decorators import capture_response, memoize
 from helpers.registry import register_job
 
+WEATHER_API_BASE_URL = os.getenv(
+    "WEATHER_API_BASE_URL", "https://api.openweathermap.org"
+)
+
 
 @register_job
 @capture_response
@@ -45,9 +50,7 @@ def weather(city: str) -> str:
     print("Getting weather...")
 
     if city == "":
-        my_geolocation = geocoder.ip("me")
-        city = my_geolocation.city
-        lat, lon = my_geolocation.latlng
+        city, lat, lon = _get_current_location()
     else:
         lat, lon = _get_coordinates_for_city_name(city, api_key)
 
@@ -62,13 +65,28 @@ def weather(city: str) -> str:
     return f"The weather for {city} is {weather_data['weather'][0]['description']} with {weather_data['main']['temp']}°C."
 
 
+@memoize(ttl=600, maxsize=1)
+def _get_current_location() -> (
+    typing.Tuple[typing.Optional[str], typing.Optional[float], typing.Optional[float]]
+):
+    """Get the city and coordinates of the current IP address."""
+    my_geolocation = geocoder.ip("me")
+    if not my_geolocation.ok or not my_geolocation.latlng:
+        return None, None, None
+
+    lat, lon = my_geolocation.latlng
+    return my_geolocation.city, lat, lon
+
+
+@memoize(ttl=30 * 24 * 3600, maxsize=256, persist=True, ignore=["api_key"])
 def _get_coordinates_for_city_name(
     city_name: str, api_key: str
 ) -> typing.Tuple[typing.Optional[float], typing.Optional[float]]:
     """Get coordinates for a city name."""
     try:
-        response = requests.get(
-            f"http://api.openweathermap.org/geo/1.0/direct?q={city_name}&appid={api_key}&limit=1"
+        response = tracing.http_request(
+            "get",
+            f"{WEATHER_API_BASE_URL}/geo/1.0/direct?q={city_name}&appid={api_key}&limit=1",
         )
         data = response.json()
 
@@ -88,8 +106,9 @@ def _get_weather_for_coordinates(
 ) -> typing.Optional[typing.Dict[str, typing.Any]]:
     """Get weather data for coordinates."""
     try:
-        response = requests.get(
-            f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric&lang=en"
+        response = tracing.http_request(
+            "get",
+            f"{WEATHER_API_BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric&lang=en",
         )
         return response.json()
 
@@ -1,9 +1,14 @@
+import functools
+import hmac
+import os
 import threading
 import typing
 
 import flask
 import yaml
 
+from helpers import metrics
+from helpers.profiling import Profiling, dump_thread_stacks
 from modules.employer import Employer
 
 app = flask.Flask(__name__)
@@ -24,6 +29,109 @@ def ping():
     return flask.jsonify({"status": "ok"})
 
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return flask.Response(
+        metrics.registry.render(), mimetype="text/plain; version=0.0.4"
+    )
+
+
+def admin_required(func):
+    """
+    Allows requests carrying the AI_ASSISTANT_ADMIN_TOKEN as a bearer token.
+    Without a configured token, only requests from this machine are allowed.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if admin_token := os.getenv("AI_ASSISTANT_ADMIN_TOKEN"):
+            authorization = flask.request.headers.get("Authorization", "")
+            if not hmac.compare_digest(
+                authorization.encode(), f"Bearer {admin_token}".encode()
+            ):
+                return (
+                    flask.jsonify({"status": "error", "message": "Unauthorized"}),
+                    401,
+                )
+
+        elif flask.request.remote_addr not in ("127.0.0.1", "::1"):
+            return flask.jsonify({"status": "error", "message": "Forbidden"}), 403
+
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+@app.route("/admin/profile/start", methods=["POST"])
+@admin_required
+def start_profiling():
+    mode = flask.request.args.get("mode", "sampling")
+    try:
+        interval = float(flask.request.args.get("interval", "0.005"))
+        Profiling.start_session(mode, interval)
+    except ValueError as e:
+        return flask.jsonify({"status": "error", "message": str(e)}), 400
+    except RuntimeError as e:
+        return flask.jsonify({"status": "error", "message": str(e)}), 409
+
+    return flask.jsonify({"status": "success", "mode": mode}), 200
+
+
+@app.route("/admin/profile/stop", methods=["POST"])
+@admin_required
+def stop_profiling():
+    report = Profiling.stop_session(
+        limit=flask.request.args.get("limit", 30, type=int),
+        collapsed=flask.request.args.get("format") == "collapsed",
+    )
+    if report is None:
+        return (
+            flask.jsonify({"status": "error", "message": "No profiling session"}),
+            409,
+        )
+
+    return flask.Response(report, mimetype="text/plain")
+
+
+@app.route("/admin/memory/snapshot", methods=["POST"])
+@admin_required
+def take_memory_snapshot():
+    snapshot = Profiling.take_memory_snapshot(
+        flask.request.args.get("limit", 20, type=int)
+    )
+
+    return flask.jsonify({"status": "success", **snapshot}), 200
+
+
+@app.route("/admin/memory/diff", methods=["GET"])
+@admin_required
+def diff_memory_snapshots():
+    try:
+        diff = Profiling.diff_memory_snapshots(
+            flask.request.args.get("base", 0, type=int),
+            flask.request.args.get("target", None, type=int),
+            flask.request.args.get("limit", 20, type=int),
+        )
+    except IndexError as e:
+        return flask.jsonify({"status": "error", "message": str(e)}), 404
+
+    return flask.jsonify({"status": "success", "diff": diff}), 200
+
+
+@app.route("/admin/memory/stop", methods=["POST"])
+@admin_required
+def stop_memory_tracing():
+    Profiling.stop_memory_tracing()
+
+    return flask.jsonify({"status": "success"}), 200
+
+
+@app.route("/admin/threads", methods=["GET"])
+@admin_required
+def get_thread_stacks():
+    return flask.Response(dump_thread_stacks(), mimetype="text/plain")
+
+
 @app.route("/commands", methods=["GET"])
 def get_commands():
     with open("commands.yaml", "r") as file:
@@ -40,12 +148,11 @@ def execute_job(job_name):
             500,
         )
 
-    employer._refresh_available_jobs()
-
-    if job_name in employer.available_jobs:
-        job = employer.available_jobs[job_name]
+    if (job := employer.get_job(job_name)) is not None:
+        metrics.COMMANDS.inc(source="api")
         kwargs = flask.request.args.to_dict()
-        result = job(**kwargs)
+        with Profiling.profile_command():
+            result = job(**kwargs)
 
         return flask.jsonify({"status": "success", "response": result}), 200
 
@@ -3,6 +3,7 @@ import typing
 
 import flask
 
+from helpers import metrics
 from modules.employer import Employer
 
 app = flask.Flask(__name__)
@@ -43,30 +44,29 @@ def ping():
 @app.route("/button-pressed/<key>/", methods=["GET"])
 def button_pressed(key):
     if employer is not None:
-        employer._refresh_available_jobs()
-
+        metrics.COMMANDS.inc(source="button")
         match key:
             case "A":
                 employer.speak()
 
             case "B":
-                if function := employer.available_jobs.get("toggle_playback"):
+                if function := employer.get_job("toggle_playback"):
                     function()
 
             case "UP":
-                if function := employer.available_jobs.get("volume_up"):
+                if function := employer.get_job("volume_up"):
                     function()
 
             case "DOWN":
-                if function := employer.available_jobs.get("volume_down"):
+                if function := employer.get_job("volume_down"):
                     function()
 
             case "LEFT":
-                if function := employer.available_jobs.get("previous_song"):
+                if function := employer.get_job("previous_song"):
                     function()
 
             case "RIGHT":
-                if function := employer.available_jobs.get("next_song"):
+                if function := employer.get_job("next_song"):
                     function()
 
     return flask.jsonify({"status": "success", "message": f"Button {key} pressed."})